@@ -0,0 +1,383 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+pragma experimental ABIEncoderV2;
+
+import {BaseStrategy, StrategyParams} from "@yearnvaults/contracts/BaseStrategy.sol";
+import "@openzeppelin/contracts/math/Math.sol";
+import {IERC20, Address} from "@openzeppelin/contracts/token/ERC20/SafeERC20.sol";
+
+import "../interfaces/IDetailedERC20.sol";
+import "../interfaces/Stargate/IPool.sol";
+import "../interfaces/Stargate/ILPStaking.sol";
+import "../interfaces/Chainlink/IPriceFeed.sol";
+import "./ySwaps/ITradeFactory.sol";
+
+// What Strategy and StrategyMultiPool share: pricing, the harvest trigger and
+// the tend math, cloning, the ySwaps wiring, and the LP math of a single
+// Stargate pool.
+abstract contract BaseStargateStrategy is BaseStrategy {
+    using Address for address;
+
+    uint256 internal constant max = type(uint256).max;
+    // turn the time left until the next harvest into blocks of emissions
+    uint256 internal constant SECONDS_PER_BLOCK = 12;
+    uint256 internal constant MAX_TEND_HORIZON = 30 days;
+
+    address public tradeFactory;
+    IERC20 public STG;
+
+    string internal strategyName;
+
+    IPriceFeed internal priceFeed; // want/ETH, prices the call cost in want
+    // STG/USD and want/USD, used to value rewards in want for the harvest trigger
+    IPriceFeed public stgPriceFeed;
+    IPriceFeed public wantPriceFeed;
+
+    // harvest once the STG we can sell is worth more than rewardsProfitFactor times the call cost
+    uint256 public rewardsProfitFactor;
+
+    // want owed to the vault that Stargate could not pay out yet, the LP behind
+    // it stays staked
+    uint256 public pendingRedemption;
+
+    // declared last so what a harvest reads along with it in Strategy packs into its slot
+    ILPStaking public lpStaker;
+
+    struct StrategyState {
+        uint256 looseWant;
+        uint256 unstakedLP;
+        uint256 stakedLP;
+        uint256 valueOfLP;
+        uint256 pendingSTG;
+        uint256 balanceOfSTG;
+        uint256 estimatedTotalAssets;
+    }
+
+    event Cloned(address indexed clone);
+    event UpdatedRewardsProfitFactor(uint256 rewardsProfitFactor);
+
+    constructor(address _vault) public BaseStrategy(_vault) {}
+
+    function _initializeShared(
+        address _lpStaker,
+        address _priceFeed,
+        string memory _strategyName
+    ) internal {
+        lpStaker = ILPStaking(_lpStaker);
+        STG = IERC20(lpStaker.stargate());
+        priceFeed = IPriceFeed(_priceFeed);
+        strategyName = _strategyName;
+        rewardsProfitFactor = 100;
+
+        require(address(priceFeed) != address(0));
+    }
+
+    // Deploys an EIP-1167 proxy of this contract, the caller initializes it
+    function _cloneThis() internal returns (address payable newStrategy) {
+        bytes20 addressBytes = bytes20(address(this));
+
+        assembly {
+            // EIP-1167 bytecode
+            let clone_code := mload(0x40)
+            mstore(
+                clone_code,
+                0x3d602d80600a3d3981f3363d3d373d3d3d363d73000000000000000000000000
+            )
+            mstore(add(clone_code, 0x14), addressBytes)
+            mstore(
+                add(clone_code, 0x28),
+                0x5af43d82803e903d91602b57fd5bf30000000000000000000000000000000000
+            )
+            newStrategy := create(0, clone_code, 0x37)
+        }
+    }
+
+    function name() external view override returns (string memory) {
+        return strategyName;
+    }
+
+    function pendingSTGRewards() public view virtual returns (uint256);
+
+    function _claimRewards() internal virtual;
+
+    function harvestTrigger(uint256 callCostInWei)
+        public
+        view
+        override
+        returns (bool)
+    {
+        StrategyParams memory params = vault.strategies(address(this));
+
+        // Should not trigger if Strategy is not activated
+        if (params.activation == 0) return false;
+
+        // Should not trigger if we haven't waited long enough since previous harvest
+        if (block.timestamp.sub(params.lastReport) < minReportDelay)
+            return false;
+
+        // Should trigger if hasn't been called in a while
+        if (block.timestamp.sub(params.lastReport) >= maxReportDelay)
+            return true;
+
+        // If some amount is owed, pay it back
+        if (vault.debtOutstanding() > debtThreshold) return true;
+
+        // Check for losses
+        uint256 total = estimatedTotalAssets();
+        if (total.add(debtThreshold) < params.totalDebt) return true;
+
+        uint256 callCost = ethToWant(callCostInWei);
+
+        // Credit to deploy or profit to report
+        uint256 profit =
+            total > params.totalDebt ? total.sub(params.totalDebt) : 0;
+        if (profitFactor.mul(callCost) < vault.creditAvailable().add(profit))
+            return true;
+
+        // Rewards waiting to be claimed or sold are worth the gas
+        uint256 rewards = stgToWant(pendingSTGRewards().add(balanceOfSTG()));
+        return rewardsProfitFactor.mul(callCost) < rewards;
+    }
+
+    /**
+     * @notice
+     *  Provide an accurate conversion from `_amtInWei` (denominated in wei)
+     *  to `want` (using the native decimal characteristics of `want`).
+     * @dev
+     *  Care must be taken when working with decimals to assure that the conversion
+     *  is compatible. As an example:
+     *
+     *      given 1e17 wei (0.1 ETH) as input, and want is USDC (6 decimals),
+     *      with 1 USDC = 1/1800 ETH, this should give back 180000000 (180 USDC)
+     *
+     *  priceFeed quotes want in ETH, scaled by its own decimals.
+     *
+     * @param _amtInWei The amount (in wei/1e-18 ETH) to convert to `want`
+     * @return The amount in `want` of `_amtInEth` converted to `want`
+     **/
+    function ethToWant(uint256 _amtInWei)
+        public
+        view
+        virtual
+        override
+        returns (uint256)
+    {
+        int256 price = priceFeed.latestAnswer();
+        if (price == 0) {
+            return _amtInWei;
+        }
+        require(price >= 0, "SafeCast: value must be positive");
+        uint256 _feedAndWantDecimals =
+            uint256(priceFeed.decimals()).add(
+                IDetailedERC20(address(want)).decimals()
+            );
+        return
+            _amtInWei.mul(10**_feedAndWantDecimals).div(uint256(price)).div(
+                1e18
+            );
+    }
+
+    // Values STG in want through the STG/USD and want/USD feeds, zero until both are set
+    function stgToWant(uint256 _amountOfSTG) public view returns (uint256) {
+        if (
+            address(stgPriceFeed) == address(0) ||
+            address(wantPriceFeed) == address(0) ||
+            _amountOfSTG == 0
+        ) {
+            return 0;
+        }
+        int256 _stgPrice = stgPriceFeed.latestAnswer();
+        int256 _wantPrice = wantPriceFeed.latestAnswer();
+        if (_stgPrice <= 0 || _wantPrice <= 0) {
+            return 0;
+        }
+        uint256 _feedAndWantDecimals =
+            uint256(wantPriceFeed.decimals()).add(
+                IDetailedERC20(address(want)).decimals()
+            );
+        uint256 _feedAndSTGDecimals =
+            uint256(stgPriceFeed.decimals()).add(
+                IDetailedERC20(address(STG)).decimals()
+            );
+        return
+            _amountOfSTG
+                .mul(uint256(_stgPrice))
+                .mul(10**_feedAndWantDecimals)
+                .div(uint256(_wantPrice))
+                .div(10**_feedAndSTGDecimals);
+    }
+
+    // --------- UTILITY & HELPER FUNCTIONS ------------
+
+    // Blocks of emissions want put to work now earns before the next harvest
+    // would deploy it anyway, zero if the strategy is inactive or already due
+    function _blocksUntilHarvest() internal view returns (uint256) {
+        StrategyParams memory params = vault.strategies(address(this));
+        if (params.activation == 0) return 0;
+
+        uint256 _nextHarvest = params.lastReport.add(maxReportDelay);
+        if (block.timestamp >= _nextHarvest) return 0;
+        return
+            Math.min(_nextHarvest.sub(block.timestamp), MAX_TEND_HORIZON).div(
+                SECONDS_PER_BLOCK
+            );
+    }
+
+    // Loose want adjustPosition would deposit, beyond what the vault asks back
+    function _idleWant() internal view returns (uint256) {
+        uint256 _looseWant = balanceOfWant();
+        uint256 _debtOutstanding = vault.debtOutstanding();
+        if (_looseWant <= _debtOutstanding) return 0;
+        return _looseWant.sub(_debtOutstanding);
+    }
+
+    // STG pool _pid of LPStaking pays over _blocks to an extra _value of want
+    // staked in _pool
+    function _emissionsFor(
+        IPool _pool,
+        uint256 _pid,
+        uint256 _value,
+        uint256 _blocks
+    ) internal view returns (uint256) {
+        uint256 _totalAllocPoint = lpStaker.totalAllocPoint();
+        if (_totalAllocPoint == 0) return 0;
+
+        uint256 _stakedLP = lpStaker.lpBalances(_pid);
+        uint256 _poolValue =
+            (_stakedLP > 0 ? _pool.amountLPtoLD(_stakedLP) : 0).add(_value);
+        return
+            lpStaker
+                .stargatePerBlock()
+                .mul(lpStaker.poolInfo(_pid).allocPoint)
+                .mul(_blocks)
+                .div(_totalAllocPoint)
+                .mul(_value)
+                .div(_poolValue);
+    }
+
+    // LP of _pool instantRedeemLocal pays out in full: the pool's delta credit, in LP
+    function _instantlyRedeemableLP(IPool _pool)
+        internal
+        view
+        returns (uint256)
+    {
+        uint256 _totalLiquidity = _pool.totalLiquidity();
+        if (_totalLiquidity == 0) return 0;
+        return
+            _pool.deltaCredit().mul(_pool.totalSupply()).div(_totalLiquidity);
+    }
+
+    // Inverse of _pool.amountLPtoLD: how much of our _totalLP (worth _valueOfLP) we need
+    // to redeem to get _amountOfWant back. Rounds up so the truncation inside the pool
+    // never leaves us short, capped at what we hold.
+    function _lpForWant(
+        IPool _pool,
+        uint256 _totalLP,
+        uint256 _valueOfLP,
+        uint256 _amountOfWant
+    ) internal view returns (uint256) {
+        if (_amountOfWant >= _valueOfLP) {
+            return _totalLP;
+        }
+
+        uint256 _lpAmount =
+            _amountOfWant.mul(_totalLP).div(_valueOfLP).add(1);
+        uint256 _quotedWant = _pool.amountLPtoLD(_lpAmount);
+        if (_quotedWant < _amountOfWant) {
+            // off by dust (e.g. shared decimals conversion), scale up by the missing fraction
+            _lpAmount = _lpAmount.add(
+                _amountOfWant
+                    .sub(_quotedWant)
+                    .mul(_lpAmount)
+                    .div(_quotedWant.add(1))
+                    .add(1)
+            );
+        }
+        return Math.min(_lpAmount, _totalLP);
+    }
+
+    // Want _lpAmount of _pool is worth, rounded up by the shared-decimals unit the pool
+    // truncates when the LP it is part of is split
+    function _heldBackValue(IPool _pool, uint256 _lpAmount)
+        internal
+        view
+        returns (uint256)
+    {
+        return _pool.amountLPtoLD(_lpAmount).add(_pool.convertRate());
+    }
+
+    // What a withdrawal neither paid out nor booked as a loss must be LP that Stargate held
+    // back, worth _heldBack. With nothing held back the two add up to what was asked for.
+    function _checkLiquidation(
+        uint256 _amountNeeded,
+        uint256 _liquidatedAmount,
+        uint256 _loss,
+        uint256 _heldBack
+    ) internal pure {
+        uint256 _accounted = _liquidatedAmount.add(_loss);
+        require(
+            _accounted <= _amountNeeded &&
+                _accounted.add(_heldBack) >= _amountNeeded,
+            "!check"
+        );
+    }
+
+    function balanceOfWant() public view returns (uint256) {
+        return want.balanceOf(address(this));
+    }
+
+    function balanceOfSTG() public view returns (uint256) {
+        return STG.balanceOf(address(this));
+    }
+
+    function claimRewards() external onlyVaultManagers {
+        _claimRewards();
+    }
+
+    // Both feeds quote in USD, e.g. Chainlink STG/USD and USDC/USD
+    function setSTGPriceFeed(address _stgPriceFeed, address _wantPriceFeed)
+        external
+        onlyVaultManagers
+    {
+        stgPriceFeed = IPriceFeed(_stgPriceFeed);
+        wantPriceFeed = IPriceFeed(_wantPriceFeed);
+    }
+
+    function setHarvestTriggerParams(
+        uint256 _minReportDelay,
+        uint256 _maxReportDelay,
+        uint256 _rewardsProfitFactor
+    ) external onlyVaultManagers {
+        require(_minReportDelay <= _maxReportDelay);
+        minReportDelay = _minReportDelay;
+        maxReportDelay = _maxReportDelay;
+        rewardsProfitFactor = _rewardsProfitFactor;
+        emit UpdatedMinReportDelay(_minReportDelay);
+        emit UpdatedMaxReportDelay(_maxReportDelay);
+        emit UpdatedRewardsProfitFactor(_rewardsProfitFactor);
+    }
+
+    // ----------------- YSWAPS FUNCTIONS ---------------------
+
+    function setTradeFactory(address _tradeFactory) external onlyGovernance {
+        if (tradeFactory != address(0)) {
+            _removeTradeFactoryPermissions();
+        }
+
+        // approve and set up trade factory
+        STG.safeApprove(_tradeFactory, max);
+        ITradeFactory tf = ITradeFactory(_tradeFactory);
+        tf.enable(address(STG), address(want));
+        tradeFactory = _tradeFactory;
+    }
+
+    function removeTradeFactoryPermissions() external onlyEmergencyAuthorized {
+        _removeTradeFactoryPermissions();
+    }
+
+    function _removeTradeFactoryPermissions() internal {
+        STG.safeApprove(tradeFactory, 0);
+        tradeFactory = address(0);
+    }
+}
@@ -3,38 +3,39 @@
 pragma solidity 0.6.12;
 pragma experimental ABIEncoderV2;
 
-// These are the core Yearn libraries
-import {BaseStrategy, StrategyParams} from "@yearnvaults/contracts/BaseStrategy.sol";
 import "@openzeppelin/contracts/math/Math.sol";
-import {IERC20, Address} from "@openzeppelin/contracts/token/ERC20/SafeERC20.sol";
+import {IERC20} from "@openzeppelin/contracts/token/ERC20/SafeERC20.sol";
 
-import "../interfaces/IDetailedERC20.sol";
 import "../interfaces/Stargate/IStargateRouter.sol";
 import "../interfaces/Stargate/IPool.sol";
-import "../interfaces/Stargate/ILPStaking.sol";
-import "../interfaces/Chainlink/IPriceFeed.sol";
-import "./ySwaps/ITradeFactory.sol";
+import "../interfaces/Uniswap/IUniswapV2Router.sol";
+import "./BaseStargateStrategy.sol";
 
-contract Strategy is BaseStrategy {
-    using Address for address;
+contract Strategy is BaseStargateStrategy {
+    uint256 private constant MAX_BPS = 10_000;
 
-    uint256 private constant max = type(uint256).max;
+    // Clones can't use immutables, so what a harvest reads together shares a slot with
+    // lpStaker, the last variable of BaseStargateStrategy
+    uint16 public liquidityPoolIDInLPStaking; // Each pool has a main Pool ID and then a separate Pool ID that refers to the pool in the LPStaking contract.
+    uint16 public liquidityPoolID;
     bool internal isOriginal = true;
+    bool public compounding; // sell STG inside harvest, see setCompounding
 
-    address public tradeFactory;
-
-    uint256 public liquidityPoolID;
-    uint256 public liquidityPoolIDInLPStaking; // Each pool has a main Pool ID and then a separate Pool ID that refers to the pool in the LPStaking contract.
-
-    IERC20 public STG;
-    IPool public liquidityPool;
-    IERC20 public lpToken;
+    IPool public liquidityPool; // also the LP token, see lpToken()
     IStargateRouter public stargateRouter;
-    ILPStaking public lpStaker;
 
-    string internal strategyName;
+    // where harvest sells STG when compounding, and how far below stgToWant it may fill
+    IUniswapV2Router public compoundRouter;
+    uint16 public compoundSlippageBps;
+    address[] public compoundPath;
 
-    IPriceFeed internal priceFeed;
+    // In-memory view of the position, read once per harvest and kept up to date as we move funds
+    struct PositionSnapshot {
+        uint256 looseWant;
+        uint256 unstakedLP;
+        uint256 stakedLP;
+        uint256 valueOfLP;
+    }
 
     constructor(
         address _vault,
@@ -42,7 +43,7 @@ contract Strategy is BaseStrategy {
         uint16 _liquidityPoolIDInLPStaking,
         address _priceFeed,
         string memory _strategyName
-    ) public BaseStrategy(_vault) {
+    ) public BaseStargateStrategy(_vault) {
         _initializeThis(
             _lpStaker,
             _liquidityPoolIDInLPStaking,
@@ -82,27 +83,22 @@ contract Strategy is BaseStrategy {
         address _priceFeed,
         string memory _strategyName
     ) internal {
-        lpStaker = ILPStaking(_lpStaker);
-        STG = IERC20(lpStaker.stargate());
+        _initializeShared(_lpStaker, _priceFeed, _strategyName);
         liquidityPoolIDInLPStaking = _liquidityPoolIDInLPStaking;
 
-        lpToken = lpStaker.poolInfo(_liquidityPoolIDInLPStaking).lpToken;
-
-        liquidityPool = IPool(address(lpToken));
-        liquidityPoolID = liquidityPool.poolId();
+        liquidityPool = IPool(
+            address(lpStaker.poolInfo(_liquidityPoolIDInLPStaking).lpToken)
+        );
+        liquidityPoolID = uint16(liquidityPool.poolId());
         stargateRouter = IStargateRouter(liquidityPool.router());
 
-        lpToken.safeApprove(address(lpStaker), max);
-
-        priceFeed = IPriceFeed(_priceFeed);
-        strategyName = _strategyName;
+        lpToken().safeApprove(address(lpStaker), max);
+        // approved once, see updateStargateRouter
+        want.safeApprove(address(stargateRouter), max);
 
         require(address(want) == liquidityPool.token());
-        require(address(priceFeed) != address(0));
     }
 
-    event Cloned(address indexed clone);
-
     function clone(
         address _vault,
         address _strategist,
@@ -115,23 +111,7 @@ contract Strategy is BaseStrategy {
     ) external returns (address payable newStrategy) {
         require(isOriginal);
 
-        bytes20 addressBytes = bytes20(address(this));
-
-        assembly {
-            // EIP-1167 bytecode
-            let clone_code := mload(0x40)
-            mstore(
-                clone_code,
-                0x3d602d80600a3d3981f3363d3d373d3d3d363d73000000000000000000000000
-            )
-            mstore(add(clone_code, 0x14), addressBytes)
-            mstore(
-                add(clone_code, 0x28),
-                0x5af43d82803e903d91602b57fd5bf30000000000000000000000000000000000
-            )
-            newStrategy := create(0, clone_code, 0x37)
-        }
-
+        newStrategy = _cloneThis();
         Strategy(newStrategy).initialize(
             _vault,
             _strategist,
@@ -146,19 +126,31 @@ contract Strategy is BaseStrategy {
         emit Cloned(newStrategy);
     }
 
-    function name() external view override returns (string memory) {
-        return strategyName;
-    }
-
     function estimatedTotalAssets() public view override returns (uint256) {
-        return balanceOfWant().add(valueOfLPTokens());
+        return _estimatedTotalAssets(_snapshotPosition());
     }
 
-    function pendingSTGRewards() public view returns (uint256) {
+    function pendingSTGRewards() public view override returns (uint256) {
         return
             lpStaker.pendingStargate(liquidityPoolIDInLPStaking, address(this));
     }
 
+    // Everything monitoring needs in one call, each underlying balance is read once
+    function strategyState()
+        external
+        view
+        returns (StrategyState memory _state)
+    {
+        PositionSnapshot memory _position = _snapshotPosition();
+        _state.looseWant = _position.looseWant;
+        _state.unstakedLP = _position.unstakedLP;
+        _state.stakedLP = _position.stakedLP;
+        _state.valueOfLP = _position.valueOfLP;
+        _state.pendingSTG = pendingSTGRewards();
+        _state.balanceOfSTG = balanceOfSTG();
+        _state.estimatedTotalAssets = _estimatedTotalAssets(_position);
+    }
+
     function prepareReturn(uint256 _debtOutstanding)
         internal
         override
@@ -169,31 +161,33 @@ contract Strategy is BaseStrategy {
         )
     {
         _claimRewards();
+        if (compounding) {
+            _compoundRewards();
+        }
 
         //grab the estimate total debt from the vault
         uint256 _vaultDebt = vault.strategies(address(this)).totalDebt;
-        uint256 _totalAssets = estimatedTotalAssets();
+        PositionSnapshot memory _position = _snapshotPosition();
+        uint256 _totalAssets = _estimatedTotalAssets(_position);
 
         _profit = _totalAssets > _vaultDebt ? _totalAssets.sub(_vaultDebt) : 0;
 
         //free up _debtOutstanding + our profit, and make any necessary adjustments to the accounting.
-        uint256 _amountFreed;
         uint256 _toLiquidate = _debtOutstanding.add(_profit);
-        uint256 _wantBalance = balanceOfWant();
 
-        if (_toLiquidate > _wantBalance) {
-            (_amountFreed, _loss) = withdrawSome(
-                _toLiquidate.sub(_wantBalance)
-            );
-            _totalAssets = estimatedTotalAssets();
-        } else {
-            _amountFreed = balanceOfWant();
+        if (_toLiquidate > _position.looseWant) {
+            // a shortfall here is already counted below as _vaultDebt - _totalAssets
+            _withdrawSome(_position, _toLiquidate.sub(_position.looseWant));
+            _totalAssets = _estimatedTotalAssets(_position);
         }
 
-        _debtPayment = Math.min(_debtOutstanding, _amountFreed);
-        _loss = _loss.add(
-            _vaultDebt > _totalAssets ? _vaultDebt.sub(_totalAssets) : 0
+        // want that was loose before the withdrawal pays the debt as well
+        _debtPayment = Math.min(_debtOutstanding, _position.looseWant);
+        pendingRedemption = Math.min(
+            _debtOutstanding.sub(_debtPayment),
+            _position.valueOfLP
         );
+        _loss = _vaultDebt > _totalAssets ? _vaultDebt.sub(_totalAssets) : 0;
 
         if (_loss > _profit) {
             _loss = _loss.sub(_profit);
@@ -202,9 +196,17 @@ contract Strategy is BaseStrategy {
             _profit = _profit.sub(_loss);
             _loss = 0;
         }
+        // profit still in LP Stargate could not redeem is reported once it is paid out
+        _profit = Math.min(_profit, _position.looseWant.sub(_debtPayment));
     }
 
     function adjustPosition(uint256 _debtOutstanding) internal override {
+        if (emergencyExit) {
+            // an exit Stargate could not pay out in one go is stepped by tend
+            _redeemAvailable();
+            return;
+        }
+
         uint256 _looseWant = balanceOfWant();
 
         if (_looseWant > _debtOutstanding) {
@@ -219,59 +221,81 @@ contract Strategy is BaseStrategy {
         }
     }
 
-    function withdrawSome(uint256 _amountNeeded)
-        internal
-        returns (uint256 _liquidatedAmount, uint256 _loss)
-    {
-        uint256 _preWithdrawWant = balanceOfWant();
-        if (_amountNeeded > 0 && balanceOfStakedLPToken() > 0) {
-            _unstakeLP(balanceOfStakedLPToken());
-            uint256 unstakedBalance = balanceOfUnstakedLPToken();
-            if (unstakedBalance > 0) {
-                //withdraw from pool
-                _withdrawFromLP(unstakedBalance);
+    // Frees up _amountNeeded of want by redeeming only the LP needed, keeping _position in sync.
+    // Only what Stargate can pay out right now is unstaked and redeemed, _heldBack is what
+    // the rest of the LP we needed is worth.
+    function _withdrawSome(
+        PositionSnapshot memory _position,
+        uint256 _amountNeeded
+    ) internal returns (uint256 _liquidatedAmount, uint256 _heldBack) {
+        uint256 _preWithdrawWant = _position.looseWant;
+        uint256 _lpNeeded =
+            _lpForWant(
+                liquidityPool,
+                _position.unstakedLP.add(_position.stakedLP),
+                _position.valueOfLP,
+                _amountNeeded
+            );
+        uint256 _lpToRedeem =
+            Math.min(_lpNeeded, _instantlyRedeemableLP(liquidityPool));
+        if (_lpToRedeem > 0) {
+            if (_lpToRedeem > _position.unstakedLP) {
+                uint256 _toUnstake = _lpToRedeem.sub(_position.unstakedLP);
+                lpStaker.withdraw(liquidityPoolIDInLPStaking, _toUnstake);
+                _position.stakedLP = _position.stakedLP.sub(_toUnstake);
+                _position.unstakedLP = _lpToRedeem;
             }
 
-            //check current want balance
-            uint256 _postWithdrawWant = balanceOfWant();
-
-            uint256 _unstakedWant = _postWithdrawWant.sub(_preWithdrawWant);
-            //redeposit to pool
-            if (_unstakedWant > _amountNeeded) {
-                _addToLP(_unstakedWant.sub(_amountNeeded));
-
-                unstakedBalance = balanceOfUnstakedLPToken();
-                if (unstakedBalance > 0) {
-                    //redeposit to farm
-                    _stakeLP(unstakedBalance);
-                }
-            }
+            //withdraw from pool
+            _redeemLP(_lpToRedeem);
+            _position.unstakedLP = _position.unstakedLP.sub(_lpToRedeem);
+            // the redemption moves want in and the pool's exchange rate, so those two are read again
+            _position.looseWant = balanceOfWant();
+            uint256 _remainingLP = _position.unstakedLP.add(_position.stakedLP);
+            _position.valueOfLP = _remainingLP > 0
+                ? liquidityPool.amountLPtoLD(_remainingLP)
+                : 0;
         }
-
-        uint256 _liquidAssets = balanceOfWant().sub(_preWithdrawWant);
-        if (_amountNeeded > _liquidAssets) {
-            _liquidatedAmount = _liquidAssets;
-            _loss = _amountNeeded.sub(_liquidAssets);
-        } else {
-            _liquidatedAmount = _amountNeeded;
+        if (_lpNeeded > _lpToRedeem) {
+            _heldBack = _heldBackValue(
+                liquidityPool,
+                _lpNeeded.sub(_lpToRedeem)
+            );
         }
+
+        _liquidatedAmount = Math.min(
+            _amountNeeded,
+            _position.looseWant.sub(_preWithdrawWant)
+        );
     }
 
     function liquidatePosition(uint256 _amountNeeded)
         internal
+        virtual
         override
         returns (uint256 _liquidatedAmount, uint256 _loss)
     {
-        uint256 _liquidAssets = balanceOfWant();
+        PositionSnapshot memory _position = _snapshotPosition();
+        uint256 _liquidAssets = _position.looseWant;
+        uint256 _heldBack;
 
         if (_liquidAssets < _amountNeeded) {
-            withdrawSome(_amountNeeded.sub(_liquidAssets));
-            _liquidAssets = balanceOfWant();
-            _loss = _amountNeeded.sub(_liquidAssets);
+            (, _heldBack) = _withdrawSome(
+                _position,
+                _amountNeeded.sub(_liquidAssets)
+            );
+            _liquidAssets = _position.looseWant;
+            // LP Stargate could not redeem yet is still ours, only what it cannot cover is lost.
+            // If Stargate paid out all we asked for, any shortfall is realised.
+            uint256 _covered =
+                _heldBack > 0
+                    ? _liquidAssets.add(_position.valueOfLP)
+                    : _liquidAssets;
+            _loss = _amountNeeded > _covered ? _amountNeeded.sub(_covered) : 0;
         }
 
         _liquidatedAmount = Math.min(_amountNeeded, _liquidAssets);
-        require(_amountNeeded == _liquidatedAmount.add(_loss), "!check");
+        _checkLiquidation(_amountNeeded, _liquidatedAmount, _loss, _heldBack);
     }
 
     function liquidateAllPositions() internal override returns (uint256) {
@@ -279,15 +303,59 @@ contract Strategy is BaseStrategy {
 
         uint256 _lpTokenBalance = balanceOfUnstakedLPToken();
         if (_lpTokenBalance > 0) {
-            _withdrawFromLP(_lpTokenBalance);
+            // BaseStrategy books whatever is not freed here as a loss, so rather than
+            // report LP Stargate cannot pay out yet, wait for tend to step the exit
+            require(
+                _lpTokenBalance <= _instantlyRedeemableLP(liquidityPool),
+                "!liquidity"
+            );
+            _redeemLP(_lpTokenBalance);
         }
+        pendingRedemption = 0;
         return balanceOfWant();
     }
 
-    // NOTE: Can override `tendTrigger` and `harvestTrigger` if necessary
+    // Deposit idle want and stake stray LP once the STG they would earn before the next
+    // harvest is worth more than the call
+    function tendTrigger(uint256 callCostInWei)
+        public
+        view
+        override
+        returns (bool)
+    {
+        if (emergencyExit) {
+            return
+                balanceOfAllLPToken() > 0 &&
+                _instantlyRedeemableLP(liquidityPool) > 0;
+        }
+
+        // the next harvest deploys it anyway, so that is all tending can earn
+        uint256 _blocks = _blocksUntilHarvest();
+        if (_blocks == 0) return false;
+
+        // what adjustPosition would put to work
+        uint256 _idleValue = _idleWant();
+        uint256 _unstakedLP = balanceOfUnstakedLPToken();
+        if (_idleValue == 0 && _unstakedLP == 0) return false;
+        if (_unstakedLP > 0) {
+            _idleValue = _idleValue.add(
+                liquidityPool.amountLPtoLD(_unstakedLP)
+            );
+        }
+
+        uint256 _emissions =
+            _emissionsFor(
+                liquidityPool,
+                liquidityPoolIDInLPStaking,
+                _idleValue,
+                _blocks
+            );
+        return stgToWant(_emissions) > ethToWant(callCostInWei);
+    }
+
     function prepareMigration(address _newStrategy) internal override {
         _emergencyUnstakeLP();
-        lpToken.safeTransfer(_newStrategy, balanceOfUnstakedLPToken());
+        lpToken().safeTransfer(_newStrategy, balanceOfUnstakedLPToken());
     }
 
     // Override this to add all tokens/tokenized positions this contract manages
@@ -310,47 +378,23 @@ contract Strategy is BaseStrategy {
         returns (address[] memory)
     {}
 
-    /**
-     * @notice
-     *  Provide an accurate conversion from `_amtInWei` (denominated in wei)
-     *  to `want` (using the native decimal characteristics of `want`).
-     * @dev
-     *  Care must be taken when working with decimals to assure that the conversion
-     *  is compatible. As an example:
-     *
-     *      given 1e17 wei (0.1 ETH) as input, and want is USDC (6 decimals),
-     *      with USDC/ETH = 1800, this should give back 1800000000 (180 USDC)
-     *
-     * @param _amtInWei The amount (in wei/1e-18 ETH) to convert to `want`
-     * @return The amount in `want` of `_amtInEth` converted to `want`
-     **/
-    function ethToWant(uint256 _amtInWei)
-        public
-        view
-        virtual
-        override
-        returns (uint256)
-    {
-        int256 price = priceFeed.latestAnswer();
-        if (price == 0) {
-            return _amtInWei;
-        }
-        require(price >= 0, "SafeCast: value must be positive");
-        return
-            _amtInWei.div(uint256(price)).mul(
-                IDetailedERC20(address(want)).decimals()
-            );
-    }
-
     // --------- UTILITY & HELPER FUNCTIONS ------------
 
-    function _addToLP(uint256 _amount) internal {
-        // Nice! DRY principle
-        _amount = Math.min(balanceOfWant(), _amount); // we don't want to add to LP more than we have
-        _checkAllowance(address(stargateRouter), address(want), _amount);
+    // callers make sure we hold at least _amount of want
+    function _addToLP(uint256 _amount) internal virtual {
         stargateRouter.addLiquidity(liquidityPoolID, _amount, address(this));
     }
 
+    // Moves the want allowance over if the pool ever points to a new router
+    function updateStargateRouter() external onlyVaultManagers {
+        address _router = liquidityPool.router();
+        if (_router == address(stargateRouter)) return;
+
+        want.safeApprove(address(stargateRouter), 0);
+        want.safeApprove(_router, max);
+        stargateRouter = IStargateRouter(_router);
+    }
+
     function withdrawFromLP(uint256 lpAmount) external onlyVaultManagers {
         if (lpAmount > 0 && balanceOfUnstakedLPToken() > 0) {
             _withdrawFromLP(lpAmount);
@@ -359,13 +403,39 @@ contract Strategy is BaseStrategy {
 
     function _withdrawFromLP(uint256 _lpAmount) internal {
         _lpAmount = Math.min(balanceOfUnstakedLPToken(), _lpAmount); // we don't want to withdraw more than we have
+        _redeemLP(_lpAmount);
+    }
+
+    function _redeemLP(uint256 _lpAmount) internal {
         stargateRouter.instantRedeemLocal(
-            uint16(liquidityPoolID),
+            liquidityPoolID,
             _lpAmount,
             address(this)
         );
     }
 
+    // Redeems as much of the position as Stargate can pay out, and tracks the rest
+    function _redeemAvailable() internal {
+        uint256 _unstakedLP = balanceOfUnstakedLPToken();
+        uint256 _totalLP = _unstakedLP.add(balanceOfStakedLPToken());
+        uint256 _lpToRedeem =
+            Math.min(_totalLP, _instantlyRedeemableLP(liquidityPool));
+        if (_lpToRedeem > _unstakedLP) {
+            lpStaker.withdraw(
+                liquidityPoolIDInLPStaking,
+                _lpToRedeem.sub(_unstakedLP)
+            );
+        }
+        if (_lpToRedeem > 0) {
+            _redeemLP(_lpToRedeem);
+        }
+
+        uint256 _remainingLP = _totalLP.sub(_lpToRedeem);
+        pendingRedemption = _remainingLP > 0
+            ? liquidityPool.amountLPtoLD(_remainingLP)
+            : 0;
+    }
+
     function _stakeLP(uint256 _amountToStake) internal {
         lpStaker.deposit(liquidityPoolIDInLPStaking, _amountToStake);
     }
@@ -389,8 +459,29 @@ contract Strategy is BaseStrategy {
         lpStaker.emergencyWithdraw(liquidityPoolIDInLPStaking);
     }
 
-    function balanceOfWant() public view returns (uint256) {
-        return want.balanceOf(address(this));
+    function _snapshotPosition()
+        internal
+        view
+        returns (PositionSnapshot memory _position)
+    {
+        _position.looseWant = balanceOfWant();
+        _position.unstakedLP = balanceOfUnstakedLPToken();
+        _position.stakedLP = balanceOfStakedLPToken();
+        uint256 _totalLPTokenBalance =
+            _position.unstakedLP.add(_position.stakedLP);
+        if (_totalLPTokenBalance > 0) {
+            _position.valueOfLP = liquidityPool.amountLPtoLD(
+                _totalLPTokenBalance
+            );
+        }
+    }
+
+    function _estimatedTotalAssets(PositionSnapshot memory _position)
+        internal
+        pure
+        returns (uint256)
+    {
+        return _position.looseWant.add(_position.valueOfLP);
     }
 
     function valueOfLPTokens() public view returns (uint256) {
@@ -403,8 +494,12 @@ contract Strategy is BaseStrategy {
         return balanceOfUnstakedLPToken().add(balanceOfStakedLPToken());
     }
 
+    function lpToken() public view returns (IERC20) {
+        return IERC20(address(liquidityPool));
+    }
+
     function balanceOfUnstakedLPToken() public view returns (uint256) {
-        return lpToken.balanceOf(address(this));
+        return lpToken().balanceOf(address(this));
     }
 
     function balanceOfStakedLPToken() public view returns (uint256) {
@@ -412,53 +507,61 @@ contract Strategy is BaseStrategy {
             lpStaker.userInfo(liquidityPoolIDInLPStaking, address(this)).amount;
     }
 
-    function balanceOfSTG() public view returns (uint256) {
-        return STG.balanceOf(address(this));
-    }
-
-    // _checkAllowance adapted from https://github.com/therealmonoloco/liquity-stability-pool-strategy/blob/1fb0b00d24e0f5621f1e57def98c26900d551089/contracts/Strategy.sol#L316
-
-    function _checkAllowance(
-        address _contract,
-        address _token,
-        uint256 _amount
-    ) internal {
-        if (IERC20(_token).allowance(address(this), _contract) < _amount) {
-            IERC20(_token).safeApprove(_contract, 0);
-            IERC20(_token).safeApprove(_contract, _amount);
-        }
+    // Sells all STG for want, at no less than the oracle price minus the slippage allowed.
+    // A failed swap leaves the STG for the next harvest rather than blocking this one.
+    function _compoundRewards() internal {
+        uint256 _amountIn = balanceOfSTG();
+        uint256 _expectedOut = stgToWant(_amountIn);
+        if (_expectedOut == 0) return;
+
+        try
+            compoundRouter.swapExactTokensForTokens(
+                _amountIn,
+                _expectedOut.mul(MAX_BPS.sub(compoundSlippageBps)).div(MAX_BPS),
+                compoundPath,
+                address(this),
+                block.timestamp
+            )
+        {} catch {}
     }
 
-    function _claimRewards() internal {
+    function _claimRewards() internal override {
         if (pendingSTGRewards() > 0) {
             _stakeLP(0);
         }
     }
 
-    function claimRewards() external onlyVaultManagers {
-        _claimRewards();
-    }
-
-    // ----------------- YSWAPS FUNCTIONS ---------------------
-
-    function setTradeFactory(address _tradeFactory) external onlyGovernance {
-        if (tradeFactory != address(0)) {
-            _removeTradeFactoryPermissions();
+    // Turns on selling STG inside harvest through a Uniswap V2 style router, so rewards
+    // are reported and redeposited in the same transaction. The STG price feed bounds
+    // the fill. _router == address(0) turns it off and leaves the STG to ySwaps.
+    function setCompounding(
+        address _router,
+        address[] calldata _path,
+        uint16 _slippageBps
+    ) external onlyGovernance {
+        if (address(compoundRouter) != address(0)) {
+            STG.safeApprove(address(compoundRouter), 0);
+        }
+        if (_router == address(0)) {
+            compounding = false;
+            compoundRouter = IUniswapV2Router(0);
+            delete compoundPath;
+            return;
         }
 
-        // approve and set up trade factory
-        STG.safeApprove(_tradeFactory, max);
-        ITradeFactory tf = ITradeFactory(_tradeFactory);
-        tf.enable(address(STG), address(want));
-        tradeFactory = _tradeFactory;
-    }
-
-    function removeTradeFactoryPermissions() external onlyEmergencyAuthorized {
-        _removeTradeFactoryPermissions();
-    }
-
-    function _removeTradeFactoryPermissions() internal {
-        STG.safeApprove(tradeFactory, 0);
-        tradeFactory = address(0);
+        require(
+            _path.length >= 2 &&
+                _path[0] == address(STG) &&
+                _path[_path.length - 1] == address(want),
+            "!path"
+        );
+        require(_slippageBps <= MAX_BPS);
+        require(stgToWant(1e18) > 0, "!feed");
+
+        STG.safeApprove(_router, max);
+        compounding = true;
+        compoundRouter = IUniswapV2Router(_router);
+        compoundSlippageBps = _slippageBps;
+        compoundPath = _path;
     }
 }
@@ -0,0 +1,112 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+pragma experimental ABIEncoderV2;
+
+import "./Strategy.sol";
+
+contract StrategyFactory {
+    struct CloneParams {
+        address vault;
+        address lpStaker;
+        uint16 liquidityPoolIDInLPStaking;
+        address priceFeed;
+        string strategyName;
+        bytes32 salt;
+    }
+
+    address public immutable original;
+    bytes32 public immutable cloneCodeHash;
+
+    event Cloned(address indexed clone, address indexed vault, bytes32 salt);
+
+    constructor(address _original) public {
+        original = _original;
+        cloneCodeHash = keccak256(_cloneCode(_original));
+    }
+
+    // Deploys and initializes one EIP-1167 clone per entry. Addresses are deterministic
+    // (CREATE2 on the caller and salt) so they can be registered before the rollout.
+    function cloneMany(
+        CloneParams[] calldata _params,
+        address _strategist,
+        address _rewards,
+        address _keeper
+    ) external returns (address[] memory newStrategies) {
+        bytes memory _code = _cloneCode(original);
+        newStrategies = new address[](_params.length);
+
+        for (uint256 i = 0; i < _params.length; i++) {
+            newStrategies[i] = _deployClone(
+                _code,
+                _strategist,
+                _rewards,
+                _keeper,
+                _params[i]
+            );
+        }
+    }
+
+    function _deployClone(
+        bytes memory _code,
+        address _strategist,
+        address _rewards,
+        address _keeper,
+        CloneParams calldata _clone
+    ) internal returns (address payable newStrategy) {
+        bytes32 _salt = _callerSalt(msg.sender, _clone.salt);
+        assembly {
+            newStrategy := create2(0, add(_code, 0x20), mload(_code), _salt)
+        }
+        require(newStrategy != address(0), "!create2");
+
+        Strategy(newStrategy).initialize(
+            _clone.vault,
+            _strategist,
+            _rewards,
+            _keeper,
+            _clone.lpStaker,
+            _clone.liquidityPoolIDInLPStaking,
+            _clone.priceFeed,
+            _clone.strategyName
+        );
+
+        emit Cloned(newStrategy, _clone.vault, _clone.salt);
+    }
+
+    function predictCloneAddress(address _deployer, bytes32 _salt)
+        external
+        view
+        returns (address)
+    {
+        bytes32 _hash =
+            keccak256(
+                abi.encodePacked(
+                    bytes1(0xff),
+                    address(this),
+                    _callerSalt(_deployer, _salt),
+                    cloneCodeHash
+                )
+            );
+        return address(uint160(uint256(_hash)));
+    }
+
+    // Salts are namespaced by caller so nobody can squat someone else's predicted address
+    function _callerSalt(address _deployer, bytes32 _salt)
+        internal
+        pure
+        returns (bytes32)
+    {
+        return keccak256(abi.encodePacked(_deployer, _salt));
+    }
+
+    // EIP-1167 bytecode
+    function _cloneCode(address _target) internal pure returns (bytes memory) {
+        return
+            abi.encodePacked(
+                hex"3d602d80600a3d3981f3363d3d373d3d3d363d73",
+                _target,
+                hex"5af43d82803e903d91602b57fd5bf3"
+            );
+    }
+}
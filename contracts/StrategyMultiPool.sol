@@ -0,0 +1,570 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+pragma experimental ABIEncoderV2;
+
+import "@openzeppelin/contracts/math/Math.sol";
+import {IERC20} from "@openzeppelin/contracts/token/ERC20/SafeERC20.sol";
+
+import "../interfaces/Stargate/IStargateRouter.sol";
+import "../interfaces/Stargate/IPool.sol";
+import "./BaseStargateStrategy.sol";
+
+// Farms several Stargate pools backed by `want` from one LPStaking contract behind a
+// single harvest: the STG of every pool is claimed in the same pass and sold once
+// through the trade factory. New deposits go to the pool that pays the most STG per
+// unit of liquidity, withdrawals come out of the one that pays the least.
+contract StrategyMultiPool is BaseStargateStrategy {
+    struct FarmedPool {
+        IPool liquidityPool; // also the LP token
+        uint16 liquidityPoolID;
+        uint16 liquidityPoolIDInLPStaking;
+    }
+
+    IStargateRouter public stargateRouter; // shared by every pool on a chain
+    bool internal isOriginal = true;
+
+    FarmedPool[] public pools;
+
+    constructor(
+        address _vault,
+        address _lpStaker,
+        uint16[] memory _liquidityPoolIDsInLPStaking,
+        address _priceFeed,
+        string memory _strategyName
+    ) public BaseStargateStrategy(_vault) {
+        _initializeThis(
+            _lpStaker,
+            _liquidityPoolIDsInLPStaking,
+            _priceFeed,
+            _strategyName
+        );
+    }
+
+    function initialize(
+        address _vault,
+        address _strategist,
+        address _rewards,
+        address _keeper,
+        address _lpStaker,
+        uint16[] memory _liquidityPoolIDsInLPStaking,
+        address _priceFeed,
+        string memory _strategyName
+    ) public {
+        require(address(lpStaker) == address(0)); // dev: strategy already initialized
+
+        _initialize(_vault, _strategist, _rewards, _keeper);
+        _initializeThis(
+            _lpStaker,
+            _liquidityPoolIDsInLPStaking,
+            _priceFeed,
+            _strategyName
+        );
+    }
+
+    function _initializeThis(
+        address _lpStaker,
+        uint16[] memory _liquidityPoolIDsInLPStaking,
+        address _priceFeed,
+        string memory _strategyName
+    ) internal {
+        _initializeShared(_lpStaker, _priceFeed, _strategyName);
+
+        for (uint256 i = 0; i < _liquidityPoolIDsInLPStaking.length; i++) {
+            _addPool(_liquidityPoolIDsInLPStaking[i]);
+        }
+    }
+
+    function clone(
+        address _vault,
+        address _strategist,
+        address _rewards,
+        address _keeper,
+        address _lpStaker,
+        uint16[] memory _liquidityPoolIDsInLPStaking,
+        address _priceFeed,
+        string memory _strategyName
+    ) external returns (address payable newStrategy) {
+        require(isOriginal);
+
+        newStrategy = _cloneThis();
+        StrategyMultiPool(newStrategy).initialize(
+            _vault,
+            _strategist,
+            _rewards,
+            _keeper,
+            _lpStaker,
+            _liquidityPoolIDsInLPStaking,
+            _priceFeed,
+            _strategyName
+        );
+
+        emit Cloned(newStrategy);
+    }
+
+    // ----------------- POOLS ---------------------
+
+    function poolsLength() external view returns (uint256) {
+        return pools.length;
+    }
+
+    function addPool(uint16 _liquidityPoolIDInLPStaking)
+        external
+        onlyGovernance
+    {
+        _addPool(_liquidityPoolIDInLPStaking);
+    }
+
+    function _addPool(uint16 _liquidityPoolIDInLPStaking) internal {
+        for (uint256 i = 0; i < pools.length; i++) {
+            require(
+                pools[i].liquidityPoolIDInLPStaking !=
+                    _liquidityPoolIDInLPStaking,
+                "!exists"
+            );
+        }
+
+        IPool _liquidityPool =
+            IPool(
+                address(lpStaker.poolInfo(_liquidityPoolIDInLPStaking).lpToken)
+            );
+        require(_liquidityPool.token() == address(want), "!want");
+
+        address _router = _liquidityPool.router();
+        if (address(stargateRouter) == address(0)) {
+            stargateRouter = IStargateRouter(_router);
+            want.safeApprove(_router, max);
+        } else {
+            require(_router == address(stargateRouter), "!router");
+        }
+
+        IERC20(address(_liquidityPool)).safeApprove(address(lpStaker), max);
+        pools.push(
+            FarmedPool(
+                _liquidityPool,
+                uint16(_liquidityPool.poolId()),
+                _liquidityPoolIDInLPStaking
+            )
+        );
+    }
+
+    // Redeems the whole position in a pool and stops farming it
+    function removePool(uint256 _index) external onlyVaultManagers {
+        FarmedPool memory _pool = pools[_index];
+        uint256 _staked = _stakedLP(_pool);
+        if (_staked > 0) {
+            lpStaker.withdraw(_pool.liquidityPoolIDInLPStaking, _staked);
+        }
+        uint256 _unstaked = _unstakedLP(_pool);
+        if (_unstaked > 0) {
+            _redeemLP(_pool, _unstaked);
+        }
+        require(_unstakedLP(_pool) == 0, "!liquidity");
+
+        IERC20(address(_pool.liquidityPool)).safeApprove(address(lpStaker), 0);
+        pools[_index] = pools[pools.length - 1];
+        pools.pop();
+    }
+
+    // ----------------- STRATEGY ---------------------
+
+    function estimatedTotalAssets() public view override returns (uint256) {
+        uint256 _totalAssets = balanceOfWant();
+        for (uint256 i = 0; i < pools.length; i++) {
+            _totalAssets = _totalAssets.add(valueOfLPTokens(i));
+        }
+        return _totalAssets;
+    }
+
+    function pendingSTGRewards()
+        public
+        view
+        override
+        returns (uint256 _pending)
+    {
+        for (uint256 i = 0; i < pools.length; i++) {
+            _pending = _pending.add(
+                lpStaker.pendingStargate(
+                    pools[i].liquidityPoolIDInLPStaking,
+                    address(this)
+                )
+            );
+        }
+    }
+
+    // Same fields as Strategy.strategyState, with the LP of every pool added up
+    function strategyState()
+        external
+        view
+        returns (StrategyState memory _state)
+    {
+        _state.looseWant = balanceOfWant();
+        for (uint256 i = 0; i < pools.length; i++) {
+            FarmedPool memory _pool = pools[i];
+            uint256 _unstaked = _unstakedLP(_pool);
+            uint256 _staked = _stakedLP(_pool);
+            _state.unstakedLP = _state.unstakedLP.add(_unstaked);
+            _state.stakedLP = _state.stakedLP.add(_staked);
+            if (_unstaked.add(_staked) > 0) {
+                _state.valueOfLP = _state.valueOfLP.add(
+                    _pool.liquidityPool.amountLPtoLD(_unstaked.add(_staked))
+                );
+            }
+        }
+        _state.pendingSTG = pendingSTGRewards();
+        _state.balanceOfSTG = balanceOfSTG();
+        _state.estimatedTotalAssets = _state.looseWant.add(_state.valueOfLP);
+    }
+
+    function prepareReturn(uint256 _debtOutstanding)
+        internal
+        override
+        returns (
+            uint256 _profit,
+            uint256 _loss,
+            uint256 _debtPayment
+        )
+    {
+        _claimRewards();
+
+        uint256 _vaultDebt = vault.strategies(address(this)).totalDebt;
+        uint256 _totalAssets = estimatedTotalAssets();
+        _profit = _totalAssets > _vaultDebt ? _totalAssets.sub(_vaultDebt) : 0;
+
+        uint256 _toLiquidate = _debtOutstanding.add(_profit);
+        uint256 _looseWant = balanceOfWant();
+        if (_toLiquidate > _looseWant) {
+            // a shortfall here is already counted below as _vaultDebt - _totalAssets
+            _withdrawSome(_toLiquidate.sub(_looseWant));
+            _looseWant = balanceOfWant();
+            _totalAssets = estimatedTotalAssets();
+        }
+
+        _debtPayment = Math.min(_debtOutstanding, _looseWant);
+        pendingRedemption = Math.min(
+            _debtOutstanding.sub(_debtPayment),
+            _totalAssets.sub(_looseWant)
+        );
+        _loss = _vaultDebt > _totalAssets ? _vaultDebt.sub(_totalAssets) : 0;
+
+        if (_loss > _profit) {
+            _loss = _loss.sub(_profit);
+            _profit = 0;
+        } else {
+            _profit = _profit.sub(_loss);
+            _loss = 0;
+        }
+        // profit still in LP Stargate could not redeem is reported once it is paid out
+        _profit = Math.min(_profit, _looseWant.sub(_debtPayment));
+    }
+
+    function adjustPosition(uint256 _debtOutstanding) internal override {
+        uint256 _length = pools.length;
+        if (emergencyExit) {
+            // an exit Stargate could not pay out in one go is stepped by tend
+            for (uint256 i = 0; i < _length; i++) {
+                _redeemAvailable(pools[i]);
+            }
+            pendingRedemption = estimatedTotalAssets().sub(balanceOfWant());
+            return;
+        }
+        if (_length == 0) return;
+
+        uint256 _looseWant = balanceOfWant();
+        if (_looseWant > _debtOutstanding) {
+            uint256 _amountToDeposit = _looseWant.sub(_debtOutstanding);
+            stargateRouter.addLiquidity(
+                pools[_bestPool(_amountToDeposit)].liquidityPoolID,
+                _amountToDeposit,
+                address(this)
+            );
+        }
+
+        for (uint256 i = 0; i < _length; i++) {
+            FarmedPool memory _pool = pools[i];
+            uint256 _unstaked = _unstakedLP(_pool);
+            if (_unstaked > 0) {
+                lpStaker.deposit(_pool.liquidityPoolIDInLPStaking, _unstaked);
+            }
+        }
+    }
+
+    // Frees up to _amountNeeded of want, starting with the pool that pays the least STG.
+    // _heldBack is what the LP Stargate could not pay out along the way is worth.
+    function _withdrawSome(uint256 _amountNeeded)
+        internal
+        returns (uint256 _heldBack)
+    {
+        uint256 _length = pools.length;
+        uint256[] memory _rates = _rewardRates(0);
+        bool[] memory _visited = new bool[](_length);
+
+        for (uint256 n = 0; n < _length && _amountNeeded > 0; n++) {
+            uint256 _worst = max;
+            for (uint256 i = 0; i < _length; i++) {
+                if (
+                    !_visited[i] &&
+                    (_worst == max || _rates[i] < _rates[_worst])
+                ) {
+                    _worst = i;
+                }
+            }
+            _visited[_worst] = true;
+
+            (uint256 _freed, uint256 _poolHeldBack) =
+                _withdrawFrom(pools[_worst], _amountNeeded);
+            _heldBack = _heldBack.add(_poolHeldBack);
+            _amountNeeded = _amountNeeded > _freed
+                ? _amountNeeded.sub(_freed)
+                : 0;
+        }
+    }
+
+    // Redeems the LP worth _amount in one pool, capped at what Stargate can pay out now
+    function _withdrawFrom(FarmedPool memory _pool, uint256 _amount)
+        internal
+        returns (uint256 _freed, uint256 _heldBack)
+    {
+        uint256 _unstaked = _unstakedLP(_pool);
+        uint256 _totalLP = _unstaked.add(_stakedLP(_pool));
+        if (_totalLP == 0) return (0, 0);
+
+        uint256 _lpNeeded =
+            _lpForWant(
+                _pool.liquidityPool,
+                _totalLP,
+                _pool.liquidityPool.amountLPtoLD(_totalLP),
+                _amount
+            );
+        uint256 _lpToRedeem =
+            Math.min(_lpNeeded, _instantlyRedeemableLP(_pool.liquidityPool));
+        if (_lpToRedeem > 0) {
+            if (_lpToRedeem > _unstaked) {
+                lpStaker.withdraw(
+                    _pool.liquidityPoolIDInLPStaking,
+                    _lpToRedeem.sub(_unstaked)
+                );
+            }
+            uint256 _before = balanceOfWant();
+            _redeemLP(_pool, _lpToRedeem);
+            _freed = balanceOfWant().sub(_before);
+        }
+        if (_lpNeeded > _lpToRedeem) {
+            _heldBack = _heldBackValue(
+                _pool.liquidityPool,
+                _lpNeeded.sub(_lpToRedeem)
+            );
+        }
+    }
+
+    function liquidatePosition(uint256 _amountNeeded)
+        internal
+        override
+        returns (uint256 _liquidatedAmount, uint256 _loss)
+    {
+        uint256 _liquidAssets = balanceOfWant();
+        uint256 _heldBack;
+
+        if (_liquidAssets < _amountNeeded) {
+            _heldBack = _withdrawSome(_amountNeeded.sub(_liquidAssets));
+            _liquidAssets = balanceOfWant();
+            // see Strategy.liquidatePosition
+            uint256 _covered =
+                _heldBack > 0 ? estimatedTotalAssets() : _liquidAssets;
+            _loss = _amountNeeded > _covered ? _amountNeeded.sub(_covered) : 0;
+        }
+
+        _liquidatedAmount = Math.min(_amountNeeded, _liquidAssets);
+        _checkLiquidation(_amountNeeded, _liquidatedAmount, _loss, _heldBack);
+    }
+
+    function liquidateAllPositions() internal override returns (uint256) {
+        for (uint256 i = 0; i < pools.length; i++) {
+            FarmedPool memory _pool = pools[i];
+            lpStaker.emergencyWithdraw(_pool.liquidityPoolIDInLPStaking);
+
+            uint256 _lpTokenBalance = _unstakedLP(_pool);
+            if (_lpTokenBalance > 0) {
+                // see Strategy.liquidateAllPositions
+                require(
+                    _lpTokenBalance <=
+                        _instantlyRedeemableLP(_pool.liquidityPool),
+                    "!liquidity"
+                );
+                _redeemLP(_pool, _lpTokenBalance);
+            }
+        }
+        pendingRedemption = 0;
+        return balanceOfWant();
+    }
+
+    // Like Strategy.tendTrigger: idle want would go to the best paying pool and
+    // stray LP is staked in its own pool. An exit is tended as Stargate
+    // liquidity comes back.
+    function tendTrigger(uint256 callCostInWei)
+        public
+        view
+        override
+        returns (bool)
+    {
+        uint256 _length = pools.length;
+        if (emergencyExit) {
+            for (uint256 i = 0; i < _length; i++) {
+                FarmedPool memory _pool = pools[i];
+                if (
+                    _unstakedLP(_pool).add(_stakedLP(_pool)) > 0 &&
+                    _instantlyRedeemableLP(_pool.liquidityPool) > 0
+                ) return true;
+            }
+            return false;
+        }
+        if (_length == 0) return false;
+
+        uint256 _blocks = _blocksUntilHarvest();
+        if (_blocks == 0) return false;
+
+        uint256 _idle = _idleWant();
+        uint256 _best = _idle > 0 ? _bestPool(_idle) : _length;
+        uint256 _emissions;
+        for (uint256 i = 0; i < _length; i++) {
+            FarmedPool memory _pool = pools[i];
+            uint256 _value = i == _best ? _idle : 0;
+            uint256 _unstaked = _unstakedLP(_pool);
+            if (_unstaked > 0) {
+                _value = _value.add(
+                    _pool.liquidityPool.amountLPtoLD(_unstaked)
+                );
+            }
+            if (_value > 0) {
+                _emissions = _emissions.add(
+                    _emissionsFor(
+                        _pool.liquidityPool,
+                        _pool.liquidityPoolIDInLPStaking,
+                        _value,
+                        _blocks
+                    )
+                );
+            }
+        }
+        return stgToWant(_emissions) > ethToWant(callCostInWei);
+    }
+
+    function prepareMigration(address _newStrategy) internal override {
+        for (uint256 i = 0; i < pools.length; i++) {
+            FarmedPool memory _pool = pools[i];
+            lpStaker.emergencyWithdraw(_pool.liquidityPoolIDInLPStaking);
+            IERC20(address(_pool.liquidityPool)).safeTransfer(
+                _newStrategy,
+                _unstakedLP(_pool)
+            );
+        }
+    }
+
+    function protectedTokens()
+        internal
+        view
+        override
+        returns (address[] memory)
+    {}
+
+    // --------- UTILITY & HELPER FUNCTIONS ------------
+
+    // STG per block each pool pays per unit of want staked in it, once _extra more is
+    // staked, scaled by allocation points only since stargatePerBlock is the same for all
+    function _rewardRates(uint256 _extra)
+        internal
+        view
+        returns (uint256[] memory _rates)
+    {
+        _rates = new uint256[](pools.length);
+        for (uint256 i = 0; i < pools.length; i++) {
+            FarmedPool memory _pool = pools[i];
+            uint256 _pid = _pool.liquidityPoolIDInLPStaking;
+            uint256 _stakedInPool = lpStaker.lpBalances(_pid);
+            uint256 _poolValue =
+                _stakedInPool > 0
+                    ? _pool.liquidityPool.amountLPtoLD(_stakedInPool)
+                    : 0;
+            _rates[i] = lpStaker.poolInfo(_pid).allocPoint.mul(1e18).div(
+                _poolValue.add(_extra).add(1)
+            );
+        }
+    }
+
+    // Index of the pool paying the most STG per unit of want once _amount more
+    // is staked in it, callers make sure there is at least one pool
+    function _bestPool(uint256 _amount) internal view returns (uint256 _best) {
+        uint256[] memory _rates = _rewardRates(_amount);
+        for (uint256 i = 1; i < _rates.length; i++) {
+            if (_rates[i] > _rates[_best]) _best = i;
+        }
+    }
+
+    // Redeems as much of a pool's position as Stargate can pay out
+    function _redeemAvailable(FarmedPool memory _pool) internal {
+        uint256 _unstaked = _unstakedLP(_pool);
+        uint256 _lpToRedeem =
+            Math.min(
+                _unstaked.add(_stakedLP(_pool)),
+                _instantlyRedeemableLP(_pool.liquidityPool)
+            );
+        if (_lpToRedeem > _unstaked) {
+            lpStaker.withdraw(
+                _pool.liquidityPoolIDInLPStaking,
+                _lpToRedeem.sub(_unstaked)
+            );
+        }
+        if (_lpToRedeem > 0) {
+            _redeemLP(_pool, _lpToRedeem);
+        }
+    }
+
+    function _redeemLP(FarmedPool memory _pool, uint256 _lpAmount) internal {
+        stargateRouter.instantRedeemLocal(
+            _pool.liquidityPoolID,
+            _lpAmount,
+            address(this)
+        );
+    }
+
+    function _unstakedLP(FarmedPool memory _pool)
+        internal
+        view
+        returns (uint256)
+    {
+        return IERC20(address(_pool.liquidityPool)).balanceOf(address(this));
+    }
+
+    function _stakedLP(FarmedPool memory _pool)
+        internal
+        view
+        returns (uint256)
+    {
+        return
+            lpStaker
+                .userInfo(_pool.liquidityPoolIDInLPStaking, address(this))
+                .amount;
+    }
+
+    function balanceOfAllLPToken(uint256 _index) public view returns (uint256) {
+        FarmedPool memory _pool = pools[_index];
+        return _unstakedLP(_pool).add(_stakedLP(_pool));
+    }
+
+    function valueOfLPTokens(uint256 _index) public view returns (uint256) {
+        uint256 _totalLPTokenBalance = balanceOfAllLPToken(_index);
+        if (_totalLPTokenBalance == 0) return 0;
+        return
+            pools[_index].liquidityPool.amountLPtoLD(_totalLPTokenBalance);
+    }
+
+    // One claim per pool, the STG of all of them is then sold in a single trade
+    function _claimRewards() internal override {
+        for (uint256 i = 0; i < pools.length; i++) {
+            uint256 _pid = pools[i].liquidityPoolIDInLPStaking;
+            if (lpStaker.pendingStargate(_pid, address(this)) > 0) {
+                lpStaker.deposit(_pid, 0);
+            }
+        }
+    }
+}
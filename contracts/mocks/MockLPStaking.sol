@@ -0,0 +1,179 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+
+import "@openzeppelin/contracts/math/SafeMath.sol";
+import "@openzeppelin/contracts/math/Math.sol";
+import {SafeERC20, IERC20} from "@openzeppelin/contracts/token/ERC20/SafeERC20.sol";
+
+// Local stand-in for Stargate's LPStaking (a MasterChef). Rewards are paid out of
+// the STG balance held by this contract, so fund it before mining blocks.
+contract MockLPStaking {
+    using SafeMath for uint256;
+    using SafeERC20 for IERC20;
+
+    struct UserInfo {
+        uint256 amount;
+        uint256 rewardDebt;
+    }
+
+    struct PoolInfo {
+        IERC20 lpToken;
+        uint256 allocPoint;
+        uint256 lastRewardBlock;
+        uint256 accStargatePerShare;
+    }
+
+    IERC20 public stargate;
+    uint256 public stargatePerBlock;
+    uint256 public totalAllocPoint;
+
+    PoolInfo[] public poolInfo;
+    uint256[] public lpBalances;
+    mapping(uint256 => mapping(address => UserInfo)) public userInfo;
+
+    event Deposit(address indexed user, uint256 indexed pid, uint256 amount);
+    event Withdraw(address indexed user, uint256 indexed pid, uint256 amount);
+    event EmergencyWithdraw(
+        address indexed user,
+        uint256 indexed pid,
+        uint256 amount
+    );
+
+    constructor(address _stargate, uint256 _stargatePerBlock) public {
+        stargate = IERC20(_stargate);
+        stargatePerBlock = _stargatePerBlock;
+    }
+
+    function poolLength() external view returns (uint256) {
+        return poolInfo.length;
+    }
+
+    function add(uint256 _allocPoint, address _lpToken) external {
+        totalAllocPoint = totalAllocPoint.add(_allocPoint);
+        poolInfo.push(
+            PoolInfo({
+                lpToken: IERC20(_lpToken),
+                allocPoint: _allocPoint,
+                lastRewardBlock: block.number,
+                accStargatePerShare: 0
+            })
+        );
+        lpBalances.push(0);
+    }
+
+    function setStargatePerBlock(uint256 _stargatePerBlock) external {
+        massUpdatePools();
+        stargatePerBlock = _stargatePerBlock;
+    }
+
+    function pendingStargate(uint256 _pid, address _user)
+        external
+        view
+        returns (uint256)
+    {
+        PoolInfo storage pool = poolInfo[_pid];
+        UserInfo storage user = userInfo[_pid][_user];
+        uint256 accStargatePerShare = pool.accStargatePerShare;
+        uint256 lpSupply = lpBalances[_pid];
+        if (block.number > pool.lastRewardBlock && lpSupply != 0) {
+            uint256 stargateReward = _poolReward(pool);
+            accStargatePerShare = accStargatePerShare.add(
+                stargateReward.mul(1e12).div(lpSupply)
+            );
+        }
+        return
+            user.amount.mul(accStargatePerShare).div(1e12).sub(user.rewardDebt);
+    }
+
+    function massUpdatePools() public {
+        for (uint256 pid = 0; pid < poolInfo.length; ++pid) {
+            updatePool(pid);
+        }
+    }
+
+    function updatePool(uint256 _pid) public {
+        PoolInfo storage pool = poolInfo[_pid];
+        if (block.number <= pool.lastRewardBlock) {
+            return;
+        }
+        uint256 lpSupply = lpBalances[_pid];
+        if (lpSupply == 0) {
+            pool.lastRewardBlock = block.number;
+            return;
+        }
+        pool.accStargatePerShare = pool.accStargatePerShare.add(
+            _poolReward(pool).mul(1e12).div(lpSupply)
+        );
+        pool.lastRewardBlock = block.number;
+    }
+
+    function deposit(uint256 _pid, uint256 _amount) external {
+        PoolInfo storage pool = poolInfo[_pid];
+        UserInfo storage user = userInfo[_pid][msg.sender];
+        updatePool(_pid);
+        if (user.amount > 0) {
+            _safeStargateTransfer(
+                msg.sender,
+                user.amount.mul(pool.accStargatePerShare).div(1e12).sub(
+                    user.rewardDebt
+                )
+            );
+        }
+        pool.lpToken.safeTransferFrom(
+            address(msg.sender),
+            address(this),
+            _amount
+        );
+        user.amount = user.amount.add(_amount);
+        user.rewardDebt = user.amount.mul(pool.accStargatePerShare).div(1e12);
+        lpBalances[_pid] = lpBalances[_pid].add(_amount);
+        emit Deposit(msg.sender, _pid, _amount);
+    }
+
+    function withdraw(uint256 _pid, uint256 _amount) external {
+        PoolInfo storage pool = poolInfo[_pid];
+        UserInfo storage user = userInfo[_pid][msg.sender];
+        require(user.amount >= _amount, "withdraw: _amount is too large");
+        updatePool(_pid);
+        _safeStargateTransfer(
+            msg.sender,
+            user.amount.mul(pool.accStargatePerShare).div(1e12).sub(
+                user.rewardDebt
+            )
+        );
+        user.amount = user.amount.sub(_amount);
+        user.rewardDebt = user.amount.mul(pool.accStargatePerShare).div(1e12);
+        pool.lpToken.safeTransfer(address(msg.sender), _amount);
+        lpBalances[_pid] = lpBalances[_pid].sub(_amount);
+        emit Withdraw(msg.sender, _pid, _amount);
+    }
+
+    function emergencyWithdraw(uint256 _pid) external {
+        PoolInfo storage pool = poolInfo[_pid];
+        UserInfo storage user = userInfo[_pid][msg.sender];
+        uint256 amount = user.amount;
+        user.amount = 0;
+        user.rewardDebt = 0;
+        pool.lpToken.safeTransfer(address(msg.sender), amount);
+        lpBalances[_pid] = lpBalances[_pid].sub(amount);
+        emit EmergencyWithdraw(msg.sender, _pid, amount);
+    }
+
+    function _poolReward(PoolInfo storage _pool)
+        internal
+        view
+        returns (uint256)
+    {
+        uint256 _blocks = block.number.sub(_pool.lastRewardBlock);
+        return
+            _blocks.mul(stargatePerBlock).mul(_pool.allocPoint).div(
+                totalAllocPoint
+            );
+    }
+
+    function _safeStargateTransfer(address _to, uint256 _amount) internal {
+        uint256 stargateBal = stargate.balanceOf(address(this));
+        stargate.safeTransfer(_to, Math.min(_amount, stargateBal));
+    }
+}
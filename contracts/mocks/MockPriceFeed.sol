@@ -0,0 +1,30 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+
+// Local stand-in for a Chainlink aggregator with a settable answer.
+contract MockPriceFeed {
+    uint8 public decimals;
+    uint256 public latestRound;
+    mapping(uint256 => int256) public getAnswer;
+    mapping(uint256 => uint256) public getTimestamp;
+
+    constructor(uint8 _decimals, int256 _answer) public {
+        decimals = _decimals;
+        setAnswer(_answer);
+    }
+
+    function setAnswer(int256 _answer) public {
+        latestRound++;
+        getAnswer[latestRound] = _answer;
+        getTimestamp[latestRound] = block.timestamp;
+    }
+
+    function latestAnswer() external view returns (int256) {
+        return getAnswer[latestRound];
+    }
+
+    function latestTimestamp() external view returns (uint256) {
+        return getTimestamp[latestRound];
+    }
+}
@@ -0,0 +1,179 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+
+import "@openzeppelin/contracts/math/SafeMath.sol";
+import {SafeERC20, IERC20} from "@openzeppelin/contracts/token/ERC20/SafeERC20.sol";
+
+import "../../interfaces/IDetailedERC20.sol";
+
+// Local stand-in for a Stargate Pool: an LP token in shared decimals backed by `token`.
+// Like Stargate's LPTokenERC20 it does not block transfers to the zero address.
+contract MockStargatePool {
+    using SafeMath for uint256;
+    using SafeERC20 for IERC20;
+
+    string public name;
+    string public symbol;
+    uint8 public decimals;
+    uint256 public totalSupply;
+    mapping(address => uint256) public balanceOf;
+    mapping(address => mapping(address => uint256)) public allowance;
+
+    uint256 public poolId;
+    address public token;
+    address public router;
+    uint256 public convertRate;
+    uint256 public totalLiquidity; // in shared decimals
+    uint256 public deltaCredit; // what instantRedeemLocal can pay out, in shared decimals
+
+    event Approval(
+        address indexed owner,
+        address indexed spender,
+        uint256 value
+    );
+    event Transfer(address indexed from, address indexed to, uint256 value);
+
+    modifier onlyRouter() {
+        require(
+            msg.sender == router,
+            "Stargate: only the router can call this method"
+        );
+        _;
+    }
+
+    constructor(
+        uint256 _poolId,
+        address _token,
+        address _router,
+        uint8 _sharedDecimals,
+        string memory _name,
+        string memory _symbol
+    ) public {
+        poolId = _poolId;
+        token = _token;
+        router = _router;
+        decimals = _sharedDecimals;
+        uint256 _localDecimals = IDetailedERC20(_token).decimals();
+        convertRate = 10**(_localDecimals.sub(_sharedDecimals));
+        name = _name;
+        symbol = _symbol;
+    }
+
+    // ------------------------- STARGATE POOL -------------------------
+
+    function amountLPtoLD(uint256 _amountLP) external view returns (uint256) {
+        return _amountLPtoSD(_amountLP).mul(convertRate);
+    }
+
+    function mint(address _to, uint256 _amountLD)
+        external
+        onlyRouter
+        returns (uint256 amountSD)
+    {
+        amountSD = _amountLD.div(convertRate);
+        uint256 amountLP = amountSD;
+        if (totalLiquidity > 0) {
+            amountLP = amountSD.mul(totalSupply).div(totalLiquidity);
+        }
+        totalLiquidity = totalLiquidity.add(amountSD);
+        deltaCredit = deltaCredit.add(amountSD);
+        _mint(_to, amountLP);
+    }
+
+    function instantRedeemLocal(
+        address _from,
+        uint256 _amountLP,
+        address _to
+    ) external onlyRouter returns (uint256 amountSD) {
+        // like Stargate, only as much LP as the local delta credit covers is redeemed
+        uint256 _capAmountLP = _amountSDtoLP(deltaCredit);
+        if (_amountLP > _capAmountLP) {
+            _amountLP = _capAmountLP;
+        }
+        amountSD = _amountLPtoSD(_amountLP);
+        deltaCredit = deltaCredit.sub(amountSD);
+        _burn(_from, _amountLP);
+        totalLiquidity = totalLiquidity.sub(amountSD);
+        IERC20(token).safeTransfer(_to, amountSD.mul(convertRate));
+    }
+
+    // Points the pool at another router, the mainnet pools never change theirs.
+    function setRouter(address _router) external {
+        router = _router;
+    }
+
+    // Moves the LP exchange rate. Raising it needs the extra `token` to be sent to the pool.
+    function setTotalLiquidity(uint256 _totalLiquidity) external {
+        totalLiquidity = _totalLiquidity;
+    }
+
+    // Stands in for swaps and credits from other chains moving the instantly redeemable liquidity.
+    function setDeltaCredit(uint256 _deltaCredit) external {
+        deltaCredit = _deltaCredit;
+    }
+
+    function _amountSDtoLP(uint256 _amountSD) internal view returns (uint256) {
+        require(
+            totalLiquidity > 0,
+            "Stargate: cant convert SDtoLP when totalLiq == 0"
+        );
+        return _amountSD.mul(totalSupply).div(totalLiquidity);
+    }
+
+    function _amountLPtoSD(uint256 _amountLP) internal view returns (uint256) {
+        require(
+            totalSupply > 0,
+            "Stargate: cant convert LPtoSD when totalSupply == 0"
+        );
+        return _amountLP.mul(totalLiquidity).div(totalSupply);
+    }
+
+    // ------------------------- LP TOKEN -------------------------
+
+    function approve(address _spender, uint256 _value) external returns (bool) {
+        allowance[msg.sender][_spender] = _value;
+        emit Approval(msg.sender, _spender, _value);
+        return true;
+    }
+
+    function transfer(address _to, uint256 _value) external returns (bool) {
+        _transfer(msg.sender, _to, _value);
+        return true;
+    }
+
+    function transferFrom(
+        address _from,
+        address _to,
+        uint256 _value
+    ) external returns (bool) {
+        uint256 _allowance = allowance[_from][msg.sender];
+        if (_allowance != uint256(-1)) {
+            allowance[_from][msg.sender] = _allowance.sub(_value);
+        }
+        _transfer(_from, _to, _value);
+        return true;
+    }
+
+    function _mint(address _to, uint256 _value) internal {
+        totalSupply = totalSupply.add(_value);
+        balanceOf[_to] = balanceOf[_to].add(_value);
+        emit Transfer(address(0), _to, _value);
+    }
+
+    function _burn(address _from, uint256 _value) internal {
+        balanceOf[_from] = balanceOf[_from].sub(_value);
+        totalSupply = totalSupply.sub(_value);
+        emit Transfer(_from, address(0), _value);
+    }
+
+    function _transfer(
+        address _from,
+        address _to,
+        uint256 _value
+    ) internal {
+        balanceOf[_from] = balanceOf[_from].sub(_value);
+        balanceOf[_to] = balanceOf[_to].add(_value);
+        emit Transfer(_from, _to, _value);
+    }
+}
@@ -0,0 +1,57 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+
+import {SafeERC20, IERC20} from "@openzeppelin/contracts/token/ERC20/SafeERC20.sol";
+
+import "./MockStargatePool.sol";
+
+// Local stand-in for the Stargate Router, only the same-chain liquidity paths.
+contract MockStargateRouter {
+    using SafeERC20 for IERC20;
+
+    mapping(uint256 => MockStargatePool) public pools;
+
+    function createPool(uint256 _poolId, address _pool) external {
+        require(
+            address(pools[_poolId]) == address(0),
+            "Stargate: Pool already created"
+        );
+        pools[_poolId] = MockStargatePool(_pool);
+    }
+
+    function getPool(uint256 _poolId)
+        public
+        view
+        returns (MockStargatePool pool)
+    {
+        pool = pools[_poolId];
+        require(address(pool) != address(0), "Stargate: Pool does not exist");
+    }
+
+    function addLiquidity(
+        uint256 _poolId,
+        uint256 _amountLD,
+        address _to
+    ) external {
+        MockStargatePool pool = getPool(_poolId);
+        uint256 convertRate = pool.convertRate();
+        _amountLD = (_amountLD / convertRate) * convertRate;
+        IERC20(pool.token()).safeTransferFrom(
+            msg.sender,
+            address(pool),
+            _amountLD
+        );
+        pool.mint(_to, _amountLD);
+    }
+
+    function instantRedeemLocal(
+        uint16 _srcPoolId,
+        uint256 _amountLP,
+        address _to
+    ) external returns (uint256 amountSD) {
+        require(_to != address(0x0), "Stargate: _to cannot be 0x0");
+        MockStargatePool pool = getPool(_srcPoolId);
+        amountSD = pool.instantRedeemLocal(msg.sender, _amountLP, _to);
+    }
+}
@@ -0,0 +1,52 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+
+import "@openzeppelin/contracts/math/SafeMath.sol";
+
+import "./MockERC20.sol";
+
+// Fixed-rate swapper used behind MockTradeFactory: keeps `tokenIn` and mints
+// `tokenOut`.
+contract MockSwapper {
+    using SafeMath for uint256;
+
+    // amount of tokenOut per 1e18 tokenIn
+    mapping(address => mapping(address => uint256)) public rates;
+
+    function setRate(
+        address _tokenIn,
+        address _tokenOut,
+        uint256 _rate
+    ) external {
+        rates[_tokenIn][_tokenOut] = _rate;
+    }
+
+    function swap(
+        address _tokenIn,
+        address _tokenOut,
+        uint256 _amountIn,
+        address _receiver
+    ) external returns (uint256 _amountOut) {
+        _amountOut = _amountIn.mul(rates[_tokenIn][_tokenOut]).div(1e18);
+        MockERC20(_tokenOut).mint(_receiver, _amountOut);
+    }
+
+    // sells the STG of several strategies at once and pays each its `_payouts`
+    // entry, whatever the payouts leave of the output stays here like
+    // MultiCallOptimizedSwapper
+    function swapAndDistribute(
+        address _tokenIn,
+        address _tokenOut,
+        uint256 _amountIn,
+        address[] calldata _receivers,
+        uint256[] calldata _payouts
+    ) external returns (uint256 _amountOut) {
+        require(_receivers.length == _payouts.length, "!length");
+        _amountOut = _amountIn.mul(rates[_tokenIn][_tokenOut]).div(1e18);
+        MockERC20(_tokenOut).mint(address(this), _amountOut);
+        for (uint256 i = 0; i < _receivers.length; i++) {
+            MockERC20(_tokenOut).transfer(_receivers[i], _payouts[i]);
+        }
+    }
+}
@@ -0,0 +1,113 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+pragma experimental ABIEncoderV2;
+
+import {SafeERC20, IERC20} from "@openzeppelin/contracts/token/ERC20/SafeERC20.sol";
+
+// Local stand-in for the ySwaps TradeFactory: strategies enable pairs, a mech
+// executes trades by moving `tokenIn` from the strategy to a swapper and
+// calling it with `_data`.
+contract MockTradeFactory {
+    using SafeERC20 for IERC20;
+
+    struct AsyncTradeExecutionDetails {
+        address _strategy;
+        address _tokenIn;
+        address _tokenOut;
+        uint256 _amount;
+        uint256 _minAmountOut;
+    }
+
+    bytes32 public constant STRATEGY = keccak256("STRATEGY");
+
+    address public mechanic;
+    mapping(bytes32 => mapping(address => bool)) public hasRole;
+    mapping(address => mapping(address => mapping(address => bool))) public enabledTrades;
+
+    constructor() public {
+        mechanic = msg.sender;
+    }
+
+    function grantRole(bytes32 _role, address _account) external {
+        require(msg.sender == mechanic, "!mechanic");
+        hasRole[_role][_account] = true;
+    }
+
+    function enable(address _tokenIn, address _tokenOut) external {
+        require(hasRole[STRATEGY][msg.sender], "!strategy");
+        enabledTrades[msg.sender][_tokenIn][_tokenOut] = true;
+    }
+
+    function execute(
+        AsyncTradeExecutionDetails calldata _tradeExecutionDetails,
+        address _swapper,
+        bytes calldata _data
+    ) external returns (uint256 _receivedAmount) {
+        require(msg.sender == mechanic, "!mechanic");
+        address _strategy = _tradeExecutionDetails._strategy;
+        address _tokenIn = _tradeExecutionDetails._tokenIn;
+        IERC20 _tokenOut = IERC20(_tradeExecutionDetails._tokenOut);
+        require(
+            enabledTrades[_strategy][_tokenIn][address(_tokenOut)],
+            "!enabled"
+        );
+
+        uint256 _balanceBefore = _tokenOut.balanceOf(_strategy);
+        IERC20(_tokenIn).safeTransferFrom(
+            _strategy,
+            _swapper,
+            _tradeExecutionDetails._amount
+        );
+        (bool _success, ) = _swapper.call(_data);
+        require(_success, "!swap");
+
+        _receivedAmount = _tokenOut.balanceOf(_strategy) - _balanceBefore;
+        require(
+            _receivedAmount >= _tradeExecutionDetails._minAmountOut,
+            "!minAmountOut"
+        );
+    }
+
+    // several strategies settled by one swapper call: every `tokenIn` is moved
+    // to the swapper first, each strategy must then have received its own
+    // `_minAmountOut`
+    function execute(
+        AsyncTradeExecutionDetails[] calldata _tradesDetails,
+        address _swapper,
+        bytes calldata _data
+    ) external returns (uint256[] memory _receivedAmounts) {
+        require(msg.sender == mechanic, "!mechanic");
+        _receivedAmounts = new uint256[](_tradesDetails.length);
+        for (uint256 i = 0; i < _tradesDetails.length; i++) {
+            AsyncTradeExecutionDetails calldata _trade = _tradesDetails[i];
+            address _strategy = _trade._strategy;
+            require(
+                enabledTrades[_strategy][_trade._tokenIn][_trade._tokenOut],
+                "!enabled"
+            );
+            // the balance before is kept in place of the amount received until
+            // the swap
+            _receivedAmounts[i] = IERC20(_trade._tokenOut).balanceOf(_strategy);
+            IERC20(_trade._tokenIn).safeTransferFrom(
+                _strategy,
+                _swapper,
+                _trade._amount
+            );
+        }
+
+        (bool _success, ) = _swapper.call(_data);
+        require(_success, "!swap");
+
+        for (uint256 i = 0; i < _tradesDetails.length; i++) {
+            AsyncTradeExecutionDetails calldata _trade = _tradesDetails[i];
+            _receivedAmounts[i] =
+                IERC20(_trade._tokenOut).balanceOf(_trade._strategy) -
+                _receivedAmounts[i];
+            require(
+                _receivedAmounts[i] >= _trade._minAmountOut,
+                "!minAmountOut"
+            );
+        }
+    }
+}
@@ -0,0 +1,59 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+
+import "@openzeppelin/contracts/math/SafeMath.sol";
+import {SafeERC20, IERC20} from "@openzeppelin/contracts/token/ERC20/SafeERC20.sol";
+
+import "./MockERC20.sol";
+
+// Fixed-rate stand-in for a Uniswap V2 router: keeps `path[0]` and mints the
+// last token.
+contract MockUniswapV2Router {
+    using SafeMath for uint256;
+    using SafeERC20 for IERC20;
+
+    // amount of tokenOut per 1e18 tokenIn
+    mapping(address => mapping(address => uint256)) public rates;
+
+    function setRate(
+        address _tokenIn,
+        address _tokenOut,
+        uint256 _rate
+    ) external {
+        rates[_tokenIn][_tokenOut] = _rate;
+    }
+
+    function getAmountsOut(uint256 _amountIn, address[] memory _path)
+        public
+        view
+        returns (uint256[] memory amounts)
+    {
+        require(_path.length >= 2, "UniswapV2Library: INVALID_PATH");
+        amounts = new uint256[](_path.length);
+        amounts[0] = _amountIn;
+        for (uint256 i = 1; i < _path.length; i++) {
+            uint256 _rate = rates[_path[i - 1]][_path[i]];
+            amounts[i] = amounts[i - 1].mul(_rate).div(1e18);
+        }
+    }
+
+    function swapExactTokensForTokens(
+        uint256 _amountIn,
+        uint256 _amountOutMin,
+        address[] calldata _path,
+        address _to,
+        uint256 _deadline
+    ) external returns (uint256[] memory amounts) {
+        require(_deadline >= block.timestamp, "UniswapV2Router: EXPIRED");
+        amounts = getAmountsOut(_amountIn, _path);
+        uint256 _amountOut = amounts[amounts.length - 1];
+        require(
+            _amountOut >= _amountOutMin,
+            "UniswapV2Router: INSUFFICIENT_OUTPUT_AMOUNT"
+        );
+
+        IERC20(_path[0]).safeTransferFrom(msg.sender, address(this), _amountIn);
+        MockERC20(_path[_path.length - 1]).mint(_to, _amountOut);
+    }
+}
@@ -0,0 +1,57 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+pragma experimental ABIEncoderV2;
+
+import "../Strategy.sol";
+
+// Strategy with the withdrawal path it used before redeeming only the LP needed: unstake
+// and redeem the whole position, then add what was not needed back and restake it. Only
+// used to measure what the partial path saves, see test_partial_withdraw.
+contract StrategyFullExitWithdraw is Strategy {
+    constructor(
+        address _vault,
+        address _lpStaker,
+        uint16 _liquidityPoolIDInLPStaking,
+        address _priceFeed,
+        string memory _strategyName
+    )
+        public
+        Strategy(
+            _vault,
+            _lpStaker,
+            _liquidityPoolIDInLPStaking,
+            _priceFeed,
+            _strategyName
+        )
+    {}
+
+    function liquidatePosition(uint256 _amountNeeded)
+        internal
+        override
+        returns (uint256 _liquidatedAmount, uint256 _loss)
+    {
+        uint256 _liquidAssets = balanceOfWant();
+        if (_liquidAssets < _amountNeeded) {
+            _unstakeLP(balanceOfStakedLPToken());
+            uint256 _unstaked = balanceOfUnstakedLPToken();
+            if (_unstaked > 0) {
+                _redeemLP(_unstaked);
+            }
+
+            uint256 _freed = balanceOfWant().sub(_liquidAssets);
+            uint256 _stillNeeded = _amountNeeded.sub(_liquidAssets);
+            if (_freed > _stillNeeded) {
+                _addToLP(_freed.sub(_stillNeeded));
+                _stakeLP(balanceOfUnstakedLPToken());
+            }
+
+            _liquidAssets = balanceOfWant();
+            if (_amountNeeded > _liquidAssets) {
+                _loss = _amountNeeded.sub(_liquidAssets);
+            }
+        }
+
+        _liquidatedAmount = Math.min(_amountNeeded, _liquidAssets);
+    }
+}
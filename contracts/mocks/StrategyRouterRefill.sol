@@ -0,0 +1,38 @@
+// SPDX-License-Identifier: AGPL-3.0
+
+pragma solidity 0.6.12;
+pragma experimental ABIEncoderV2;
+
+import "../Strategy.sol";
+
+// Strategy with the router allowance handled the way it was before the max approval at
+// initialization: every deposit into the pool tops the allowance up to what it adds.
+// Only used to measure what approving once saves, see test_gas_router_approval.
+contract StrategyRouterRefill is Strategy {
+    constructor(
+        address _vault,
+        address _lpStaker,
+        uint16 _liquidityPoolIDInLPStaking,
+        address _priceFeed,
+        string memory _strategyName
+    )
+        public
+        Strategy(
+            _vault,
+            _lpStaker,
+            _liquidityPoolIDInLPStaking,
+            _priceFeed,
+            _strategyName
+        )
+    {
+        want.safeApprove(address(stargateRouter), 0);
+    }
+
+    function _addToLP(uint256 _amount) internal override {
+        if (want.allowance(address(this), address(stargateRouter)) < _amount) {
+            want.safeApprove(address(stargateRouter), 0);
+            want.safeApprove(address(stargateRouter), _amount);
+        }
+        super._addToLP(_amount);
+    }
+}
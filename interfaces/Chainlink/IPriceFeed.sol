@@ -3,6 +3,7 @@
 pragma solidity 0.6.12;
 
 interface IPriceFeed {
+    function decimals() external view returns (uint8);
     function latestAnswer() external view returns (int256);
     function latestTimestamp() external view returns (uint256);
     function latestRound() external view returns (uint256);
@@ -47,6 +47,13 @@ interface ILPStaking {
 
     function poolLength() external view returns (uint256);
 
+    function stargatePerBlock() external view returns (uint256);
+
+    function totalAllocPoint() external view returns (uint256);
+
+    // LP staked in each pool
+    function lpBalances(uint256 _pid) external view returns (uint256);
+
     function pendingStargate(uint256 _pid, address _user) external view returns (uint256);
 
     function deposit(uint256 _pid, uint256 _amount) external;
@@ -7,5 +7,11 @@ interface IPool {
     function token() external view returns (address); // the token for the pool
     function router() external view returns (address); // the router for the pool
 
+    function totalLiquidity() external view returns (uint256); // backing of the LP, in shared decimals
+    function totalSupply() external view returns (uint256); // LP minted
+    function deltaCredit() external view returns (uint256); // liquidity instantRedeemLocal can pay out, in shared decimals
+
+    function convertRate() external view returns (uint256); // local decimals per shared decimal
+
     function amountLPtoLD(uint256 _amountLP) external view returns (uint256);
 }
\ No newline at end of file
@@ -1,58 +1,128 @@
+"""
+Deploys a set of Stargate strategies from a manifest, without prompts.
+
+The manifest is the one scripts/rollout.py reads, with `original` optional: without it
+the first strategy is deployed from scratch and the others are cloned from it through
+StrategyFactory. Keeper, rewards, strategist and the trade factory are set in the same
+run. Extra keys:
+
+    deployer: "0x..."        # optional, the account a dry run impersonates
+    publish_source: false    # optional, verify the deployed Strategy on etherscan
+
+Deploying, with the keystore unlocked by DEPLOY_PASSWORD if set:
+
+    DEPLOY_MANIFEST=pools.yml DEPLOY_ACCOUNT=deployer brownie run deploy --network mainnet
+
+Dry run of the same manifest on a fork (or on the development network):
+
+    DEPLOY_MANIFEST=pools.yml DEPLOY_DRY_RUN=1 brownie run deploy --network mainnet-fork
+
+DEPLOY_OUTPUT names a JSON file the deployed addresses are written to, by strategy name.
+"""
+import json
+import os
 from pathlib import Path
 
-from brownie import Strategy, accounts, config, network, project, web3
-from eth_utils import is_checksum_address
+from brownie import Contract, Strategy, accounts, config, network
 import click
 
-API_VERSION = config["dependencies"][0].split("@")[-1]
-Vault = project.load(
-    Path.home() / ".brownie" / "packages" / config["dependencies"][0]
-).Vault
+from scripts.rollout import enable_trade_factory, load_manifest, rollout
 
+# all the deploy reads from a vault, so the Vault project never needs loading
+_VAULT_ABI = [
+    {
+        "name": "apiVersion",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": [{"name": "", "type": "string"}],
+    }
+]
 
-def get_address(msg: str, default: str = None) -> str:
-    val = click.prompt(msg, default=default)
 
-    # Keep asking user for click.prompt until it passes
-    while True:
+def api_version():
+    return config["dependencies"][0].split("@")[-1]
 
-        if is_checksum_address(val):
-            return val
-        elif addr := web3.ens.address(val):
-            click.echo(f"Found ENS '{val}' [{addr}]")
-            return addr
 
-        click.echo(
-            f"I'm sorry, but '{val}' is not a checksummed address or valid ENS record"
+def check_vault(address):
+    vault = Contract.from_abi("Vault", address, _VAULT_ABI)
+    version = vault.apiVersion()
+    if version != api_version():
+        raise ValueError(
+            f"vault {address} is {version}, strategies are built for {api_version()}"
         )
-        # NOTE: Only display default once
-        val = click.prompt(msg)
 
 
-def main():
-    print(f"You are using the '{network.show_active()}' network")
-    dev = accounts.load(click.prompt("Account", type=click.Choice(accounts.load())))
-    print(f"You are using: 'dev' [{dev.address}]")
+def deploy_original(entry, manifest, dev, publish_source=False):
+    strategy = Strategy.deploy(
+        entry["vault"],
+        entry["lp_staker"],
+        int(entry["pool_id_in_lp_staking"]),
+        entry["price_feed"],
+        entry["name"],
+        {"from": dev},
+        publish_source=publish_source,
+    )
+    click.echo(f"{entry['name']}: {strategy.address}")
+
+    # the constructor makes the deployer strategist, rewards and keeper. setRewards is
+    # strategist only, so the strategist is handed over last
+    if manifest["keeper"] != dev.address:
+        strategy.setKeeper(manifest["keeper"], {"from": dev})
+    if manifest["rewards"] != dev.address:
+        strategy.setRewards(manifest["rewards"], {"from": dev})
+    if manifest["strategist"] != dev.address:
+        strategy.setStrategist(manifest["strategist"], {"from": dev})
+    return strategy
+
 
-    if input("Is there a Vault for this strategy already? y/[N]: ").lower() == "y":
-        vault = Vault.at(get_address("Deployed Vault: "))
-        assert vault.apiVersion() == API_VERSION
-    else:
-        print("You should deploy one vault using scripts from Vault project")
-        return  # TODO: Deploy one using scripts from Vault project
-
-    print(
-        f"""
-    Strategy Parameters
-
-       api: {API_VERSION}
-     token: {vault.token()}
-      name: '{vault.name()}'
-    symbol: '{vault.symbol()}'
-    """
+def deploy(manifest, dev):
+    """Deploys every strategy in the manifest, returns {name: address}."""
+    entries = manifest["strategies"]
+    for vault in {entry["vault"] for entry in entries}:
+        check_vault(vault)
+
+    deployed = []
+    if not manifest.get("original"):
+        original = deploy_original(
+            entries[0], manifest, dev, bool(manifest.get("publish_source", False))
+        )
+        enable_trade_factory([original.address], manifest.get("trade_factory"), dev)
+        deployed.append(original.address)
+        manifest = {**manifest, "original": original.address, "strategies": entries[1:]}
+
+    if manifest["strategies"]:
+        deployed += rollout(manifest, dev)
+    return {entry["name"]: address for entry, address in zip(entries, deployed)}
+
+
+def is_local_network():
+    active = network.show_active()
+    return active == "development" or active.endswith("-fork")
+
+
+def deployer(manifest):
+    if os.getenv("DEPLOY_DRY_RUN"):
+        if not is_local_network():
+            raise SystemExit(
+                f"dry runs only go to a local chain, not {network.show_active()}"
+            )
+        if manifest.get("deployer"):
+            return accounts.at(manifest["deployer"], force=True)
+        return accounts[0]
+    return accounts.load(
+        os.environ["DEPLOY_ACCOUNT"], password=os.getenv("DEPLOY_PASSWORD")
     )
-    publish_source = click.confirm("Verify source on etherscan?")
-    if input("Deploy Strategy? y/[N]: ").lower() != "y":
-        return
 
-    strategy = Strategy.deploy(vault, {"from": dev}, publish_source=publish_source)
+
+def main(manifest_file=None):
+    print(f"You are using the '{network.show_active()}' network")
+    manifest = load_manifest(manifest_file or os.environ["DEPLOY_MANIFEST"])
+    dev = deployer(manifest)
+    print(f"You are using: 'dev' [{dev.address}]")
+
+    deployed = deploy(manifest, dev)
+    output = os.getenv("DEPLOY_OUTPUT")
+    if output:
+        Path(output).write_text(json.dumps(deployed, indent=2) + "\n")
+    print(json.dumps(deployed, indent=2))
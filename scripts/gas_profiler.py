@@ -0,0 +1,159 @@
+"""
+Breaks the gas of strategy transactions down by internal function and external call.
+
+Every step of a transaction's trace (`tx.trace`, brownie's expanded debug trace) is
+charged to the stack of frames it ran in: external calls (`Vault.report`,
+`MockLPStaking.deposit`, ERC-20 transfers, ...) and the internal functions inside them
+(`Strategy.prepareReturn`, `Strategy._withdrawSome`, ...). A CALL step is only charged
+its own cost, what the callee burns is charged to the callee's frames. Intrinsic gas
+(21000 plus calldata) net of refunds goes to an `[intrinsic]` frame, so a profile adds
+up to `gas_used`.
+
+Profiles aggregate over any number of transactions and are written as folded stacks,
+which flamegraph.pl, inferno or speedscope turn into a flame graph, and as a top-N
+table of self and inclusive gas per frame:
+
+    profile = GasProfile()
+    profile.add(strategy.harvest(), root="harvest")
+    profile.write_folded("harvest.folded")
+    print(profile.table(20))
+
+Transactions already mined on a local chain can be profiled by hash:
+
+    GAS_PROFILE_OUT=harvest.folded brownie run gas_profiler main 0x1234... 0x5678...
+
+The test suite records profiles of the gas benchmarks with `--gas-profile DIR`.
+"""
+import os
+from collections import Counter
+from pathlib import Path
+
+from brownie import chain
+
+INTRINSIC = "[intrinsic]"
+
+
+def _label(step):
+    label = step.get("fn") or step.get("contractName") or step.get("address") or "?"
+    # `;` separates frames in the folded format
+    return str(label).replace(";", ":")
+
+
+def step_costs(trace):
+    """Gas charged to every step, a CALL only counts what it did not forward."""
+    costs = [0] * len(trace)
+    # indices of CALL/CREATE steps whose callee is still running
+    open_calls = []
+    for i, step in enumerate(trace):
+        while open_calls and step["depth"] <= trace[open_calls[-1]]["depth"]:
+            call = open_calls.pop()
+            callee = sum(costs[call + 1 : i])
+            costs[call] = trace[call]["gas"] - step["gas"] - callee
+
+        following = trace[i + 1] if i + 1 < len(trace) else None
+        if following is None or following["depth"] < step["depth"]:
+            costs[i] = step["gasCost"]
+        elif following["depth"] == step["depth"]:
+            costs[i] = step["gas"] - following["gas"]
+        else:
+            open_calls.append(i)
+
+    # a trace cut off inside a call, only the call's base cost is known
+    for call in open_calls:
+        costs[call] = trace[call]["gasCost"]
+    return costs
+
+
+def profile_trace(trace, gas_used=None):
+    """
+    Returns (self gas per folded stack, calls per frame) for one transaction. The
+    stacks are tuples of frame labels, outermost first.
+    """
+    stacks = Counter()
+    calls = Counter()
+    frames = []  # [((depth, jump depth), label)]
+    for step, cost in zip(trace, step_costs(trace)):
+        key = (step["depth"], step.get("jumpDepth", 0))
+        label = _label(step)
+        while frames and frames[-1][0] > key:
+            frames.pop()
+        if frames and frames[-1][0] == key:
+            if frames[-1][1] != label:
+                frames[-1] = (key, label)
+                calls[label] += 1
+        else:
+            frames.append((key, label))
+            calls[label] += 1
+        stacks[tuple(label for _, label in frames)] += cost
+
+    if gas_used is not None:
+        overhead = gas_used - sum(stacks.values())
+        if overhead > 0:
+            stacks[(INTRINSIC,)] += overhead
+    return stacks, calls
+
+
+class GasProfile:
+    """Self gas per folded stack and per frame, summed over the transactions added."""
+
+    def __init__(self):
+        self.stacks = Counter()
+        self.calls = Counter()
+        self.self_gas = Counter()
+        self.inclusive_gas = Counter()
+        self.transactions = 0
+        self.gas_used = 0
+
+    def add(self, tx, root=None):
+        """Adds a transaction receipt, under a `root` frame (e.g. the operation) if given."""
+        stacks, calls = profile_trace(tx.trace, tx.gas_used)
+        prefix = (str(root).replace(";", ":"),) if root else ()
+        for stack, gas in stacks.items():
+            self.stacks[prefix + stack] += gas
+            self.self_gas[stack[-1]] += gas
+            # a frame that recurses is only counted once per stack
+            for label in set(stack):
+                self.inclusive_gas[label] += gas
+        self.calls.update(calls)
+        self.transactions += 1
+        self.gas_used += tx.gas_used
+
+    def folded(self):
+        return "".join(
+            f"{';'.join(stack)} {gas}\n"
+            for stack, gas in sorted(self.stacks.items())
+            if gas > 0
+        )
+
+    def write_folded(self, path):
+        Path(path).write_text(self.folded())
+
+    def top(self, n=20):
+        """(frame, calls, self gas, inclusive gas) of the `n` frames with the most self gas."""
+        return [
+            (label, self.calls[label], gas, self.inclusive_gas[label])
+            for label, gas in self.self_gas.most_common(n)
+        ]
+
+    def table(self, n=20):
+        total = self.gas_used or 1
+        lines = [
+            f"{self.transactions} transactions, {self.gas_used} gas",
+            f"{'frame':<60} {'calls':>6} {'self':>10} {'self %':>7} {'inclusive':>10}",
+        ]
+        for label, calls, self_gas, inclusive in self.top(n):
+            lines.append(
+                f"{label:<60} {calls:>6} {self_gas:>10} {self_gas / total:>7.2%} {inclusive:>10}"
+            )
+        return "\n".join(lines)
+
+
+def main(*tx_hashes):
+    profile = GasProfile()
+    for tx_hash in tx_hashes:
+        profile.add(chain.get_transaction(tx_hash))
+
+    out = os.getenv("GAS_PROFILE_OUT", "gas_profile.folded")
+    profile.write_folded(out)
+    print(profile.table(int(os.getenv("GAS_PROFILE_TOP", "20"))))
+    print(f"folded stacks written to {out}")
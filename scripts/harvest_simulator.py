@@ -0,0 +1,165 @@
+"""
+Offline model of how harvest cadence affects the net APR of the Stargate strategy.
+
+Each scenario follows the strategy's accounting day by day:
+
+- the LP position grows with the pool's exchange rate (`amountLPtoLD`),
+- staked LP accrues STG pro rata to our share of the LPStaking pool,
+- a harvest claims the STG (`prepareReturn`), ySwaps sells it with slippage and the
+  want lands `compound_lag` harvests later, when it is reported and re-deposited
+  (`adjustPosition`),
+- every harvest pays `harvest_gas` at the scenario's gas price.
+
+Scenarios are the cartesian product of harvest intervals, TVLs, gas prices and STG
+price paths, and all of them are stepped together as NumPy arrays.
+
+    python -m scripts.harvest_simulator
+"""
+from dataclasses import dataclass
+
+import numpy as np
+
+DAYS_PER_YEAR = 365
+
+
+@dataclass
+class PoolParams:
+    # STG emitted per day to the LPStaking pool we farm
+    # (stargatePerBlock * allocPoint / totalAllocPoint * blocks per day)
+    stg_per_day: float
+    # want staked in the same LPStaking pool by everyone else
+    other_staked: float
+    # yearly growth of amountLPtoLD from pool fees
+    lp_apr: float = 0.0
+    harvest_gas: float = 1_500_000
+    # want per ETH, to price the gas
+    eth_price: float = 1_800.0
+    # fixed cost of selling STG, and extra cost per want sold
+    slippage: float = 0.0
+    price_impact: float = 0.0
+    # harvests between claiming STG and reporting its proceeds: 1 with ySwaps,
+    # 0 when STG is swapped inside the harvest
+    compound_lag: int = 1
+
+
+@dataclass
+class SimulationResult:
+    intervals: np.ndarray
+    tvls: np.ndarray
+    gas_prices: np.ndarray
+    net_apr: np.ndarray  # (intervals, tvls, gas prices, paths)
+    gas_spent: np.ndarray
+    harvests: np.ndarray
+
+    def surface(self):
+        """Net APR averaged over price paths, shaped (intervals, tvls, gas prices)."""
+        return self.net_apr.mean(axis=-1)
+
+    def best_intervals(self):
+        """Harvest interval with the highest mean net APR for each (tvl, gas price)."""
+        return self.intervals[self.surface().argmax(axis=0)]
+
+
+def gbm_price_paths(price, days, n_paths, volatility=0.8, drift=0.0, seed=None):
+    """Daily STG prices following a geometric brownian motion, shaped (n_paths, days)."""
+    rng = np.random.default_rng(seed)
+    dt = 1 / DAYS_PER_YEAR
+    shocks = rng.standard_normal((n_paths, days))
+    log_returns = (drift - volatility ** 2 / 2) * dt + volatility * np.sqrt(dt) * shocks
+    return price * np.exp(np.cumsum(log_returns, axis=1))
+
+
+def simulate(intervals, tvls, gas_prices, stg_prices, pool, days=None):
+    """
+    Runs every combination of harvest interval (days), TVL (want), gas price (gwei) and
+    STG price path (want per STG, shaped (paths, days)).
+    """
+    intervals = np.atleast_1d(np.asarray(intervals, dtype=int))
+    tvls = np.atleast_1d(np.asarray(tvls, dtype=float))
+    gas_prices = np.atleast_1d(np.asarray(gas_prices, dtype=float))
+    stg_prices = np.atleast_2d(np.asarray(stg_prices, dtype=float))
+    days = days or stg_prices.shape[1]
+    if np.any(intervals < 1):
+        raise ValueError("harvest intervals must be at least one day")
+
+    shape = (len(intervals), len(tvls), len(gas_prices), len(stg_prices))
+    interval, tvl, gas_price, path = (
+        a.ravel() for a in np.meshgrid(*(np.arange(n) for n in shape), indexing="ij")
+    )
+    interval, tvl, gas_price = intervals[interval], tvls[tvl], gas_prices[gas_price]
+    prices = stg_prices[path]
+
+    position = tvl.copy()
+    pending_stg = np.zeros_like(position)
+    gas_spent = np.zeros_like(position)
+    harvests = np.zeros(position.shape, dtype=int)
+    # proceeds of STG already sold, waiting for the harvest that reports them
+    in_flight = np.zeros((max(pool.compound_lag, 1),) + position.shape)
+
+    lp_growth = pool.lp_apr / DAYS_PER_YEAR
+    harvest_cost = pool.harvest_gas * gas_price * 1e-9 * pool.eth_price
+
+    for day in range(days):
+        position *= 1 + lp_growth
+        pending_stg += pool.stg_per_day * position / (position + pool.other_staked)
+
+        harvest = (day + 1) % interval == 0
+        if not harvest.any():
+            continue
+
+        value = pending_stg * prices[:, day]
+        cost = np.clip(pool.slippage + pool.price_impact * value, 0, 1)
+        proceeds = np.where(harvest, value * (1 - cost), 0)
+        pending_stg = np.where(harvest, 0, pending_stg)
+
+        if pool.compound_lag == 0:
+            position += proceeds
+        else:
+            # the oldest slot is reported now, everything else moves one harvest closer
+            position += np.where(harvest, in_flight[0], 0)
+            shifted = np.concatenate([in_flight[1:], proceeds[None]], axis=0)
+            in_flight = np.where(harvest, shifted, in_flight)
+
+        gas_spent += np.where(harvest, harvest_cost, 0)
+        harvests += harvest
+
+    # sold but unreported proceeds are still ours, unclaimed STG is not counted
+    final = position + in_flight.sum(axis=0) - gas_spent
+    net_apr = (final - tvl) / tvl * DAYS_PER_YEAR / days
+
+    return SimulationResult(
+        intervals=intervals,
+        tvls=tvls,
+        gas_prices=gas_prices,
+        net_apr=net_apr.reshape(shape),
+        gas_spent=gas_spent.reshape(shape),
+        harvests=harvests.reshape(shape),
+    )
+
+
+def main():
+    days = 365
+    pool = PoolParams(
+        stg_per_day=20_000,
+        other_staked=500_000_000,
+        lp_apr=0.01,
+        slippage=0.003,
+        price_impact=1e-7,
+    )
+    intervals = np.array([1, 2, 3, 5, 7, 10, 14, 21, 30])
+    tvls = np.array([1e5, 1e6, 1e7, 5e7])
+    gas_prices = np.array([10, 30, 60, 120])
+    prices = gbm_price_paths(0.5, days, n_paths=256, seed=0)
+
+    result = simulate(intervals, tvls, gas_prices, prices, pool, days)
+    best = result.best_intervals()
+
+    print(f"{len(intervals) * len(tvls) * len(gas_prices) * len(prices)} scenarios")
+    print("best harvest interval (days) by TVL and gas price (gwei)")
+    print("tvl".rjust(12) + "".join(f"{g:>8.0f}" for g in gas_prices))
+    for i, tvl in enumerate(tvls):
+        print(f"{tvl:>12,.0f}" + "".join(f"{d:>8}" for d in best[i]))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,432 @@
+"""
+Incremental indexer for the strategy events, persisted to SQLite.
+
+Indexes, for a set of strategies:
+
+- `Harvested` and `Cloned` emitted by the strategies (and `Cloned` by StrategyFactory),
+- `StrategyReported` emitted by their vaults,
+- `Deposit`, `Withdraw` and `EmergencyWithdraw` emitted by LPStaking for them.
+
+Blocks are fetched in chunks (halved when the node refuses a range) up to
+`confirmations` blocks behind the head. Each chunk is written in one transaction
+together with the checkpoint, so an interrupted run resumes where it stopped.
+The hashes of recently indexed blocks are kept: when one no longer matches the
+chain, everything after the last matching block is dropped and indexed again.
+Clones found through `Cloned` are followed from then on.
+
+Amounts can exceed SQLite integers, so arguments are stored as JSON with integers
+as strings. `Indexer.events` streams them back with integers restored. Strategies
+added to an existing database are indexed from its checkpoint on.
+
+    brownie run indexer main strategies.json events.db --network mainnet
+"""
+import json
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from typing import Iterator, Optional, Tuple
+
+from brownie import network, web3
+import click
+from hexbytes import HexBytes
+from web3.exceptions import BlockNotFound
+
+from scripts.monitor import load_strategies
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    block_number INTEGER NOT NULL,
+    log_index INTEGER NOT NULL,
+    block_hash TEXT NOT NULL,
+    tx_hash TEXT NOT NULL,
+    address TEXT NOT NULL,
+    event TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    args TEXT NOT NULL,
+    PRIMARY KEY (block_number, log_index)
+);
+CREATE INDEX IF NOT EXISTS events_by_strategy ON events (strategy, event, block_number);
+CREATE TABLE IF NOT EXISTS blocks (number INTEGER PRIMARY KEY, hash TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS strategies (address TEXT PRIMARY KEY, since_block INTEGER NOT NULL);
+CREATE TABLE IF NOT EXISTS checkpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 0),
+    block_number INTEGER NOT NULL
+);
+"""
+
+
+class ReorgTooDeep(Exception):
+    pass
+
+
+class _RangeChanged(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class EventSpec:
+    name: str
+    # (name, type, indexed)
+    inputs: Tuple[Tuple[str, str, bool], ...]
+    # argument holding the strategy, None when the strategy is the emitter
+    strategy_arg: Optional[str] = None
+
+    @property
+    def signature(self):
+        return f"{self.name}({','.join(t for _, t, _ in self.inputs)})"
+
+
+_STAKING_INPUTS = (
+    ("user", "address", True),
+    ("pid", "uint256", True),
+    ("amount", "uint256", False),
+)
+
+HARVESTED = EventSpec(
+    "Harvested",
+    tuple(
+        (n, "uint256", False)
+        for n in ("profit", "loss", "debtPayment", "debtOutstanding")
+    ),
+)
+STRATEGY_CLONED = EventSpec("Cloned", (("clone", "address", True),), "clone")
+FACTORY_CLONED = EventSpec(
+    "Cloned",
+    (
+        ("clone", "address", True),
+        ("vault", "address", True),
+        ("salt", "bytes32", False),
+    ),
+    "clone",
+)
+STRATEGY_REPORTED = EventSpec(
+    "StrategyReported",
+    (("strategy", "address", True),)
+    + tuple(
+        (n, "uint256", False)
+        for n in (
+            "gain",
+            "loss",
+            "debtPaid",
+            "totalGain",
+            "totalLoss",
+            "totalDebt",
+            "debtAdded",
+            "debtRatio",
+        )
+    ),
+    "strategy",
+)
+DEPOSIT = EventSpec("Deposit", _STAKING_INPUTS, "user")
+WITHDRAW = EventSpec("Withdraw", _STAKING_INPUTS, "user")
+EMERGENCY_WITHDRAW = EventSpec("EmergencyWithdraw", _STAKING_INPUTS, "user")
+
+_INT_ARGS = {
+    name
+    for spec in (HARVESTED, STRATEGY_REPORTED, DEPOSIT)
+    for name, type_, _ in spec.inputs
+    if type_.startswith("uint")
+}
+
+
+class Indexer:
+    def __init__(
+        self,
+        web3,
+        db_path,
+        strategies,
+        vaults=(),
+        lp_stakers=(),
+        factories=(),
+        start_block=0,
+        chunk_size=2_000,
+        confirmations=12,
+        reorg_depth=128,
+        follow_clones=True,
+    ):
+        self.web3 = web3
+        self.vaults = [self._address(a) for a in vaults]
+        self.lp_stakers = [self._address(a) for a in lp_stakers]
+        self.factories = [self._address(a) for a in factories]
+        self.chunk_size = chunk_size
+        self.confirmations = confirmations
+        self.reorg_depth = reorg_depth
+        self.follow_clones = follow_clones
+        self.topics = {
+            self._topic_of(spec): spec
+            for spec in (
+                HARVESTED,
+                STRATEGY_CLONED,
+                FACTORY_CLONED,
+                STRATEGY_REPORTED,
+                DEPOSIT,
+                WITHDRAW,
+                EMERGENCY_WITHDRAW,
+            )
+        }
+
+        self.db = sqlite3.connect(db_path)
+        self.db.executescript(SCHEMA)
+        with self.db:
+            self.db.execute(
+                "INSERT OR IGNORE INTO checkpoint VALUES (0, ?)", (start_block - 1,)
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO strategies VALUES (?, ?)",
+                [(self._address(a), start_block) for a in strategies],
+            )
+
+    def _address(self, account):
+        return self.web3.toChecksumAddress(str(account))
+
+    def _topic_of(self, spec):
+        return self.web3.keccak(text=spec.signature).hex()
+
+    @staticmethod
+    def _address_topic(address):
+        return "0x" + "00" * 12 + address[2:].lower()
+
+    @property
+    def checkpoint(self):
+        return self.db.execute("SELECT block_number FROM checkpoint").fetchone()[0]
+
+    @property
+    def strategies(self):
+        return [row[0] for row in self.db.execute("SELECT address FROM strategies")]
+
+    def close(self):
+        self.db.close()
+
+    # ---------------------------- indexing ----------------------------
+
+    def sync(self, to_block=None):
+        """Indexes up to `to_block` (the confirmed head by default), returns the events added."""
+        self._handle_reorg()
+        head = self.web3.eth.block_number - self.confirmations
+        to_block = head if to_block is None else min(to_block, head)
+
+        added = 0
+        chunk = self.chunk_size
+        start = self.checkpoint + 1
+        while start <= to_block:
+            end = min(start + chunk - 1, to_block)
+            try:
+                added += self._index_range(start, end)
+            except _RangeChanged:
+                # reorged while we read it, rewind if needed and carry on from there
+                self._handle_reorg()
+                start = self.checkpoint + 1
+                to_block = min(
+                    to_block, self.web3.eth.block_number - self.confirmations
+                )
+                continue
+            except ValueError:
+                # most nodes cap the logs or the range of one eth_getLogs
+                if chunk == 1:
+                    raise
+                chunk = max(1, chunk // 2)
+                continue
+            start = end + 1
+            chunk = min(chunk * 2, self.chunk_size)
+        return added
+
+    def _index_range(self, start, end):
+        end_hash = self._block_hash(end)
+        strategies = set(self.strategies)
+        logs = self._fetch(start, end, strategies)
+
+        # clones created in this range may already have events in it
+        new_clones = {}
+        while True:
+            found = {}
+            for log in logs:
+                spec, args = self._decode(log)
+                clone = args.get("clone") if spec.name == "Cloned" else None
+                if self.follow_clones and clone and clone not in strategies:
+                    found.setdefault(clone, log["blockNumber"])
+            if not found:
+                break
+            strategies |= set(found)
+            new_clones.update(found)
+            logs += self._fetch(start, end, set(found), include_sources=False)
+
+        if self._block_hash(end) != end_hash:
+            raise _RangeChanged()
+
+        rows = {}
+        block_hashes = {end: end_hash}
+        for log in logs:
+            spec, args = self._decode(log)
+            strategy = (
+                log["address"] if spec.strategy_arg is None else args[spec.strategy_arg]
+            )
+            # Cloned comes from a strategy or factory we watch, keep it even when not following
+            if spec.name != "Cloned" and strategy not in strategies:
+                continue
+            key = (log["blockNumber"], log["logIndex"])
+            block_hashes[log["blockNumber"]] = log["blockHash"].hex()
+            rows[key] = key + (
+                log["blockHash"].hex(),
+                log["transactionHash"].hex(),
+                log["address"],
+                spec.name,
+                strategy,
+                json.dumps(
+                    {k: str(v) if isinstance(v, int) else v for k, v in args.items()}
+                ),
+            )
+
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO events VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                sorted(rows.values()),
+            )
+            self.db.executemany(
+                "INSERT OR IGNORE INTO strategies VALUES (?, ?)", new_clones.items()
+            )
+            self.db.executemany(
+                "INSERT OR REPLACE INTO blocks VALUES (?, ?)", block_hashes.items()
+            )
+            self.db.execute(
+                "DELETE FROM blocks WHERE number < ?", (end - self.reorg_depth,)
+            )
+            self.db.execute("UPDATE checkpoint SET block_number = ?", (end,))
+        return len(rows)
+
+    def _fetch(self, start, end, strategies, include_sources=True):
+        strategies = sorted(strategies)
+        strategy_topics = [self._address_topic(a) for a in strategies]
+        emitted = [self._topic_of(s) for s in (HARVESTED, STRATEGY_CLONED)]
+        staking = [self._topic_of(s) for s in (DEPOSIT, WITHDRAW, EMERGENCY_WITHDRAW)]
+
+        queries = [(strategies, [emitted])]
+        if include_sources and self.factories:
+            queries.append((self.factories, [[self._topic_of(FACTORY_CLONED)]]))
+        if self.vaults:
+            queries.append(
+                (self.vaults, [[self._topic_of(STRATEGY_REPORTED)], strategy_topics])
+            )
+        if self.lp_stakers:
+            queries.append((self.lp_stakers, [staking, strategy_topics]))
+
+        logs = []
+        for addresses, topics in queries:
+            if not addresses:
+                continue
+            logs += self.web3.eth.get_logs(
+                {
+                    "fromBlock": start,
+                    "toBlock": end,
+                    "address": addresses,
+                    "topics": topics,
+                }
+            )
+        return logs
+
+    def _decode(self, log):
+        topics = [HexBytes(t) for t in log["topics"]]
+        spec = self.topics[topics[0].hex()]
+        indexed = [i for i in spec.inputs if i[2]]
+        data = [i for i in spec.inputs if not i[2]]
+        args = {}
+        for (name, type_, _), topic in zip(indexed, topics[1:]):
+            args[name] = self.web3.codec.decode_single(type_, topic)
+        values = self.web3.codec.decode_abi(
+            [t for _, t, _ in data], HexBytes(log["data"])
+        )
+        for (name, type_, _), value in zip(data, values):
+            args[name] = value
+        for name, value in args.items():
+            if isinstance(value, bytes):
+                args[name] = HexBytes(value).hex()
+            elif isinstance(value, str) and value.startswith("0x") and len(value) == 42:
+                args[name] = self._address(value)
+        return spec, args
+
+    # ---------------------------- reorgs ----------------------------
+
+    def _block_hash(self, number):
+        try:
+            return self.web3.eth.get_block(number)["hash"].hex()
+        except BlockNotFound:
+            # past the head after a reorg to a shorter chain
+            return None
+
+    def _handle_reorg(self):
+        stored = self.db.execute(
+            "SELECT number, hash FROM blocks ORDER BY number DESC LIMIT ?",
+            (self.reorg_depth,),
+        ).fetchall()
+        for i, (number, block_hash) in enumerate(stored):
+            if self._block_hash(number) == block_hash:
+                if i > 0:
+                    self._rewind(number)
+                return
+        if stored:
+            raise ReorgTooDeep(
+                f"none of the last {len(stored)} indexed blocks are on the chain anymore"
+            )
+
+    def _rewind(self, block):
+        with self.db:
+            self.db.execute("DELETE FROM events WHERE block_number > ?", (block,))
+            self.db.execute("DELETE FROM blocks WHERE number > ?", (block,))
+            self.db.execute("DELETE FROM strategies WHERE since_block > ?", (block,))
+            self.db.execute("UPDATE checkpoint SET block_number = ?", (block,))
+
+    # ---------------------------- queries ----------------------------
+
+    def events(
+        self, event=None, strategy=None, from_block=None, to_block=None
+    ) -> Iterator[dict]:
+        """Streams matching events in chain order."""
+        clauses, params = [], []
+        for clause, value in (
+            ("event = ?", event),
+            ("strategy = ?", self._address(strategy) if strategy else None),
+            ("block_number >= ?", from_block),
+            ("block_number <= ?", to_block),
+        ):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        cursor = self.db.execute(
+            "SELECT block_number, log_index, tx_hash, address, event, strategy, args "
+            f"FROM events {where} ORDER BY block_number, log_index",
+            params,
+        )
+        for block_number, log_index, tx_hash, address, name, strategy_, args in cursor:
+            args = json.loads(args)
+            for key in _INT_ARGS & set(args):
+                args[key] = int(args[key])
+            yield {
+                "block_number": block_number,
+                "log_index": log_index,
+                "tx_hash": tx_hash,
+                "address": address,
+                "event": name,
+                "strategy": strategy_,
+                "args": args,
+            }
+
+
+def main(strategies_file=None, db_path="events.db", interval=0):
+    print(f"You are using the '{network.show_active()}' network")
+    strategies = load_strategies(strategies_file or os.environ["INDEXER_STRATEGIES"])
+    indexer = Indexer(
+        web3,
+        db_path,
+        strategies,
+        vaults={s.vault() for s in strategies},
+        lp_stakers={s.lpStaker() for s in strategies},
+        factories=[a for a in os.getenv("INDEXER_FACTORIES", "").split(",") if a],
+        start_block=int(os.getenv("INDEXER_START_BLOCK", 0)),
+    )
+    while True:
+        added = indexer.sync()
+        click.echo(f"indexed {added} events up to block {indexer.checkpoint}")
+        if not int(interval):
+            break
+        time.sleep(int(interval))
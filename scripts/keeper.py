@@ -0,0 +1,219 @@
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+from brownie import accounts, network, web3
+import click
+
+from scripts.monitor import BATCH_SIZE, load_strategies, read_batched
+
+# gas a harvest usually needs, used to price `callCost` before we have an estimate
+HARVEST_GAS = 1_500_000
+TEND_GAS = 600_000
+
+
+@dataclass
+class StrategyState:
+    address: str
+    harvest_trigger: bool
+    tend_trigger: bool
+    pending_stg: int
+    total_assets: int
+    dry_run_ok: Optional[bool] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class CycleReport:
+    block: int
+    states: List[StrategyState] = field(default_factory=list)
+    harvested: List[str] = field(default_factory=list)
+    tended: List[str] = field(default_factory=list)
+    failed: List[str] = field(default_factory=list)
+    read_seconds: float = 0.0
+    dry_run_seconds: float = 0.0
+    submit_seconds: float = 0.0
+
+    @property
+    def total_seconds(self):
+        return self.read_seconds + self.dry_run_seconds + self.submit_seconds
+
+    def summary(self):
+        return (
+            f"block {self.block}: {len(self.states)} strategies, "
+            f"harvested {len(self.harvested)}, tended {len(self.tended)}, "
+            f"failed {len(self.failed)} | "
+            f"reads {self.read_seconds:.2f}s, dry-runs {self.dry_run_seconds:.2f}s, "
+            f"submits {self.submit_seconds:.2f}s, total {self.total_seconds:.2f}s"
+        )
+
+
+class Keeper:
+    """
+    Evaluates triggers for many strategies at the same block, dry-runs the candidates
+    and only sends the harvests/tends that are expected to go through.
+
+    The trigger and state reads of the whole fleet go out as batched Multicall2
+    `eth_call`s. Dry-runs are one call each and blocking, so they run on a thread
+    pool while asyncio bounds how many are in flight at once. Call `close()`, or use
+    the keeper as a context manager, to shut the pool down.
+    """
+
+    def __init__(
+        self,
+        strategies,
+        keeper,
+        max_concurrency=16,
+        gas_price=None,
+        batch_size=BATCH_SIZE,
+        multicall_address=None,
+    ):
+        self.strategies = list(strategies)
+        self.keeper = keeper
+        self.gas_price = gas_price
+        self.max_concurrency = max_concurrency
+        self.batch_size = batch_size
+        self.multicall_address = multicall_address
+        self._semaphore = None
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    async def _run(self, fn, *args, **kwargs):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._executor, lambda: fn(*args, **kwargs)
+            )
+
+    def _current_gas_price(self):
+        return self.gas_price if self.gas_price is not None else web3.eth.gas_price
+
+    def read_states(self, block, gas_price):
+        # every read is pinned to `block` so the whole fleet is evaluated on the same state
+        def read(strategy):
+            return (
+                strategy.harvestTrigger(HARVEST_GAS * gas_price),
+                strategy.tendTrigger(TEND_GAS * gas_price),
+                strategy.strategyState(),
+            )
+
+        try:
+            results = read_batched(
+                self.strategies, read, block, self.batch_size, self.multicall_address
+            )
+        except Exception as e:
+            return [
+                StrategyState(s.address, False, False, 0, 0, error=str(e))
+                for s in self.strategies
+            ]
+
+        states = []
+        for strategy, (harvest, tend, state) in zip(self.strategies, results):
+            # the results are multicall proxies, `in` compares them by value
+            if None in (harvest, tend, state):
+                states.append(
+                    StrategyState(
+                        strategy.address, False, False, 0, 0, error="read reverted"
+                    )
+                )
+                continue
+            states.append(
+                StrategyState(
+                    strategy.address,
+                    bool(harvest),
+                    bool(tend),
+                    int(state["pendingSTG"]),
+                    int(state["estimatedTotalAssets"]),
+                )
+            )
+        return states
+
+    async def dry_run(self, strategy, state, fn_name):
+        try:
+            await self._run(getattr(strategy, fn_name).call, {"from": self.keeper})
+            state.dry_run_ok = True
+        except Exception as e:
+            state.dry_run_ok = False
+            state.error = str(e)
+        return state
+
+    async def run_cycle(self):
+        # created here so it belongs to the running event loop
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        block = web3.eth.block_number
+        gas_price = self._current_gas_price()
+        report = CycleReport(block=block)
+
+        start = time.perf_counter()
+        report.states = await self._run(self.read_states, block, gas_price)
+        report.read_seconds = time.perf_counter() - start
+
+        by_address = {s.address: s for s in self.strategies}
+        candidates = []
+        for state in report.states:
+            if state.harvest_trigger:
+                candidates.append((state, "harvest"))
+            elif state.tend_trigger:
+                candidates.append((state, "tend"))
+
+        start = time.perf_counter()
+        await asyncio.gather(
+            *(self.dry_run(by_address[st.address], st, fn) for st, fn in candidates)
+        )
+        report.dry_run_seconds = time.perf_counter() - start
+
+        # one account, one nonce sequence: transactions go out one after the other
+        start = time.perf_counter()
+        for state, fn_name in candidates:
+            if not state.dry_run_ok:
+                continue
+            strategy = by_address[state.address]
+            try:
+                getattr(strategy, fn_name)(
+                    {"from": self.keeper, "gas_price": gas_price}
+                )
+            except Exception as e:
+                # a submit can still fail after its dry-run (funds, nonce, a state change
+                # in between), the rest of the fleet goes out regardless
+                state.error = str(e)
+                report.failed.append(state.address)
+                continue
+            (report.harvested if fn_name == "harvest" else report.tended).append(
+                state.address
+            )
+        report.submit_seconds = time.perf_counter() - start
+        return report
+
+    async def run_forever(self, interval):
+        while True:
+            report = await self.run_cycle()
+            click.echo(report.summary())
+            for state in report.states:
+                if state.error:
+                    click.echo(f"  {state.address}: {state.error}")
+            await asyncio.sleep(interval)
+
+
+def main(strategies_file=None, interval=60, max_concurrency=16):
+    print(f"You are using the '{network.show_active()}' network")
+    strategies_file = strategies_file or os.environ["KEEPER_STRATEGIES"]
+    if network.show_active() == "development":
+        keeper = accounts[0]
+    else:
+        keeper = accounts.load(os.getenv("KEEPER_ACCOUNT") or click.prompt("Account"))
+
+    with Keeper(
+        load_strategies(strategies_file), keeper, max_concurrency=int(max_concurrency)
+    ) as keeper_bot:
+        asyncio.run(keeper_bot.run_forever(int(interval)))
@@ -0,0 +1,376 @@
+"""
+Replays randomized flow from many depositors against a vault and strategy on the local
+Stargate stand-ins.
+
+Depositors deposit and withdraw, the keeper harvests and tends, and blocks go by, with
+STG accruing and the pool's LP exchange rate growing. The STG is sold through the trade
+factory. Every draw comes from a configurable distribution with a fixed seed:
+
+- deposit sizes are lognormal around `deposit_median` want,
+- withdrawals take a Beta(`withdraw_alpha`, `withdraw_beta`) fraction of the shares,
+- each accrual mines an exponential number of blocks and grows the LP exchange rate
+  by an exponential number of bps.
+
+The report has gas percentiles per operation, throughput and reverts. It also tracks
+the strategy's accounting drift, `estimatedTotalAssets()` minus its vault debt, sampled
+every `sample_every` operations and after every harvest:
+
+    brownie run load_harness main load.json --network development
+
+`load.json` holds any `LoadConfig` fields, LOAD_OUTPUT names a JSON file the report is
+written to. Two reports, e.g. from two contract revisions, are compared with:
+
+    brownie run load_harness compare before.json after.json
+"""
+import json
+import os
+import time
+from collections import Counter, defaultdict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Dict
+
+import numpy as np
+
+from brownie import Strategy, accounts, chain, network, web3
+from brownie.exceptions import VirtualMachineError
+import click
+
+from scripts.local_stack import deploy_stargate_stack, deploy_vault
+
+MAX_BPS = 10_000
+PERCENTILES = (50, 90, 99)
+# depositors are topped up with ETH for gas when they run low
+MIN_GAS_BALANCE = 10 ** 16
+GAS_FUNDING = 2 * 10 ** 16
+
+DEFAULT_WEIGHTS = {
+    "deposit": 40,
+    "withdraw": 25,
+    "harvest": 5,
+    "tend": 5,
+    "accrue": 20,
+    "sell_rewards": 5,
+}
+
+
+@dataclass
+class LoadConfig:
+    operations: int = 2_000
+    depositors: int = 1_000
+    seed: int = 0
+    # relative frequency of every operation
+    weights: Dict[str, int] = field(default_factory=lambda: dict(DEFAULT_WEIGHTS))
+    # deposit size in want, lognormal
+    deposit_median: float = 5_000.0
+    deposit_sigma: float = 1.5
+    # fraction of a depositor's shares withdrawn, Beta(alpha, beta)
+    withdraw_alpha: float = 0.5
+    withdraw_beta: float = 0.5
+    max_loss_bps: int = 1
+    # blocks mined and LP exchange rate growth per accrual, both exponential
+    accrue_blocks_mean: float = 100.0
+    accrue_rate_bps_mean: float = 0.5
+    seconds_per_block: int = 12
+    sample_every: int = 25
+
+    @classmethod
+    def from_file(cls, path):
+        return cls(**json.loads(Path(path).read_text()))
+
+
+@dataclass
+class LoadReport:
+    config: dict
+    operations: int
+    seconds: float
+    total_gas: int
+    # per operation: count, mean, p50, p90, p99 and max gas, mean seconds per transaction
+    gas: Dict[str, dict]
+    # per operation, revert reason: count
+    reverts: Dict[str, dict]
+    # operations that had nothing to do, e.g. a withdrawal before any deposit
+    skipped: Dict[str, int]
+    # estimatedTotalAssets() - totalDebt: samples, min, max, max |drift| in bps of debt, last
+    drift: dict
+
+    @property
+    def throughput(self):
+        return self.operations / self.seconds if self.seconds else 0.0
+
+    def to_dict(self):
+        return {**asdict(self), "throughput": self.throughput}
+
+    def write(self, path):
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+
+    def table(self):
+        lines = [
+            f"{self.operations} operations in {self.seconds:.1f}s ({self.throughput:.1f}/s), "
+            f"{self.total_gas} gas",
+            f"{'operation':<14}{'count':>7}{'reverts':>9}{'mean':>10}"
+            + "".join(f"{f'p{p}':>10}" for p in PERCENTILES)
+            + f"{'max':>10}{'ms/tx':>8}",
+        ]
+        for op, stats in sorted(self.gas.items()):
+            lines.append(
+                f"{op:<14}{stats['count']:>7}{sum(self.reverts.get(op, {}).values()):>9}"
+                f"{stats['mean']:>10}"
+                + "".join(f"{stats[f'p{p}']:>10}" for p in PERCENTILES)
+                + f"{stats['max']:>10}{stats['seconds'] * 1000:>8.1f}"
+            )
+        for op, reasons in sorted(self.reverts.items()):
+            for reason, count in sorted(reasons.items()):
+                lines.append(f"{op} reverted {count}x: {reason}")
+        drift = self.drift
+        lines.append(
+            f"drift over {drift['samples']} samples: min {drift['min']}, max {drift['max']}, "
+            f"max {drift['max_abs_bps']:.2f} bps of debt, last {drift['last']}"
+        )
+        return "\n".join(lines)
+
+
+def _gas_stats(gas, seconds):
+    gas = np.array(gas)
+    return {
+        "count": len(gas),
+        "mean": int(gas.mean()),
+        **{f"p{p}": int(np.percentile(gas, p)) for p in PERCENTILES},
+        "max": int(gas.max()),
+        "seconds": float(np.mean(seconds)),
+    }
+
+
+class LoadHarness:
+    """
+    Drives `vault` and `strategy` with `config.operations` random operations. `stack`
+    is the namespace of `deploy_stargate_stack`, its deployer mints want and runs the
+    trade factory, `funder` pays the depositors' gas.
+    """
+
+    def __init__(self, vault, strategy, token, stack, keeper, config, funder=None):
+        self.vault = vault
+        self.strategy = strategy
+        self.token = token
+        self.stack = stack
+        self.keeper = keeper
+        self.config = config
+        self.funder = funder or accounts[0]
+        self.pool = stack.usdc_pool if token == stack.usdc else stack.usdt_pool
+        self.unit = 10 ** token.decimals()
+        self.rng = np.random.default_rng(config.seed)
+
+        self.ops = list(config.weights)
+        weights = np.array([config.weights[op] for op in self.ops], dtype=float)
+        self.probabilities = weights / weights.sum()
+
+        self.depositors = {}
+        self.holders = set()
+        self.gas = defaultdict(list)
+        self.seconds = defaultdict(list)
+        self.reverts = defaultdict(Counter)
+        self.skipped = Counter()
+        self.drift = []
+
+    def depositor(self, i):
+        if i not in self.depositors:
+            # derived from the seed so a run can be replayed
+            key = web3.keccak(text=f"load-harness-{self.config.seed}-{i}").hex()
+            self.depositors[i] = accounts.add(key)
+        account = self.depositors[i]
+        if account.balance() < MIN_GAS_BALANCE:
+            self.funder.transfer(account, GAS_FUNDING)
+        return account
+
+    def _measure(self, op, fn, *args):
+        start = time.perf_counter()
+        try:
+            tx = fn(*args)
+        except VirtualMachineError as e:
+            self.reverts[op][e.revert_msg or "reverted"] += 1
+            return None
+        self.seconds[op].append(time.perf_counter() - start)
+        self.gas[op].append(tx.gas_used)
+        return tx
+
+    def _sample_drift(self, step):
+        debt = self.vault.strategies(self.strategy)["totalDebt"]
+        self.drift.append((step, self.strategy.estimatedTotalAssets() - debt, debt))
+
+    # ---------------------------- operations ----------------------------
+
+    def _deposit(self):
+        i = int(self.rng.integers(self.config.depositors))
+        account = self.depositor(i)
+        amount = self.rng.lognormal(
+            np.log(self.config.deposit_median), self.config.deposit_sigma
+        )
+        amount = max(int(amount * self.unit), 1)
+        self.token.mint(account, amount, {"from": self.stack.deployer})
+        self.token.approve(self.vault, amount, {"from": account})
+        if self._measure("deposit", self.vault.deposit, amount, {"from": account}):
+            self.holders.add(i)
+
+    def _withdraw(self):
+        if not self.holders:
+            self.skipped["withdraw"] += 1
+            return
+        i = sorted(self.holders)[int(self.rng.integers(len(self.holders)))]
+        account = self.depositor(i)
+        balance = self.vault.balanceOf(account)
+        fraction = self.rng.beta(self.config.withdraw_alpha, self.config.withdraw_beta)
+        shares = min(max(int(balance * fraction), 1), balance)
+        self._measure(
+            "withdraw",
+            self.vault.withdraw,
+            shares,
+            account,
+            self.config.max_loss_bps,
+            {"from": account},
+        )
+        if self.vault.balanceOf(account) == 0:
+            self.holders.discard(i)
+
+    def _harvest(self):
+        chain.sleep(1)
+        return self._measure("harvest", self.strategy.harvest, {"from": self.keeper})
+
+    def _tend(self):
+        self._measure("tend", self.strategy.tend, {"from": self.keeper})
+
+    def _accrue(self):
+        blocks = 1 + int(self.rng.exponential(self.config.accrue_blocks_mean))
+        chain.mine(blocks, timedelta=blocks * self.config.seconds_per_block)
+        # LP fees: liquidity grows against the same LP supply, backed by want in the pool
+        growth_ppm = int(self.rng.exponential(self.config.accrue_rate_bps_mean) * 100)
+        liquidity = self.pool.totalLiquidity()
+        growth = liquidity * growth_ppm // 1_000_000
+        if growth:
+            deployer = self.stack.deployer
+            self.token.mint(
+                self.pool, growth * self.pool.convertRate(), {"from": deployer}
+            )
+            self.pool.setTotalLiquidity(liquidity + growth, {"from": deployer})
+
+    def _sell_rewards(self):
+        stg, swapper = self.stack.stg, self.stack.swapper
+        amount = stg.balanceOf(self.strategy)
+        if amount == 0:
+            self.skipped["sell_rewards"] += 1
+            return
+        self._measure(
+            "sell_rewards",
+            self.stack.trade_factory.execute["tuple,address,bytes"],
+            [self.strategy, stg, self.token, amount, 0],
+            swapper,
+            swapper.swap.encode_input(stg, self.token, amount, self.strategy),
+            {"from": self.stack.deployer},
+        )
+
+    def run(self, progress=None) -> LoadReport:
+        draws = self.rng.choice(
+            len(self.ops), size=self.config.operations, p=self.probabilities
+        )
+        start = time.perf_counter()
+        for step, draw in enumerate(draws):
+            op = self.ops[draw]
+            getattr(self, f"_{op}")()
+            if op == "harvest" or step % self.config.sample_every == 0:
+                self._sample_drift(step)
+            if progress and (step + 1) % max(self.config.operations // 10, 1) == 0:
+                progress(f"{step + 1}/{self.config.operations} operations")
+        seconds = time.perf_counter() - start
+        self._sample_drift(self.config.operations)
+        return self.report(seconds)
+
+    def report(self, seconds) -> LoadReport:
+        drifts = [drift for _, drift, _ in self.drift]
+        drift_bps = [
+            abs(drift) * MAX_BPS / debt for _, drift, debt in self.drift if debt
+        ]
+        return LoadReport(
+            config=asdict(self.config),
+            operations=self.config.operations,
+            seconds=seconds,
+            total_gas=sum(sum(gas) for gas in self.gas.values()),
+            gas={op: _gas_stats(gas, self.seconds[op]) for op, gas in self.gas.items()},
+            reverts={op: dict(reasons) for op, reasons in self.reverts.items()},
+            skipped=dict(self.skipped),
+            drift={
+                "samples": len(drifts),
+                "min": min(drifts),
+                "max": max(drifts),
+                "max_abs_bps": max(drift_bps, default=0.0),
+                "last": drifts[-1],
+            },
+        )
+
+
+def deploy(token_name="usdc"):
+    """A vault and strategy for `token_name` on fresh stand-ins, roles as in the tests."""
+    rewards, guardian, management, strategist, keeper, gov = accounts[1:7]
+    stack = deploy_stargate_stack(accounts[9])
+    token = getattr(stack, token_name)
+    vault = deploy_vault(token, gov, rewards, guardian, management)
+    pid = 0 if token == stack.usdc else 1
+    strategy = Strategy.deploy(
+        vault,
+        stack.lp_staker,
+        pid,
+        stack.price_feed,
+        "StrategyStargateLoad",
+        {"from": strategist},
+    )
+    strategy.setKeeper(keeper, {"from": gov})
+    vault.addStrategy(strategy, 10_000, 0, 2 ** 256 - 1, 1_000, {"from": gov})
+    trade_factory = stack.trade_factory
+    trade_factory.grantRole(
+        trade_factory.STRATEGY(), strategy, {"from": stack.deployer}
+    )
+    strategy.setTradeFactory(trade_factory, {"from": gov})
+    return stack, vault, strategy, keeper
+
+
+def compare_reports(before, after):
+    """Gas percentiles and drift of two report dicts, side by side."""
+    lines = [f"{'operation':<14}" + "".join(f"{f'p{p}':>30}" for p in PERCENTILES)]
+    for op in sorted(set(before["gas"]) | set(after["gas"])):
+        cells = []
+        for p in PERCENTILES:
+            old = before["gas"].get(op, {}).get(f"p{p}")
+            new = after["gas"].get(op, {}).get(f"p{p}")
+            if old and new:
+                cells.append(f"{old} -> {new} ({(new - old) / old:+.2%})")
+            else:
+                cells.append(f"{old} -> {new}")
+        lines.append(f"{op:<14}" + "".join(f"{cell:>30}" for cell in cells))
+    lines.append(
+        f"throughput {before['throughput']:.1f}/s -> {after['throughput']:.1f}/s, "
+        f"max drift {before['drift']['max_abs_bps']:.2f} -> "
+        f"{after['drift']['max_abs_bps']:.2f} bps of debt"
+    )
+    return "\n".join(lines)
+
+
+def main(config_file=None):
+    if network.show_active() != "development":
+        raise SystemExit(
+            f"the load harness deploys its own stand-ins, not on {network.show_active()}"
+        )
+    config_file = config_file or os.getenv("LOAD_CONFIG")
+    config = LoadConfig.from_file(config_file) if config_file else LoadConfig()
+
+    stack, vault, strategy, keeper = deploy()
+    harness = LoadHarness(vault, strategy, stack.usdc, stack, keeper, config)
+    report = harness.run(progress=click.echo)
+    click.echo(report.table())
+
+    output = os.getenv("LOAD_OUTPUT")
+    if output:
+        report.write(output)
+
+
+def compare(before_file, after_file):
+    before = json.loads(Path(before_file).read_text())
+    after = json.loads(Path(after_file).read_text())
+    click.echo(compare_reports(before, after))
@@ -0,0 +1,97 @@
+"""
+Deploys local stand-ins for Stargate (router, pools, LP staking), the Chainlink feed,
+the ySwaps trade factory and the ERC-20s, from contracts/mocks. The test suite runs on
+them with `--stack local`, and scripts/load_harness.py drives a vault and strategy
+deployed on top of them.
+"""
+from functools import lru_cache
+from pathlib import Path
+from types import SimpleNamespace
+
+from brownie import config, project
+
+# where `brownie pm install` puts packages
+PACKAGES_FOLDER = Path.home().joinpath(".brownie", "packages")
+
+
+def deploy_stargate_stack(deployer):
+    # the project's contracts can only be imported once brownie has loaded it
+    from brownie import (
+        MockERC20,
+        MockLPStaking,
+        MockPriceFeed,
+        MockStargatePool,
+        MockStargateRouter,
+        MockSwapper,
+        MockTradeFactory,
+    )
+
+    usdc = deployer.deploy(MockERC20, "USD Coin", "USDC", 6)
+    usdt = deployer.deploy(MockERC20, "Tether USD", "USDT", 6)
+    stg = deployer.deploy(MockERC20, "StargateToken", "STG", 18)
+    weth = deployer.deploy(MockERC20, "Wrapped Ether", "WETH", 18)
+
+    router = deployer.deploy(MockStargateRouter)
+    usdc_pool = deployer.deploy(
+        MockStargatePool, 1, usdc, router, 6, "S*USDC", "S*USDC"
+    )
+    usdt_pool = deployer.deploy(
+        MockStargatePool, 2, usdt, router, 6, "S*USDT", "S*USDT"
+    )
+    router.createPool(1, usdc_pool, {"from": deployer})
+    router.createPool(2, usdt_pool, {"from": deployer})
+
+    lp_staker = deployer.deploy(MockLPStaking, stg, 10 ** 18)
+    lp_staker.add(1_000, usdc_pool, {"from": deployer})
+    lp_staker.add(1_000, usdt_pool, {"from": deployer})
+    stg.mint(lp_staker, 10 ** 27, {"from": deployer})
+
+    # seed both pools so the LP exchange rate is defined, like on mainnet
+    for token, pool in ((usdc, usdc_pool), (usdt, usdt_pool)):
+        seed = 10_000_000 * 10 ** token.decimals()
+        token.mint(deployer, seed, {"from": deployer})
+        token.approve(router, seed, {"from": deployer})
+        router.addLiquidity(pool.poolId(), seed, deployer, {"from": deployer})
+
+    # USDC/ETH, 18 decimals
+    price_feed = deployer.deploy(MockPriceFeed, 18, 5 * 10 ** 14)
+
+    trade_factory = deployer.deploy(MockTradeFactory)
+    swapper = deployer.deploy(MockSwapper)
+    # 1 STG = 0.5 USDC
+    swapper.setRate(stg, usdc, 5 * 10 ** 5, {"from": deployer})
+    swapper.setRate(stg, usdt, 5 * 10 ** 5, {"from": deployer})
+
+    return SimpleNamespace(
+        deployer=deployer,
+        usdc=usdc,
+        usdt=usdt,
+        stg=stg,
+        weth=weth,
+        router=router,
+        usdc_pool=usdc_pool,
+        usdt_pool=usdt_pool,
+        lp_staker=lp_staker,
+        price_feed=price_feed,
+        trade_factory=trade_factory,
+        swapper=swapper,
+    )
+
+
+@lru_cache(maxsize=None)
+def vault_project():
+    """The yearn-vaults package the strategies are built against, loaded like `pm` does."""
+    project_id = config["dependencies"][0]
+    # hands back the package if the `pm` fixture already loaded it
+    return project.load(
+        PACKAGES_FOLDER.joinpath(project_id), project_id, raise_if_loaded=False
+    )
+
+
+def deploy_vault(token, gov, rewards, guardian, management):
+    Vault = vault_project().Vault
+    vault = guardian.deploy(Vault)
+    vault.initialize(token, gov, rewards, "", "", guardian, management)
+    vault.setDepositLimit(2 ** 256 - 1, {"from": gov})
+    vault.setManagement(management, {"from": gov})
+    return vault
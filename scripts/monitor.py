@@ -0,0 +1,108 @@
+"""
+Reads the position of many strategies at one block, `strategyState()` for up to
+`batch_size` strategies per Multicall2 `eth_call`. `read_batched` does the same for
+any set of view calls and is shared with the keeper.
+
+    brownie run monitor main strategies.json --network mainnet
+
+Networks without a Multicall2 in brownie's network config get one deployed per
+batch, pass `multicall_address` to reuse a single deployment.
+"""
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from brownie import Contract, Strategy, multicall, network, web3
+import click
+
+BATCH_SIZE = 200
+
+
+def load_strategies(path):
+    """Reads a JSON list of strategy addresses, or a {"strategies": [...]} object."""
+    data = json.loads(Path(path).read_text())
+    if isinstance(data, dict):
+        data = data["strategies"]
+    return [Contract.from_abi("Strategy", address, Strategy.abi) for address in data]
+
+
+@dataclass
+class StrategyPosition:
+    address: str
+    block: int
+    loose_want: int
+    unstaked_lp: int
+    staked_lp: int
+    value_of_lp: int
+    pending_stg: int
+    balance_of_stg: int
+    estimated_total_assets: int
+
+    @classmethod
+    def from_state(cls, address, block, state):
+        # field order of BaseStargateStrategy.StrategyState
+        return cls(address, block, *(int(value) for value in state))
+
+
+def read_batched(
+    strategies, read, block=None, batch_size=BATCH_SIZE, multicall_address=None
+):
+    """
+    `read(strategy)` for every strategy, in order, with the view calls it makes
+    batched into one Multicall2 `eth_call` per `batch_size` strategies, all at
+    `block` (latest by default). A call that reverts resolves to None.
+    """
+    block = web3.eth.block_number if block is None else block
+    results = []
+    for i in range(0, len(strategies), batch_size):
+        batch = strategies[i : i + batch_size]
+        with multicall(address=multicall_address, block_identifier=block):
+            results += [read(strategy) for strategy in batch]
+    return results
+
+
+def read_positions(
+    strategies, block=None, batch_size=BATCH_SIZE, multicall_address=None
+) -> List[Optional[StrategyPosition]]:
+    """
+    One `StrategyPosition` per strategy, in order, all read at `block` (latest by
+    default). Strategies whose call fails, e.g. ones deployed before
+    `strategyState()` existed, come back as None.
+    """
+    block = web3.eth.block_number if block is None else block
+    states = read_batched(
+        strategies,
+        lambda strategy: strategy.strategyState(),
+        block,
+        batch_size,
+        multicall_address,
+    )
+    return [
+        StrategyPosition.from_state(strategy.address, block, state) if state else None
+        for strategy, state in zip(strategies, states)
+    ]
+
+
+def main(strategies_file=None, batch_size=BATCH_SIZE):
+    print(f"You are using the '{network.show_active()}' network")
+    strategies = load_strategies(strategies_file or os.environ["MONITOR_STRATEGIES"])
+
+    start = time.perf_counter()
+    positions = read_positions(strategies, batch_size=int(batch_size))
+    seconds = time.perf_counter() - start
+
+    click.echo(
+        f"{'strategy':<44}{'assets':>20}{'want':>20}{'LP value':>20}{'pending STG':>26}"
+    )
+    for strategy, position in zip(strategies, positions):
+        if position is None:
+            click.echo(f"{strategy.address:<44}{'strategyState() failed':>20}")
+            continue
+        click.echo(
+            f"{position.address:<44}{position.estimated_total_assets:>20}"
+            f"{position.loose_want:>20}{position.value_of_lp:>20}{position.pending_stg:>26}"
+        )
+    click.echo(f"read {len(strategies)} strategies in {seconds:.2f}s")
@@ -0,0 +1,750 @@
+"""
+In-memory reference model of the Stargate strategy's accounting.
+
+`StrategyModel` mirrors Strategy.sol function by function (`prepareReturn`,
+`_withdrawSome`, `_lpForWant`, `liquidatePosition`, `adjustPosition`, ...) with the
+same integer arithmetic, on top of models of the Stargate pool and of LPStaking.
+`prepare_return` is the exception: it is written from what a harvest has to report, so
+the differential run can catch `prepareReturn` paying the debt from the wrong balance.
+Solidity reverts (SafeMath, `"!check"`, `"!liquidity"`, Stargate requires) are raised as `Revert`
+with the same message, so a sequence that reverts on chain raises here too.
+
+`VaultModel` is a single-strategy cut of Vault 0.4.3 (`report`, `creditAvailable`,
+`debtOutstanding`, `withdraw`), enough to drive harvests without a chain. Share
+pricing ignores locked profit and fees.
+
+`fuzz` runs random operation sequences through the models on every core and checks
+the invariants in `check_invariants` after each step. tests/differential.py runs the
+same sequences against the deployed contracts.
+
+    python -m scripts.reference_model [sequences] [steps] [workers]
+"""
+import copy
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from multiprocessing import Pool
+from typing import List, Optional, Tuple
+
+MAX_BPS = 10_000
+ACC_PRECISION = 10 ** 12
+
+
+class Revert(Exception):
+    """A revert the contract would raise, with its reason string."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class InvariantError(AssertionError):
+    pass
+
+
+def _sub(a, b):
+    if b > a:
+        raise Revert("SafeMath: subtraction overflow")
+    return a - b
+
+
+def _div(a, b):
+    if b == 0:
+        raise Revert("SafeMath: division by zero")
+    return a // b
+
+
+@dataclass
+class PoolModel:
+    """
+    Stargate Pool: LP in shared decimals backed by `total_liquidity`, of which
+    `delta_credit` can be redeemed instantly.
+    """
+
+    total_liquidity: int
+    total_supply: int
+    convert_rate: int = 1
+    delta_credit: int = 0
+
+    def amount_lp_to_sd(self, amount_lp):
+        if self.total_supply == 0:
+            raise Revert("Stargate: cant convert LPtoSD when totalSupply == 0")
+        return amount_lp * self.total_liquidity // self.total_supply
+
+    def amount_sd_to_lp(self, amount_sd):
+        if self.total_liquidity == 0:
+            raise Revert("Stargate: cant convert SDtoLP when totalLiq == 0")
+        return amount_sd * self.total_supply // self.total_liquidity
+
+    def amount_lp_to_ld(self, amount_lp):
+        return self.amount_lp_to_sd(amount_lp) * self.convert_rate
+
+    def add_liquidity(self, amount_ld):
+        """Router.addLiquidity, returns (want spent, LP minted)."""
+        amount_ld = amount_ld // self.convert_rate * self.convert_rate
+        amount_sd = amount_ld // self.convert_rate
+        if self.total_liquidity == 0:
+            amount_lp = amount_sd
+        else:
+            amount_lp = _div(amount_sd * self.total_supply, self.total_liquidity)
+        self.total_liquidity += amount_sd
+        self.delta_credit += amount_sd
+        self.total_supply += amount_lp
+        return amount_ld, amount_lp
+
+    def instant_redeem_local(self, amount_lp):
+        """
+        Router.instantRedeemLocal, returns (LP burned, want sent back). Only what the
+        delta credit covers is redeemed.
+        """
+        amount_lp = min(amount_lp, self.amount_sd_to_lp(self.delta_credit))
+        amount_sd = self.amount_lp_to_sd(amount_lp)
+        self.delta_credit = _sub(self.delta_credit, amount_sd)
+        self.total_supply = _sub(self.total_supply, amount_lp)
+        self.total_liquidity = _sub(self.total_liquidity, amount_sd)
+        return amount_lp, amount_sd * self.convert_rate
+
+
+@dataclass
+class StakerModel:
+    """One LPStaking (MasterChef) pool, with the strategy as one of its users."""
+
+    stargate_per_block: int
+    alloc_point: int
+    total_alloc_point: int
+    last_reward_block: int
+    acc_stargate_per_share: int = 0
+    lp_supply: int = 0
+    amount: int = 0
+    reward_debt: int = 0
+
+    def _pool_reward(self, block):
+        return (
+            (block - self.last_reward_block)
+            * self.stargate_per_block
+            * self.alloc_point
+            // self.total_alloc_point
+        )
+
+    def pending(self, block):
+        acc = self.acc_stargate_per_share
+        if block > self.last_reward_block and self.lp_supply != 0:
+            acc += self._pool_reward(block) * ACC_PRECISION // self.lp_supply
+        return _sub(self.amount * acc // ACC_PRECISION, self.reward_debt)
+
+    def update_pool(self, block):
+        if block <= self.last_reward_block:
+            return
+        if self.lp_supply != 0:
+            self.acc_stargate_per_share += (
+                self._pool_reward(block) * ACC_PRECISION // self.lp_supply
+            )
+        self.last_reward_block = block
+
+    def _harvest(self):
+        return _sub(
+            self.amount * self.acc_stargate_per_share // ACC_PRECISION, self.reward_debt
+        )
+
+    def deposit(self, amount, block):
+        """Returns the STG paid out."""
+        self.update_pool(block)
+        paid = self._harvest() if self.amount > 0 else 0
+        self.amount += amount
+        self.reward_debt = self.amount * self.acc_stargate_per_share // ACC_PRECISION
+        self.lp_supply += amount
+        return paid
+
+    def withdraw(self, amount, block):
+        if amount > self.amount:
+            raise Revert("withdraw: _amount is too large")
+        self.update_pool(block)
+        paid = self._harvest()
+        self.amount -= amount
+        self.reward_debt = self.amount * self.acc_stargate_per_share // ACC_PRECISION
+        self.lp_supply = _sub(self.lp_supply, amount)
+        return paid
+
+    def emergency_withdraw(self):
+        amount, self.amount, self.reward_debt = self.amount, 0, 0
+        self.lp_supply = _sub(self.lp_supply, amount)
+        return amount
+
+
+@dataclass
+class PositionSnapshot:
+    loose_want: int
+    unstaked_lp: int
+    staked_lp: int
+    value_of_lp: int
+
+
+@dataclass
+class StrategyModel:
+    pool: PoolModel
+    staker: StakerModel
+    want: int = 0
+    unstaked_lp: int = 0
+    stg: int = 0
+    emergency_exit: bool = False
+    pending_redemption: int = 0
+    # want per 1e18 STG the compounding router pays, 0 when compounding is off. The
+    # fill is assumed to clear the oracle bound.
+    compound_rate: int = 0
+
+    @property
+    def staked_lp(self):
+        return self.staker.amount
+
+    # ---------------------------- views ----------------------------
+
+    def snapshot_position(self):
+        position = PositionSnapshot(self.want, self.unstaked_lp, self.staked_lp, 0)
+        total_lp = position.unstaked_lp + position.staked_lp
+        if total_lp > 0:
+            position.value_of_lp = self.pool.amount_lp_to_ld(total_lp)
+        return position
+
+    def estimated_total_assets(self):
+        position = self.snapshot_position()
+        return position.loose_want + position.value_of_lp
+
+    def pending_stg(self, block):
+        return self.staker.pending(block)
+
+    def lp_for_want(self, position, amount_of_want):
+        total_lp = position.unstaked_lp + position.staked_lp
+        if amount_of_want >= position.value_of_lp:
+            return total_lp
+
+        lp_amount = amount_of_want * total_lp // position.value_of_lp + 1
+        quoted_want = self.pool.amount_lp_to_ld(lp_amount)
+        if quoted_want < amount_of_want:
+            lp_amount += (amount_of_want - quoted_want) * lp_amount // (
+                quoted_want + 1
+            ) + 1
+        return min(lp_amount, total_lp)
+
+    def instantly_redeemable_lp(self):
+        if self.pool.total_liquidity == 0:
+            return 0
+        return (
+            self.pool.delta_credit * self.pool.total_supply // self.pool.total_liquidity
+        )
+
+    # ---------------------------- internals ----------------------------
+
+    def _claim_rewards(self, block):
+        if self.staker.pending(block) > 0:
+            self._stake_lp(0, block)
+
+    def _stake_lp(self, amount, block):
+        self.unstaked_lp = _sub(self.unstaked_lp, amount)
+        self.stg += self.staker.deposit(amount, block)
+
+    def _add_to_lp(self, amount):
+        spent, minted = self.pool.add_liquidity(amount)
+        self.want = _sub(self.want, spent)
+        self.unstaked_lp += minted
+
+    def _redeem_lp(self, amount_lp):
+        burned, amount_ld = self.pool.instant_redeem_local(amount_lp)
+        self.unstaked_lp = _sub(self.unstaked_lp, burned)
+        self.want += amount_ld
+
+    def _redeem_available(self, block):
+        """Mirrors `_redeemAvailable`."""
+        total_lp = self.unstaked_lp + self.staked_lp
+        lp_to_redeem = min(total_lp, self.instantly_redeemable_lp())
+        if lp_to_redeem > self.unstaked_lp:
+            to_unstake = lp_to_redeem - self.unstaked_lp
+            self.stg += self.staker.withdraw(to_unstake, block)
+            self.unstaked_lp += to_unstake
+        if lp_to_redeem > 0:
+            self._redeem_lp(lp_to_redeem)
+
+        remaining_lp = total_lp - lp_to_redeem
+        self.pending_redemption = (
+            self.pool.amount_lp_to_ld(remaining_lp) if remaining_lp > 0 else 0
+        )
+
+    def withdraw_some(self, position, amount_needed, block):
+        """Mirrors `_withdrawSome`, updating `position` in place."""
+        pre_withdraw_want = position.loose_want
+        lp_needed = self.lp_for_want(position, amount_needed)
+        lp_to_redeem = min(lp_needed, self.instantly_redeemable_lp())
+        if lp_to_redeem > 0:
+            if lp_to_redeem > position.unstaked_lp:
+                to_unstake = lp_to_redeem - position.unstaked_lp
+                self.stg += self.staker.withdraw(to_unstake, block)
+                self.unstaked_lp += to_unstake
+                position.staked_lp = _sub(position.staked_lp, to_unstake)
+                position.unstaked_lp = lp_to_redeem
+
+            self._redeem_lp(lp_to_redeem)
+            position.unstaked_lp = _sub(position.unstaked_lp, lp_to_redeem)
+            position.loose_want = self.want
+            remaining_lp = position.unstaked_lp + position.staked_lp
+            position.value_of_lp = (
+                self.pool.amount_lp_to_ld(remaining_lp) if remaining_lp > 0 else 0
+            )
+
+        # rounded up by the shared-decimals unit the pool truncates when the LP is split
+        held_back = (
+            self.pool.amount_lp_to_ld(lp_needed - lp_to_redeem) + self.pool.convert_rate
+            if lp_needed > lp_to_redeem
+            else 0
+        )
+        liquid_assets = _sub(position.loose_want, pre_withdraw_want)
+        return min(amount_needed, liquid_assets), held_back
+
+    # ---------------------------- strategy hooks ----------------------------
+
+    def prepare_return(self, debt_outstanding, vault_debt, block):
+        """
+        Returns (profit, loss, debt_payment). Written from what a harvest has to report
+        rather than from `prepareReturn`: whatever the position holds above the vault's
+        debt is profit, the strategy frees what it needs to pay that and the debt, and
+        every unit of want it holds afterwards counts towards the debt first.
+        """
+        self._claim_rewards(block)
+        if self.compound_rate and self.stg:
+            self.want += self.stg * self.compound_rate // 10 ** 18
+            self.stg = 0
+
+        total_assets = self.estimated_total_assets()
+        profit = max(total_assets - vault_debt, 0)
+        if debt_outstanding + profit > self.want:
+            self.withdraw_some(
+                self.snapshot_position(), debt_outstanding + profit - self.want, block
+            )
+            total_assets = self.estimated_total_assets()
+
+        debt_payment = min(debt_outstanding, self.want)
+        # debt the LP still covers but Stargate could not pay out yet
+        self.pending_redemption = min(
+            debt_outstanding - debt_payment, total_assets - self.want
+        )
+        loss = max(vault_debt - total_assets, 0)
+        if loss > profit:
+            return 0, loss - profit, debt_payment
+        # profit still in LP waits until it is paid out
+        return min(profit - loss, self.want - debt_payment), 0, debt_payment
+
+    def adjust_position(self, debt_outstanding, block):
+        if self.emergency_exit:
+            self._redeem_available(block)
+            return
+        if self.want > debt_outstanding:
+            self._add_to_lp(self.want - debt_outstanding)
+        if self.unstaked_lp > 0:
+            self._stake_lp(self.unstaked_lp, block)
+
+    def liquidate_position(self, amount_needed, block):
+        """Returns (liquidated_amount, loss)."""
+        position = self.snapshot_position()
+        liquid_assets = position.loose_want
+        loss = 0
+
+        held_back = 0
+
+        if liquid_assets < amount_needed:
+            _, held_back = self.withdraw_some(
+                position, amount_needed - liquid_assets, block
+            )
+            liquid_assets = position.loose_want
+            covered = liquid_assets + (position.value_of_lp if held_back > 0 else 0)
+            loss = amount_needed - covered if amount_needed > covered else 0
+
+        liquidated_amount = min(amount_needed, liquid_assets)
+        if (
+            liquidated_amount + loss > amount_needed
+            or liquidated_amount + loss + held_back < amount_needed
+        ):
+            raise Revert("!check")
+        return liquidated_amount, loss
+
+    def liquidate_all_positions(self):
+        # checked up front, the revert undoes the emergency withdraw on chain
+        if self.unstaked_lp + self.staked_lp > self.instantly_redeemable_lp():
+            raise Revert("!liquidity")
+        self.unstaked_lp += self.staker.emergency_withdraw()
+        if self.unstaked_lp > 0:
+            self._redeem_lp(self.unstaked_lp)
+        self.pending_redemption = 0
+        return self.want
+
+    # ---------------------------- BaseStrategy ----------------------------
+
+    def harvest_returns(self, debt_outstanding, vault_debt, block):
+        """The (profit, loss, debt_payment) BaseStrategy.harvest reports to the vault."""
+        if not self.emergency_exit:
+            return self.prepare_return(debt_outstanding, vault_debt, block)
+
+        amount_freed = self.liquidate_all_positions()
+        profit = loss = 0
+        if amount_freed < debt_outstanding:
+            loss = debt_outstanding - amount_freed
+        elif amount_freed > debt_outstanding:
+            profit = amount_freed - debt_outstanding
+        return profit, loss, debt_outstanding - loss
+
+    def withdraw(self, amount_needed, block):
+        """BaseStrategy.withdraw, the freed want leaves the strategy."""
+        amount_freed, loss = self.liquidate_position(amount_needed, block)
+        self.want = _sub(self.want, amount_freed)
+        return amount_freed, loss
+
+
+@dataclass
+class VaultModel:
+    """Vault 0.4.3 with a single strategy, no fees and no locked profit."""
+
+    strategy: StrategyModel
+    debt_ratio: int = MAX_BPS
+    idle: int = 0
+    total_debt: int = 0
+    total_supply: int = 0
+    emergency_shutdown: bool = False
+
+    def total_assets(self):
+        return self.idle + self.total_debt
+
+    def credit_available(self):
+        if self.emergency_shutdown:
+            return 0
+        debt_limit = self.debt_ratio * self.total_assets() // MAX_BPS
+        if debt_limit <= self.total_debt:
+            return 0
+        return min(debt_limit - self.total_debt, self.idle)
+
+    def debt_outstanding(self):
+        if self.debt_ratio == 0:
+            return self.total_debt
+        debt_limit = self.debt_ratio * self.total_assets() // MAX_BPS
+        if self.emergency_shutdown:
+            return self.total_debt
+        if self.total_debt <= debt_limit:
+            return 0
+        return self.total_debt - debt_limit
+
+    def deposit(self, amount):
+        if self.total_supply == 0:
+            shares = amount
+        else:
+            shares = _div(amount * self.total_supply, self.total_assets())
+        self.idle += amount
+        self.total_supply += shares
+        return shares
+
+    def withdraw(self, shares, block):
+        """Returns the want paid out, for the shares of a user with no max loss."""
+        value = shares * self.total_assets() // self.total_supply
+        if value > self.idle:
+            amount_needed = min(value - self.idle, self.total_debt)
+            loss = 0
+            if amount_needed > 0:
+                withdrawn, loss = self.strategy.withdraw(amount_needed, block)
+                self.idle += withdrawn
+                if loss > 0:
+                    value -= loss
+                    self._report_loss(loss)
+                self.total_debt = _sub(self.total_debt, withdrawn)
+            if value > self.idle:
+                # the strategy could not free it all, only the shares paid for are burned
+                value = self.idle
+                free_funds = self.total_assets()
+                shares = (
+                    (value + loss) * self.total_supply // free_funds
+                    if free_funds
+                    else 0
+                )
+        self.idle -= value
+        self.total_supply -= shares
+        return value
+
+    def _report_loss(self, loss):
+        if self.total_debt < loss:
+            raise Revert("vault: loss larger than debt")
+        if self.debt_ratio != 0:
+            self.debt_ratio -= min(
+                loss * self.debt_ratio // self.total_debt, self.debt_ratio
+            )
+        self.total_debt -= loss
+
+    def report(self, gain, loss, debt_payment):
+        """Vault.report, moves want between the vault and the strategy."""
+        if self.strategy.want < gain + debt_payment:
+            raise Revert("vault: strategy cannot cover the report")
+        if loss > 0:
+            self._report_loss(loss)
+
+        credit = self.credit_available()
+        debt = self.debt_outstanding()
+        debt_payment = min(debt_payment, debt)
+        self.total_debt -= debt_payment
+        debt -= debt_payment
+        self.total_debt += credit
+
+        total_available = gain + debt_payment
+        if total_available < credit:
+            self.idle -= credit - total_available
+            self.strategy.want += credit - total_available
+        elif total_available > credit:
+            self.idle += total_available - credit
+            self.strategy.want -= total_available - credit
+
+        if self.debt_ratio == 0 or self.emergency_shutdown:
+            return self.strategy.estimated_total_assets()
+        return debt
+
+    def harvest(self, block):
+        """BaseStrategy.harvest, returns the (profit, loss, debt_payment) reported."""
+        owed = self.debt_outstanding()
+        returns = self.strategy.harvest_returns(owed, self.total_debt, block)
+        if returns[2] < owed and self.strategy.want > returns[0] + returns[2]:
+            raise InvariantError(
+                f"paid {returns[2]} of {owed} debt while holding {self.strategy.want} want"
+            )
+        debt_outstanding = self.report(*returns)
+        self.strategy.adjust_position(debt_outstanding, block)
+        return returns
+
+    def tend(self, block):
+        self.strategy.adjust_position(self.debt_outstanding(), block)
+
+    def set_emergency_exit(self):
+        self.strategy.emergency_exit = True
+        self.debt_ratio = 0
+
+
+# ---------------------------- fuzzing ----------------------------
+
+# (name, relative weight)
+OPERATIONS = (
+    ("deposit", 20),
+    ("withdraw", 15),
+    ("harvest", 20),
+    ("tend", 10),
+    ("mine", 15),
+    ("rate_move", 8),
+    ("debt_ratio", 8),
+    ("airdrop", 3),
+    ("delta_credit", 4),
+    ("emergency_exit", 1),
+)
+
+
+@dataclass(frozen=True)
+class Operation:
+    name: str
+    arg: int = 0
+
+
+def random_operations(seed, steps, decimals=6):
+    """The operation sequence for `seed`, shared by the model fuzz and the chain harness."""
+    rng = random.Random(seed)
+    names = [name for name, _ in OPERATIONS]
+    weights = [weight for _, weight in OPERATIONS]
+    unit = 10 ** decimals
+    ops = []
+    for _ in range(steps):
+        name = rng.choices(names, weights)[0]
+        if name == "deposit":
+            arg = rng.randint(1, 10 ** rng.randint(1, 7)) * unit
+        elif name == "withdraw":
+            arg = rng.choice([MAX_BPS, rng.randint(1, MAX_BPS)])
+        elif name == "mine":
+            arg = rng.randint(1, 500)
+        elif name == "rate_move":
+            # bps of the pool's liquidity, mostly fee growth with the odd loss
+            arg = rng.randint(-300, 500)
+        elif name == "debt_ratio":
+            arg = rng.choice([0, MAX_BPS, rng.randint(0, MAX_BPS)])
+        elif name == "delta_credit":
+            # bps of the pool's liquidity left to redeem instantly, often none at all
+            arg = rng.choice([0, MAX_BPS, rng.randint(0, 2_000)])
+        elif name == "airdrop":
+            arg = rng.randint(1, 1_000) * unit
+        else:
+            arg = 0
+        ops.append(Operation(name, arg))
+    return ops
+
+
+def local_stack_model(block=0):
+    """Models the Stargate stand-ins scripts/local_stack.py deploys for `--stack local`."""
+    seed = 10_000_000 * 10 ** 6
+    pool = PoolModel(
+        total_liquidity=seed, total_supply=seed, convert_rate=1, delta_credit=seed
+    )
+    staker = StakerModel(
+        stargate_per_block=10 ** 18,
+        alloc_point=1_000,
+        total_alloc_point=2_000,
+        last_reward_block=block,
+    )
+    return VaultModel(StrategyModel(pool, staker))
+
+
+def rounding_dust(pool):
+    """Want a single LP mint or redemption can lose to rounding."""
+    per_lp = pool.total_liquidity // pool.total_supply + 1 if pool.total_supply else 1
+    return 2 * per_lp * pool.convert_rate
+
+
+def holdings(vault):
+    strategy = vault.strategy
+    lp = strategy.unstaked_lp + strategy.staked_lp
+    value_of_lp = strategy.pool.amount_lp_to_ld(lp) if lp else 0
+    return vault.idle + strategy.want + value_of_lp
+
+
+def check_invariants(vault, before, expected_change, tolerance):
+    strategy = vault.strategy
+    for name in ("want", "unstaked_lp", "stg"):
+        if getattr(strategy, name) < 0:
+            raise InvariantError(f"negative {name}")
+    if strategy.staked_lp > strategy.staker.lp_supply:
+        raise InvariantError("staked more LP than the staking pool holds")
+    if strategy.unstaked_lp + strategy.staked_lp > strategy.pool.total_supply:
+        raise InvariantError("holding more LP than the pool minted")
+
+    # want is only created by deposits, airdrops and the LP rate, and only lost to rounding
+    after = holdings(vault)
+    drift = after - (before + expected_change)
+    if abs(drift) > tolerance:
+        raise InvariantError(f"holdings drifted by {drift} (tolerance {tolerance})")
+
+
+@dataclass
+class SequenceResult:
+    seed: int
+    steps: int
+    error: Optional[str] = None
+    failed_step: Optional[int] = None
+    failed_op: Optional[Operation] = None
+
+
+def apply(vault, op, block):
+    """Applies `op` to the models, returns the change in holdings it is expected to cause."""
+    strategy = vault.strategy
+    if op.name == "deposit":
+        if vault.total_supply and not vault.total_assets():
+            # everything was lost, Vault 0.4.3 cannot price new shares
+            return 0
+        vault.deposit(op.arg)
+        return op.arg
+    if op.name == "withdraw":
+        shares = vault.total_supply * op.arg // MAX_BPS
+        return -vault.withdraw(shares, block) if shares else 0
+    if op.name == "harvest":
+        try:
+            vault.harvest(block)
+        except Revert as e:
+            # an exit harvest waits until Stargate can pay out the whole position
+            if e.reason != "!liquidity":
+                raise
+        return 0
+    if op.name == "tend":
+        vault.tend(block)
+        return 0
+    if op.name == "rate_move":
+        pool = strategy.pool
+        lp = strategy.unstaked_lp + strategy.staked_lp
+        before = pool.amount_lp_to_ld(lp) if lp else 0
+        pool.total_liquidity += pool.total_liquidity * op.arg // MAX_BPS
+        return (pool.amount_lp_to_ld(lp) if lp else 0) - before
+    if op.name == "delta_credit":
+        strategy.pool.delta_credit = strategy.pool.total_liquidity * op.arg // MAX_BPS
+        return 0
+    if op.name == "debt_ratio":
+        if not strategy.emergency_exit:
+            vault.debt_ratio = op.arg
+        return 0
+    if op.name == "airdrop":
+        strategy.want += op.arg
+        return op.arg
+    if op.name == "emergency_exit":
+        vault.set_emergency_exit()
+        return 0
+    # "mine" only moves the block
+    return 0
+
+
+def run_sequence(seed, steps=50):
+    vault = local_stack_model()
+    block = 1
+    for step, op in enumerate(random_operations(seed, steps)):
+        block += op.arg if op.name == "mine" else 1
+        tolerance = 4 * rounding_dust(vault.strategy.pool)
+        before = holdings(vault)
+        try:
+            expected_change = apply(vault, op, block)
+            check_invariants(vault, before, expected_change, tolerance)
+        except (Revert, InvariantError) as e:
+            return SequenceResult(seed, step + 1, f"{type(e).__name__}: {e}", step, op)
+    return SequenceResult(seed, steps)
+
+
+def _run_sequence(args):
+    return run_sequence(*args)
+
+
+@dataclass
+class FuzzReport:
+    sequences: int
+    steps: int
+    seconds: float
+    failures: List[SequenceResult] = field(default_factory=list)
+
+    @property
+    def sequences_per_second(self):
+        return self.sequences / self.seconds if self.seconds else float("inf")
+
+    def summary(self):
+        return (
+            f"{self.sequences} sequences of {self.steps} steps in {self.seconds:.2f}s "
+            f"({self.sequences_per_second:,.0f}/s), {len(self.failures)} failed"
+        )
+
+
+def fuzz(sequences, steps=50, workers=None, seed=0):
+    """Runs `sequences` random sequences, spread over `workers` processes (all cores by default)."""
+    args = [(seed + i, steps) for i in range(sequences)]
+    start = time.perf_counter()
+    if workers == 1:
+        results = [_run_sequence(a) for a in args]
+    else:
+        with Pool(workers) as pool:
+            chunksize = max(1, sequences // ((workers or pool._processes) * 8))
+            results = list(pool.imap_unordered(_run_sequence, args, chunksize))
+    seconds = time.perf_counter() - start
+    failures = sorted((r for r in results if r.error), key=lambda r: r.seed)
+    return FuzzReport(sequences, steps, seconds, failures)
+
+
+def replay(seed, steps=50):
+    """Re-runs one sequence and returns the model after every step, for debugging."""
+    vault = local_stack_model()
+    block = 1
+    states: List[Tuple[Operation, VaultModel]] = []
+    for op in random_operations(seed, steps):
+        block += op.arg if op.name == "mine" else 1
+        apply(vault, op, block)
+        states.append((op, copy.deepcopy(vault)))
+    return states
+
+
+def main(sequences=10_000, steps=50, workers=None):
+    report = fuzz(int(sequences), int(steps), int(workers) if workers else None)
+    print(report.summary())
+    for failure in report.failures[:20]:
+        print(
+            f"  seed {failure.seed} step {failure.failed_step} {failure.failed_op}: {failure.error}"
+        )
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,106 @@
+"""
+Rolls out many Strategy clones in one transaction through StrategyFactory.
+
+Manifest (YAML or JSON):
+
+    original: "0x..."        # Strategy to clone, used to deploy a factory if none is given
+    factory: "0x..."         # optional, an already deployed StrategyFactory
+    strategist: "0x..."
+    rewards: "0x..."
+    keeper: "0x..."
+    trade_factory: "0x..."   # optional, enabled on every clone when we are governance
+    batch_size: 10           # optional, clones per transaction
+    strategies:
+      - vault: "0x..."
+        lp_staker: "0x..."
+        pool_id_in_lp_staking: 0
+        price_feed: "0x..."
+        name: "StrategyStargateUSDC"
+        salt: "usdc-v1"      # optional, defaults to the name
+"""
+import json
+import os
+from pathlib import Path
+
+from brownie import Contract, Strategy, StrategyFactory, accounts, network, web3
+import click
+
+
+def load_manifest(path):
+    text = Path(path).read_text()
+    if str(path).endswith(".json"):
+        return json.loads(text)
+    import yaml
+
+    return yaml.safe_load(text)
+
+
+def salt_of(entry):
+    return web3.keccak(text=str(entry.get("salt", entry["name"])))
+
+
+def clone_params(entry):
+    return (
+        entry["vault"],
+        entry["lp_staker"],
+        int(entry["pool_id_in_lp_staking"]),
+        entry["price_feed"],
+        entry["name"],
+        salt_of(entry),
+    )
+
+
+def get_factory(manifest, dev):
+    if manifest.get("factory"):
+        return StrategyFactory.at(manifest["factory"])
+    return StrategyFactory.deploy(manifest["original"], {"from": dev})
+
+
+def rollout(manifest, dev, factory=None):
+    """Deploys every strategy in the manifest, returns their addresses in order."""
+    factory = factory or get_factory(manifest, dev)
+    entries = manifest["strategies"]
+    batch_size = int(manifest.get("batch_size", len(entries)))
+
+    predicted = [factory.predictCloneAddress(dev, salt_of(e)) for e in entries]
+    for entry, address in zip(entries, predicted):
+        click.echo(f"{entry['name']}: {address}")
+
+    deployed = []
+    for i in range(0, len(entries), batch_size):
+        batch = entries[i : i + batch_size]
+        tx = factory.cloneMany(
+            [clone_params(e) for e in batch],
+            manifest["strategist"],
+            manifest["rewards"],
+            manifest["keeper"],
+            {"from": dev},
+        )
+        deployed += [event["clone"] for event in tx.events["Cloned"]]
+        click.echo(f"cloned {len(batch)} strategies, gas used {tx.gas_used}")
+
+    assert deployed == predicted, "deployed addresses do not match the predictions"
+
+    enable_trade_factory(deployed, manifest.get("trade_factory"), dev)
+    return deployed
+
+
+def enable_trade_factory(addresses, trade_factory, dev):
+    if not trade_factory:
+        return
+    for address in addresses:
+        strategy = Contract.from_abi("Strategy", address, Strategy.abi)
+        # setTradeFactory is governance only, leave the rest to the multisig
+        if strategy.governance() != dev.address:
+            click.echo(f"{address}: governance must call setTradeFactory")
+            continue
+        strategy.setTradeFactory(trade_factory, {"from": dev})
+
+
+def main(manifest_file=None):
+    print(f"You are using the '{network.show_active()}' network")
+    manifest = load_manifest(manifest_file or os.environ["ROLLOUT_MANIFEST"])
+    dev = accounts.load(click.prompt("Account", type=click.Choice(accounts.load())))
+    print(f"You are using: 'dev' [{dev.address}]")
+
+    rollout(manifest, dev)
@@ -0,0 +1,290 @@
+"""
+Picks the best route to sell a token (STG) for the strategy's want.
+
+Candidate routes are every path from `token_in` to `token_out` through a set of
+connector tokens (WETH, USDC, ...) of up to `max_hops` legs, each leg on any venue
+that has a pool for it: Curve pools, Uniswap V2 style routers (Uniswap, Sushiswap) and
+Uniswap V3 fee tiers. Pool metadata (Curve coins, pair and pool addresses) is read
+concurrently the first time a leg is looked at and cached for the life of the finder.
+All candidates are quoted at the same block through `yswaps.quote_many` and ranked by
+output net of the gas their swaps cost, and the winner goes straight into ySwaps:
+
+    finder = RouteFinder(stg, usdc, default_venues(curve_pool, univ2, sushi, univ3), [weth, usdt])
+    best = finder.best(amount_in, gas_price=web3.eth.gas_price, out_per_eth=3_000 * 10 ** 6)
+    payload, min_out = best.build(strategy, multicall_swapper)
+"""
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from functools import cached_property
+from itertools import product
+from typing import List, Tuple
+
+from brownie import Contract, ZERO_ADDRESS
+
+from scripts.yswaps import CurveHop, UniV2Hop, UniV3Hop, compile_route, quote_many
+
+UNIV3_QUOTER = "0xb27308f9F90D607463bb33eA1BeBb41C27CE5AB6"
+UNIV3_FEES = (100, 500, 3000, 10000)
+
+# rough gas per swap call, and per extra pool when a router call crosses several
+HOP_GAS = {
+    CurveHop: (150_000, 0),
+    UniV2Hop: (100_000, 60_000),
+    UniV3Hop: (120_000, 80_000),
+}
+# the approve before every swap, and the final transfer to the receiver
+APPROVE_GAS = 30_000
+TRANSFER_GAS = 40_000
+
+_ADDRESS_GETTER_ABI = [
+    {
+        "name": name,
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [{"name": "", "type": t} for t in inputs],
+        "outputs": [{"name": "", "type": "address"}],
+    }
+    for name, inputs in (
+        ("coins", ["uint256"]),
+        ("factory", []),
+        ("getPair", ["address", "address"]),
+        ("getPool", ["address", "address", "uint24"]),
+    )
+]
+
+
+def _contract(address):
+    return Contract.from_abi("AddressGetter", str(address), _ADDRESS_GETTER_ABI)
+
+
+class CurveVenue:
+    def __init__(self, pool, n_coins=2, index_type="uint256"):
+        self.pool = str(pool)
+        self.n_coins = n_coins
+        self.index_type = index_type
+
+    @cached_property
+    def coins(self):
+        pool = _contract(self.pool)
+        return [str(pool.coins(i)) for i in range(self.n_coins)]
+
+    def hops(self, token_a, token_b):
+        if token_a not in self.coins or token_b not in self.coins:
+            return []
+        i, j = self.coins.index(token_a), self.coins.index(token_b)
+        return [CurveHop(self.pool, token_a, token_b, i, j, self.index_type)]
+
+
+class UniV2Venue:
+    """Uniswap V2 or any fork of it, e.g. Sushiswap."""
+
+    def __init__(self, router, fee_bps=30):
+        self.router = str(router)
+        self.fee_bps = fee_bps
+        self._pairs = {}
+
+    @cached_property
+    def factory(self):
+        return _contract(_contract(self.router).factory())
+
+    def hops(self, token_a, token_b):
+        key = frozenset((token_a, token_b))
+        if key not in self._pairs:
+            self._pairs[key] = str(self.factory.getPair(token_a, token_b))
+        pair = self._pairs[key]
+        if pair == ZERO_ADDRESS:
+            return []
+        return [UniV2Hop(self.router, (token_a, token_b), (pair,), self.fee_bps)]
+
+
+class UniV3Venue:
+    def __init__(self, router, quoter=UNIV3_QUOTER, fees=UNIV3_FEES):
+        self.router = str(router)
+        self.quoter = str(quoter)
+        self.fees = tuple(fees)
+        self._pools = {}
+
+    @cached_property
+    def factory(self):
+        return _contract(_contract(self.quoter).factory())
+
+    def hops(self, token_a, token_b):
+        key = frozenset((token_a, token_b))
+        if key not in self._pools:
+            self._pools[key] = [
+                fee
+                for fee in self.fees
+                if str(self.factory.getPool(token_a, token_b, fee)) != ZERO_ADDRESS
+            ]
+        return [
+            UniV3Hop(self.router, self.quoter, (token_a, token_b), (fee,))
+            for fee in self._pools[key]
+        ]
+
+
+def default_venues(
+    curve_pool=None, univ2_router=None, sushiswap_router=None, univ3_router=None
+):
+    venues = []
+    if curve_pool is not None:
+        venues.append(CurveVenue(curve_pool))
+    for router in (univ2_router, sushiswap_router):
+        if router is not None:
+            venues.append(UniV2Venue(router))
+    if univ3_router is not None:
+        venues.append(UniV3Venue(univ3_router))
+    return venues
+
+
+def merge_hops(hops):
+    """
+    Joins consecutive legs on the same Uniswap router into one multi-pool swap, which
+    saves an approve and a call per extra leg.
+    """
+    merged = []
+    for hop in hops:
+        last = merged[-1] if merged else None
+        if (
+            isinstance(hop, UniV2Hop)
+            and isinstance(last, UniV2Hop)
+            and last.router == hop.router
+        ):
+            merged[-1] = UniV2Hop(
+                last.router,
+                last.path + hop.path[1:],
+                last.pairs + hop.pairs,
+                last.fee_bps,
+            )
+        elif (
+            isinstance(hop, UniV3Hop)
+            and isinstance(last, UniV3Hop)
+            and (last.router, last.quoter) == (hop.router, hop.quoter)
+        ):
+            merged[-1] = UniV3Hop(
+                last.router, last.quoter, last.path + hop.path[1:], last.fees + hop.fees
+            )
+        else:
+            merged.append(hop)
+    return tuple(merged)
+
+
+def route_gas(hops):
+    gas = TRANSFER_GAS
+    for hop in hops:
+        base, per_extra_pool = HOP_GAS[type(hop)]
+        pools = len(hop.path) - 1 if hasattr(hop, "path") else 1
+        gas += APPROVE_GAS + base + per_extra_pool * (pools - 1)
+    return gas
+
+
+@dataclass
+class RouteQuote:
+    route: object
+    amount_in: int
+    # expected output of every hop, the last one is what the receiver gets
+    amounts: List[int]
+    gas: int
+    gas_cost: int
+
+    @property
+    def amount_out(self):
+        return self.amounts[-1]
+
+    @property
+    def net_out(self):
+        return self.amount_out - self.gas_cost
+
+    def build(self, receiver, swapper, slippage_bps=200):
+        """The ySwaps payload and min out for this quote, see `Route.build`."""
+        return self.route.build(
+            self.amount_in,
+            receiver,
+            swapper,
+            slippage_bps=slippage_bps,
+            quotes=self.amounts,
+        )
+
+
+class RouteFinder:
+    def __init__(
+        self,
+        token_in,
+        token_out,
+        venues,
+        connectors=(),
+        max_hops=2,
+        max_workers=8,
+        quote=quote_many,
+    ):
+        self.token_in = str(token_in)
+        self.token_out = str(token_out)
+        self.venues = list(venues)
+        self.connectors = [
+            str(c) for c in connectors if str(c) not in (self.token_in, self.token_out)
+        ]
+        self.max_hops = max_hops
+        self.max_workers = max_workers
+        self.quote = quote
+        self._legs = {}
+
+    def _token_paths(self):
+        paths, partial = [], [(self.token_in,)]
+        for _ in range(self.max_hops):
+            paths += [path + (self.token_out,) for path in partial]
+            partial = [
+                path + (c,)
+                for path in partial
+                for c in self.connectors
+                if c not in path
+            ]
+        return paths
+
+    def _load_legs(self, legs):
+        missing = [leg for leg in legs if leg not in self._legs]
+        if not missing:
+            return
+
+        def hops(leg):
+            return [hop for venue in self.venues for hop in venue.hops(*leg)]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for leg, leg_hops in zip(missing, executor.map(hops, missing)):
+                self._legs[leg] = leg_hops
+
+    def candidates(self) -> List[Tuple]:
+        """Hops of every candidate route, with same-router legs merged."""
+        token_paths = self._token_paths()
+        self._load_legs({leg for path in token_paths for leg in zip(path, path[1:])})
+        candidates = {}
+        for path in token_paths:
+            for hops in product(*(self._legs[leg] for leg in zip(path, path[1:]))):
+                merged = merge_hops(hops)
+                candidates[merged] = merged
+        return list(candidates)
+
+    def rank(
+        self, amount_in, gas_price=0, out_per_eth=0, block=None
+    ) -> List[RouteQuote]:
+        """
+        Every candidate quoted for `amount_in`, best first. `out_per_eth` prices gas in
+        token_out: how much of it (in base units) 1 ETH is worth.
+        """
+        routes = [
+            compile_route(self.token_in, self.token_out, hops)
+            for hops in self.candidates()
+        ]
+        if not routes:
+            return []
+        quotes = self.quote([(route, amount_in) for route in routes], block)
+        ranked = []
+        for route, amounts in zip(routes, quotes):
+            gas = route_gas([hop.hop for hop in route.hops])
+            gas_cost = gas * gas_price * out_per_eth // 10 ** 18
+            ranked.append(RouteQuote(route, amount_in, list(amounts), gas, gas_cost))
+        return sorted(ranked, key=lambda q: q.net_out, reverse=True)
+
+    def best(self, amount_in, gas_price=0, out_per_eth=0, block=None) -> RouteQuote:
+        ranked = self.rank(amount_in, gas_price, out_per_eth, block)
+        if not ranked or ranked[0].amount_out == 0:
+            raise ValueError(f"no route from {self.token_in} to {self.token_out}")
+        return ranked[0]
@@ -0,0 +1,292 @@
+"""
+Sells the STG of many strategies in one trade factory execution per output token.
+
+Every strategy enables `(STG, want)` on the trade factory, and selling each balance on
+its own means one swap per strategy through the same pools. `plan` reads the STG
+balance and `want` of every strategy at one block and groups them by want. In one
+`quote_many` it quotes the sum of each group and, for comparison, every balance on its
+own. Each `Batch` is then settled by a single
+`trade_factory.execute(trades[], swapper, payload)`. The payload sells the aggregate
+once and transfers its guaranteed output back pro rata to the STG each strategy put in,
+so every strategy gets the same rate, and the trade factory holds each one to its own
+`minAmountOut`:
+
+    routes = {usdc: compile_route(stg, usdc, [curve_hop(curve_pool, 0, 1)])}
+    for batch in plan(strategies, stg, lambda want, amount_in: routes[want]):
+        print(batch.table())
+        received = settle(batch, trade_factory, multicall_swapper, ymech)
+        assert not batch.check(received)
+
+From the command line, routes come from `RouteFinder` over the mainnet venues:
+
+    SETTLE_STRATEGIES=strategies.json SETTLE_ACCOUNT=ymech brownie run settlement --network mainnet
+
+SETTLE_DRY_RUN=1 only prints the batches.
+"""
+import os
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from brownie import Contract, accounts, multicall, network, web3
+import click
+
+from scripts.monitor import load_strategies
+from scripts.route_finder import RouteFinder, default_venues
+from scripts.yswaps import hop_min_outs, pro_rata, quote_many
+
+# strategies per execute, every one costs a transferFrom, a transfer and two balance reads
+MAX_BATCH = 50
+
+STG = "0xAf5191B0De278C7286d6C7CC6ab6BB8A73bA2Cd6"
+WETH = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+USDC = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+USDT = "0xdAC17F958D2ee523a2206206994597C13D831ec7"
+CURVE_STG_USDC = "0x3211C6cBeF1429da3D0d58494938299C92Ad5860"
+UNIV2_ROUTER = "0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D"
+SUSHISWAP_ROUTER = "0xd9e1cE17f2641f24aE83637ab66a2cca9C378B9F"
+UNIV3_ROUTER = "0xE592427A0AEce92De3Edee1F18E0157C05861564"
+TRADE_FACTORY = "0x99d8679bE15011dEAD893EB4F5df474a4e6a8b29"
+MULTICALL_SWAPPER = "0xB2F65F254Ab636C96fb785cc9B4485cbeD39CDAA"
+
+_BALANCE_OF_ABI = [
+    {
+        "name": "balanceOf",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [{"name": "", "type": "address"}],
+        "outputs": [{"name": "", "type": "uint256"}],
+    }
+]
+
+
+@dataclass
+class Share:
+    strategy: str
+    amount_in: int
+    # its pro rata part of the batch quote
+    quoted_out: int
+    # what the payload pays it, the trade factory reverts below it
+    min_out: int
+    # the quote for this balance sold on its own, 0 when not quoted
+    solo_out: int = 0
+
+
+@dataclass
+class Batch:
+    token_in: str
+    token_out: str
+    # expected output of every hop for the summed amount in
+    quotes: List[int]
+    slippage_bps: int
+    shares: List[Share]
+    route: Optional[object] = None
+
+    @property
+    def amount_in(self):
+        return sum(share.amount_in for share in self.shares)
+
+    @property
+    def quoted_out(self):
+        return self.quotes[-1]
+
+    @property
+    def min_out(self):
+        return sum(share.min_out for share in self.shares)
+
+    @property
+    def solo_out(self):
+        return sum(share.solo_out for share in self.shares)
+
+    def trades(self):
+        """`AsyncTradeExecutionDetails` of every strategy, for `trade_factory.execute`."""
+        return [
+            [
+                share.strategy,
+                self.token_in,
+                self.token_out,
+                share.amount_in,
+                share.min_out,
+            ]
+            for share in self.shares
+        ]
+
+    def payload(self, swapper):
+        """The MultiCallOptimizedSwapper payload selling the batch along `route`."""
+        payload, min_outs = self.route.build_payouts(
+            [(share.strategy, share.amount_in) for share in self.shares],
+            swapper,
+            self.slippage_bps,
+            self.quotes,
+        )
+        assert min_outs == [share.min_out for share in self.shares]
+        return payload
+
+    def check(self, received) -> List[str]:
+        """
+        Compares what every strategy `received` (in share order) with its min out and
+        with its pro rata part of the batch's whole output. Returns the problems found.
+        """
+        problems = []
+        fair = pro_rata(sum(received), [share.amount_in for share in self.shares])
+        for share, amount, expected in zip(self.shares, received, fair):
+            if amount < share.min_out:
+                problems.append(
+                    f"{share.strategy} received {amount}, below its min out {share.min_out}"
+                )
+            # pro rata rounding moves at most one wei
+            if abs(amount - expected) > 1:
+                problems.append(
+                    f"{share.strategy} received {amount}, its pro rata part is {expected}"
+                )
+        return problems
+
+    def table(self):
+        lines = [
+            f"{self.token_in} -> {self.token_out}: {len(self.shares)} strategies, "
+            f"{self.amount_in} in, {self.quoted_out} quoted, {self.min_out} min out",
+            f"{'strategy':<44}{'amount in':>28}{'quoted':>20}{'min out':>20}{'alone':>20}",
+        ]
+        for share in self.shares:
+            lines.append(
+                f"{share.strategy:<44}{share.amount_in:>28}{share.quoted_out:>20}"
+                f"{share.min_out:>20}{share.solo_out:>20}"
+            )
+        return "\n".join(lines)
+
+
+def batch_from_quote(
+    token_in, token_out, balances, quotes, slippage_bps=200, route=None, solo_outs=None
+):
+    """
+    The accounting of one batch: `balances` are (strategy, amount in) and `quotes` the
+    expected output of every hop for their sum. The guaranteed output is that of
+    `Route.build` for the sum, handed out pro rata to the amounts in.
+    """
+    amounts = [amount for _, amount in balances]
+    guaranteed = hop_min_outs(sum(amounts), quotes, slippage_bps)[-1]
+    solo_outs = solo_outs or [0] * len(balances)
+    shares = [
+        Share(str(strategy), amount, quoted_out, min_out, solo_out)
+        for (strategy, amount), quoted_out, min_out, solo_out in zip(
+            balances,
+            pro_rata(quotes[-1], amounts),
+            pro_rata(guaranteed, amounts),
+            solo_outs,
+        )
+    ]
+    return Batch(
+        str(token_in), str(token_out), list(quotes), slippage_bps, shares, route
+    )
+
+
+def read_balances(strategies, block=None):
+    """(strategy, want, STG balance) of every strategy, all read at `block`."""
+    block = web3.eth.block_number if block is None else block
+    with multicall(block_identifier=block):
+        wants = [strategy.want() for strategy in strategies]
+        balances = [strategy.balanceOfSTG() for strategy in strategies]
+    return [
+        (strategy.address, str(want), int(balance))
+        for strategy, want, balance in zip(strategies, wants, balances)
+    ]
+
+
+def plan(
+    strategies,
+    token_in,
+    route_for: Callable,
+    slippage_bps=200,
+    min_amount=0,
+    max_batch=MAX_BATCH,
+    block=None,
+) -> List[Batch]:
+    """
+    The batches settling the STG of `strategies`, one per want and `max_batch`
+    strategies. `route_for(want, amount_in)` returns the `Route` to sell the sum along.
+    Balances below `min_amount` are left for later.
+    """
+    block = web3.eth.block_number if block is None else block
+    groups = {}
+    for strategy, want, balance in read_balances(strategies, block):
+        if balance > 0 and balance >= min_amount:
+            groups.setdefault(want, []).append((strategy, balance))
+
+    chunks = [
+        (want, group[i : i + max_batch])
+        for want, group in groups.items()
+        for i in range(0, len(group), max_batch)
+    ]
+    if not chunks:
+        return []
+    amounts_in = [sum(amount for _, amount in chunk) for _, chunk in chunks]
+    routes = [
+        route_for(want, amount_in) for (want, _), amount_in in zip(chunks, amounts_in)
+    ]
+
+    # the batches and every balance on its own, all in one `quote_many`
+    requests = list(zip(routes, amounts_in))
+    requests += [
+        (route, amount)
+        for route, (_, chunk) in zip(routes, chunks)
+        for _, amount in chunk
+    ]
+    quotes = quote_many(requests, block)
+    solo = iter(quotes[len(chunks) :])
+
+    batches = []
+    for route, (want, chunk), batch_quotes in zip(routes, chunks, quotes):
+        solo_outs = [next(solo)[-1] for _ in chunk]
+        # a route without liquidity, the STG waits for the next settlement
+        if batch_quotes[-1] == 0:
+            continue
+        batches.append(
+            batch_from_quote(
+                token_in, want, chunk, batch_quotes, slippage_bps, route, solo_outs
+            )
+        )
+    return batches
+
+
+def settle(batch, trade_factory, swapper, mech, payload=None):
+    """
+    Executes `batch` through the trade factory, with the swapper payload built from its
+    route unless one is given. Returns what every strategy received, in share order.
+    """
+    payload = batch.payload(swapper) if payload is None else payload
+    token_out = Contract.from_abi("ERC20", batch.token_out, _BALANCE_OF_ABI)
+    with multicall():
+        before = [token_out.balanceOf(share.strategy) for share in batch.shares]
+    trade_factory.execute["tuple[],address,bytes"](
+        batch.trades(), str(swapper), payload, {"from": mech}
+    )
+    with multicall():
+        after = [token_out.balanceOf(share.strategy) for share in batch.shares]
+    return [int(a) - int(b) for a, b in zip(after, before)]
+
+
+def main(strategies_file=None, slippage_bps=200, min_amount=0):
+    print(f"You are using the '{network.show_active()}' network")
+    strategies = load_strategies(strategies_file or os.environ["SETTLE_STRATEGIES"])
+    venues = default_venues(
+        CURVE_STG_USDC, UNIV2_ROUTER, SUSHISWAP_ROUTER, UNIV3_ROUTER
+    )
+    finders = {}
+
+    def route_for(want, amount_in):
+        if want not in finders:
+            finders[want] = RouteFinder(STG, want, venues, [WETH, USDC, USDT])
+        return finders[want].best(amount_in).route
+
+    batches = plan(strategies, STG, route_for, int(slippage_bps), int(min_amount))
+    for batch in batches:
+        click.echo(batch.table())
+        click.echo(f"sold alone: {batch.solo_out}, batched: {batch.quoted_out}\n")
+    if os.getenv("SETTLE_DRY_RUN"):
+        return
+
+    mech = accounts.load(os.environ["SETTLE_ACCOUNT"])
+    trade_factory = Contract(TRADE_FACTORY)
+    for batch in batches:
+        received = settle(batch, trade_factory, MULTICALL_SWAPPER, mech)
+        for problem in batch.check(received):
+            click.echo(problem)
@@ -0,0 +1,376 @@
+"""
+Sizes and schedules STG sales so a large balance does not go through one pool at once.
+
+Pools are modelled locally, in token units and vectorized over trade sizes:
+
+- `ConstantProductPool`: Uniswap V2 style pairs,
+- `StableSwapPool`: the Curve stableswap invariant,
+- `CryptoSwapPool`: the Curve v2 (crypto) invariant with its dynamic fee, e.g. the
+  STG/USDC pool.
+
+A `Venue` is a route (one or more pools in a row) with the gas cost of using it. For a
+given amount `split` evaluates every venue on a grid of sizes and hands out the grid
+increments by marginal output (outputs are concave, so this is optimal up to the grid
+step) for every subset of venues, net of their gas. `plan` does that for 1 to
+`max_tranches` equal tranches, assuming arbitrage brings the pools back between
+tranches, and keeps the schedule with the most want net of gas.
+
+    venues = [Venue("curve", [crypto_pool_from_chain(curve_pool, 0, 1)], route=curve_route, gas_cost=20)]
+    sale = plan(venues, stg_balance, max_tranches=6, blocks_between=50)
+    payload, amount_in, min_out = build_tranche(sale.tranches[0], 18, strategy, multicall_swapper)
+"""
+from dataclasses import dataclass, field
+from itertools import combinations
+from typing import List, Optional
+
+import numpy as np
+
+from brownie import Contract, multicall
+
+from scripts.yswaps import build_split
+
+CURVE_FEE_DENOMINATOR = 10 ** 10
+CRYPTO_A_MULTIPLIER = 10_000
+_BISECTION_STEPS = 200
+
+_CURVE_STATE_ABI = [
+    {
+        "name": name,
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [{"name": "", "type": "uint256"}]
+        if name in ("balances", "coins")
+        else [],
+        "outputs": [{"name": "", "type": "address" if name == "coins" else "uint256"}],
+    }
+    for name in (
+        "A",
+        "gamma",
+        "fee",
+        "mid_fee",
+        "out_fee",
+        "fee_gamma",
+        "price_scale",
+        "balances",
+        "coins",
+    )
+]
+_DECIMALS_ABI = [
+    {
+        "name": "decimals",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": [{"name": "", "type": "uint8"}],
+    }
+]
+_UNIV2_PAIR_ABI = [
+    {
+        "name": name,
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": outputs,
+    }
+    for name, outputs in (
+        ("token0", [{"name": "", "type": "address"}]),
+        (
+            "getReserves",
+            [
+                {"name": "reserve0", "type": "uint112"},
+                {"name": "reserve1", "type": "uint112"},
+                {"name": "blockTimestampLast", "type": "uint32"},
+            ],
+        ),
+    )
+]
+
+
+class ConstantProductPool:
+    def __init__(self, reserve_in, reserve_out, fee=0.003):
+        self.reserve_in = float(reserve_in)
+        self.reserve_out = float(reserve_out)
+        self.fee = fee
+
+    def amount_out(self, amounts):
+        amounts = np.asarray(amounts, dtype=float) * (1 - self.fee)
+        return amounts * self.reserve_out / (self.reserve_in + amounts)
+
+
+class StableSwapPool:
+    """Two coin Curve stableswap pool, `A` as returned by `pool.A()`."""
+
+    def __init__(self, balances, A, fee, i=0, j=1):
+        self.balances = np.asarray(balances, dtype=float)
+        # Curve's stableswap pools use A * n rather than A * n ** n
+        self.ann = A * 2
+        self.fee = fee
+        self.i, self.j = i, j
+        self.D = self._get_D(self.balances)
+
+    def _get_D(self, xp):
+        S = xp.sum()
+        D = S
+        for _ in range(255):
+            D_P = D ** 3 / (4 * xp[0] * xp[1])
+            D_prev = D
+            D = (self.ann * S + 2 * D_P) * D / ((self.ann - 1) * D + 3 * D_P)
+            if abs(D - D_prev) <= D * 1e-15:
+                break
+        return D
+
+    def amount_out(self, amounts):
+        x = self.balances[self.i] + np.asarray(amounts, dtype=float)
+        D, ann = self.D, self.ann
+        c = D ** 3 / (4 * x * ann)
+        b = x + D / ann
+        y = np.full_like(x, D)
+        for _ in range(64):
+            y = (y * y + c) / (2 * y + b - D)
+        dy = self.balances[self.j] - y
+        return np.maximum(dy * (1 - self.fee), 0)
+
+
+class CryptoSwapPool:
+    """
+    Two coin Curve v2 pool. Balances are in token units, `price_scale` is the price of
+    coin 1 in coin 0 and `A`/`gamma` are as returned by the pool.
+    """
+
+    def __init__(
+        self, balances, price_scale, A, gamma, mid_fee, out_fee, fee_gamma, i=0, j=1
+    ):
+        self.balances = np.asarray(balances, dtype=float)
+        self.price_scale = float(price_scale)
+        self.A = A / CRYPTO_A_MULTIPLIER
+        self.gamma = gamma
+        self.mid_fee, self.out_fee, self.fee_gamma = mid_fee, out_fee, fee_gamma
+        self.i, self.j = i, j
+        self.xp = self.balances * np.array([1.0, self.price_scale])
+        self.D = self._get_D(self.xp)
+
+    def _invariant(self, x0, x1, D):
+        K0 = 4 * x0 * x1 / D ** 2
+        g1k0 = self.gamma + 1 - K0
+        return self.A * self.gamma ** 2 / g1k0 ** 2 * K0 * ((x0 + x1) / D - 1) + K0 - 1
+
+    def _get_D(self, xp):
+        # the invariant grows with the balances and shrinks with D
+        low, high = 2 * np.sqrt(xp[0] * xp[1]), (xp[0] + xp[1]) * 2
+        for _ in range(_BISECTION_STEPS):
+            mid = (low + high) / 2
+            if self._invariant(xp[0], xp[1], mid) > 0:
+                low = mid
+            else:
+                high = mid
+        return (low + high) / 2
+
+    def _get_y(self, x):
+        # with x fixed the invariant grows with y, it is -1 at y = 0
+        low = np.zeros_like(x)
+        high = np.maximum(self.D, self.D ** 2 / x) * 2
+        for _ in range(_BISECTION_STEPS):
+            mid = (low + high) / 2
+            above = self._invariant(x, mid, self.D) > 0
+            high = np.where(above, mid, high)
+            low = np.where(above, low, mid)
+        return (low + high) / 2
+
+    def _fee(self, x0, x1):
+        K = 4 * x0 * x1 / (x0 + x1) ** 2
+        f = self.fee_gamma / (self.fee_gamma + 1 - K)
+        return self.mid_fee * f + self.out_fee * (1 - f)
+
+    def amount_out(self, amounts):
+        scale = np.array([1.0, self.price_scale])
+        x = self.xp[self.i] + np.asarray(amounts, dtype=float) * scale[self.i]
+        y = self._get_y(x)
+        dy = np.maximum(self.xp[self.j] - y, 0)
+        fee = self._fee(x, self.xp[self.j] - dy)
+        return dy * (1 - fee) / scale[self.j]
+
+
+def _curve(pool):
+    return Contract.from_abi("CurvePool", str(pool), _CURVE_STATE_ABI)
+
+
+def _decimals(token):
+    return Contract.from_abi("ERC20", str(token), _DECIMALS_ABI).decimals()
+
+
+def crypto_pool_from_chain(pool, i, j, block=None):
+    pool = _curve(pool)
+    decimals = [_decimals(pool.coins(k)) for k in (0, 1)]
+    with multicall(block_identifier=block):
+        state = [
+            pool.balances(0),
+            pool.balances(1),
+            pool.price_scale(),
+            pool.A(),
+            pool.gamma(),
+            pool.mid_fee(),
+            pool.out_fee(),
+            pool.fee_gamma(),
+        ]
+    b0, b1, price_scale, A, gamma, mid_fee, out_fee, fee_gamma = [int(v) for v in state]
+    return CryptoSwapPool(
+        [b0 / 10 ** decimals[0], b1 / 10 ** decimals[1]],
+        price_scale / 10 ** 18,
+        A,
+        gamma / 10 ** 18,
+        mid_fee / CURVE_FEE_DENOMINATOR,
+        out_fee / CURVE_FEE_DENOMINATOR,
+        fee_gamma / 10 ** 18,
+        i,
+        j,
+    )
+
+
+def stable_pool_from_chain(pool, i, j, block=None):
+    pool = _curve(pool)
+    decimals = [_decimals(pool.coins(k)) for k in (0, 1)]
+    with multicall(block_identifier=block):
+        state = [pool.balances(0), pool.balances(1), pool.A(), pool.fee()]
+    b0, b1, A, fee = [int(v) for v in state]
+    return StableSwapPool(
+        [b0 / 10 ** decimals[0], b1 / 10 ** decimals[1]],
+        A,
+        fee / CURVE_FEE_DENOMINATOR,
+        i,
+        j,
+    )
+
+
+def univ2_pool_from_chain(
+    pair, token_in, decimals_in, decimals_out, fee=0.003, block=None
+):
+    pair = Contract.from_abi("UniswapV2Pair", str(pair), _UNIV2_PAIR_ABI)
+    with multicall(block_identifier=block):
+        token0, reserves = pair.token0(), pair.getReserves()
+    reserve0, reserve1 = int(reserves[0]), int(reserves[1])
+    if str(token0) != str(token_in):
+        reserve0, reserve1 = reserve1, reserve0
+    return ConstantProductPool(
+        reserve0 / 10 ** decimals_in, reserve1 / 10 ** decimals_out, fee
+    )
+
+
+@dataclass(eq=False)
+class Venue:
+    name: str
+    # pools along the route, each one feeding the next
+    pools: list
+    # the ySwaps route that executes it
+    route: Optional[object] = None
+    # want spent on gas every time the venue is used
+    gas_cost: float = 0.0
+
+    def amount_out(self, amounts):
+        out = np.asarray(amounts, dtype=float)
+        for pool in self.pools:
+            out = pool.amount_out(out)
+        return out
+
+
+@dataclass
+class Allocation:
+    venue: Venue
+    amount_in: float
+    expected_out: float
+
+
+@dataclass
+class Tranche:
+    # blocks after the first tranche
+    block_offset: int
+    allocations: List[Allocation] = field(default_factory=list)
+
+    @property
+    def amount_in(self):
+        return sum(a.amount_in for a in self.allocations)
+
+    @property
+    def expected_out(self):
+        return sum(a.expected_out for a in self.allocations)
+
+    @property
+    def gas_cost(self):
+        return sum(a.venue.gas_cost for a in self.allocations)
+
+
+@dataclass
+class SalePlan:
+    amount_in: float
+    tranches: List[Tranche]
+
+    @property
+    def expected_out(self):
+        return sum(t.expected_out for t in self.tranches)
+
+    @property
+    def gas_cost(self):
+        return sum(t.gas_cost for t in self.tranches)
+
+    @property
+    def net_out(self):
+        return self.expected_out - self.gas_cost
+
+
+def split(venues, amount, steps=400):
+    """Best allocation of `amount` across `venues`, as a list of `Allocation`s."""
+    if amount <= 0:
+        return []
+    grid = np.linspace(0, amount, steps + 1)
+    outs = np.stack([venue.amount_out(grid) for venue in venues])
+    marginal = np.diff(outs, axis=1)
+
+    best, best_net = [], -np.inf
+    for n in range(1, len(venues) + 1):
+        for subset in combinations(range(len(venues)), n):
+            subset = list(subset)
+            # outputs are concave, so the best `steps` increments are a prefix on every venue
+            order = np.argsort(-marginal[subset], axis=None, kind="stable")[:steps]
+            counts = np.bincount(order // steps, minlength=n)
+            expected = outs[subset, counts]
+            net = expected.sum() - sum(
+                venues[k].gas_cost for k, c in zip(subset, counts) if c
+            )
+            if net > best_net:
+                best_net = net
+                best = [
+                    Allocation(venues[k], float(c * amount / steps), float(out))
+                    for k, c, out in zip(subset, counts, expected)
+                    if c
+                ]
+    return best
+
+
+def plan(venues, amount, max_tranches=8, blocks_between=1, steps=400):
+    """
+    Splits `amount` into 1 to `max_tranches` equal tranches `blocks_between` blocks
+    apart and keeps the schedule that nets the most. Pools are assumed to be back at
+    their current state by the next tranche.
+    """
+    best = None
+    for n in range(1, max_tranches + 1):
+        allocations = split(venues, amount / n, steps)
+        tranches = [Tranche(k * blocks_between, list(allocations)) for k in range(n)]
+        candidate = SalePlan(amount, tranches)
+        if best is None or candidate.net_out > best.net_out:
+            best = candidate
+    return best
+
+
+def build_tranche(
+    tranche, decimals_in, receiver, swapper, slippage_bps=200, block=None
+):
+    """
+    One ySwaps payload selling the whole tranche across its venues, quoted on chain.
+    Returns (payload, amount_in, min_out) in token base units.
+    """
+    legs = [
+        (allocation.venue.route, int(allocation.amount_in * 10 ** decimals_in))
+        for allocation in tranche.allocations
+    ]
+    payload, min_out = build_split(legs, receiver, swapper, slippage_bps, block)
+    return payload, sum(amount for _, amount in legs), min_out
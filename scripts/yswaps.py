@@ -0,0 +1,513 @@
+"""
+Builds `trade_factory.execute` payloads for ySwaps' MultiCallOptimizedSwapper.
+
+The swapper runs `abi.encodePacked(uint8 optimization, (address to, uint256 length,
+bytes data)...)` call by call. A `Route` is compiled once per (tokenIn, tokenOut,
+hops) with its call templates (selector and static arguments) and, for Uniswap V2
+hops, the pair addresses. Quotes for many routes are read in as few multicalls as
+possible: Uniswap V2 hops are priced locally from pair reserves, so only Curve and
+Uniswap V3 hops after the first need another round. Each payload is packed with a single
+`encode_abi_packed`.
+
+    route = compile_route(stg, usdc, [curve_hop(curve_pool, 0, 1)])
+    payload, min_out = route.build(amount_in, strategy, multicall_swapper)
+    trade_factory.execute([strategy, stg, usdc, amount_in, min_out], swapper, payload)
+
+`Route.build_payouts` sells the balances of several strategies as one amount and pays
+each its pro rata part of the output, see scripts/settlement.py.
+"""
+from dataclasses import dataclass
+from functools import cached_property, lru_cache
+from typing import List, NamedTuple, Sequence, Tuple
+
+from brownie import Contract, multicall, web3
+from eth_abi import encode_abi
+from eth_abi.packed import encode_abi_packed
+
+# MultiCallOptimizedSwapper optimization flag, every call is a plain CALL without value
+CALL_ONLY_NO_VALUE = 5
+MAX_BPS = 10_000
+MAX_UINT256 = 2 ** 256 - 1
+
+_CURVE_ABI = [
+    {
+        "name": "get_dy",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [
+            {"name": "i", "type": "uint256"},
+            {"name": "j", "type": "uint256"},
+            {"name": "dx", "type": "uint256"},
+        ],
+        "outputs": [{"name": "", "type": "uint256"}],
+    },
+    {
+        "name": "coins",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [{"name": "i", "type": "uint256"}],
+        "outputs": [{"name": "", "type": "address"}],
+    },
+]
+_UNIV2_ROUTER_ABI = [
+    {
+        "name": "factory",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": [{"name": "", "type": "address"}],
+    }
+]
+_UNIV2_FACTORY_ABI = [
+    {
+        "name": "getPair",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [{"name": "", "type": "address"}, {"name": "", "type": "address"}],
+        "outputs": [{"name": "", "type": "address"}],
+    }
+]
+# QuoterV1 simulates the swap and reverts with the result, it is declared as a view so
+# its quotes can be batched through multicall
+_UNIV3_QUOTER_ABI = [
+    {
+        "name": "quoteExactInput",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [
+            {"name": "path", "type": "bytes"},
+            {"name": "amountIn", "type": "uint256"},
+        ],
+        "outputs": [{"name": "amountOut", "type": "uint256"}],
+    }
+]
+_UNIV2_PAIR_ABI = [
+    {
+        "name": "getReserves",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [],
+        "outputs": [
+            {"name": "reserve0", "type": "uint112"},
+            {"name": "reserve1", "type": "uint112"},
+            {"name": "blockTimestampLast", "type": "uint32"},
+        ],
+    }
+]
+
+
+@lru_cache(maxsize=None)
+def selector(signature):
+    return bytes(web3.keccak(text=signature)[:4])
+
+
+class Call(NamedTuple):
+    to: str
+    data: bytes
+
+
+class CallTemplate:
+    """A call to `to` with the selector and any leading static arguments encoded up front."""
+
+    def __init__(self, to, signature, types, static=()):
+        self.to = str(to)
+        self.types = list(types)
+        self.n_static = len(static)
+        # with dynamic arguments the offsets depend on the whole argument list
+        if static and any(
+            t.endswith("]") or t in ("bytes", "string") for t in self.types
+        ):
+            raise ValueError(
+                "arguments can only be encoded up front for static signatures"
+            )
+        head = encode_abi(self.types[: self.n_static], list(static)) if static else b""
+        self.prefix = selector(signature) + head
+
+    def __call__(self, *args):
+        return Call(
+            self.to, self.prefix + encode_abi(self.types[self.n_static :], list(args))
+        )
+
+
+def _approve(token, spender):
+    return CallTemplate(
+        token, "approve(address,uint256)", ["address", "uint256"], [str(spender)]
+    )
+
+
+def _transfer(token):
+    return CallTemplate(token, "transfer(address,uint256)", ["address", "uint256"])
+
+
+@dataclass(frozen=True)
+class CurveHop:
+    pool: str
+    token_in: str
+    token_out: str
+    i: int
+    j: int
+    # Curve v2 (crypto) pools take uint256 indexes, stableswap pools int128
+    index_type: str = "uint256"
+
+    def compile(self):
+        exchange = CallTemplate(
+            self.pool,
+            f"exchange({self.index_type},{self.index_type},uint256,uint256)",
+            [self.index_type, self.index_type, "uint256", "uint256"],
+            [self.i, self.j],
+        )
+        return _CompiledCurveHop(self, _approve(self.token_in, self.pool), exchange)
+
+
+@dataclass(frozen=True)
+class UniV2Hop:
+    router: str
+    path: Tuple[str, ...]
+    # resolved by `compile_route` when left empty
+    pairs: Tuple[str, ...] = ()
+    fee_bps: int = 30
+
+    @property
+    def token_in(self):
+        return self.path[0]
+
+    @property
+    def token_out(self):
+        return self.path[-1]
+
+    def compile(self):
+        swap = CallTemplate(
+            self.router,
+            "swapExactTokensForTokens(uint256,uint256,address[],address,uint256)",
+            ["uint256", "uint256", "address[]", "address", "uint256"],
+        )
+        return _CompiledUniV2Hop(self, _approve(self.token_in, self.router), swap)
+
+
+@dataclass(frozen=True)
+class UniV3Hop:
+    router: str
+    quoter: str
+    path: Tuple[str, ...]
+    # fee tier of every pool along `path`
+    fees: Tuple[int, ...]
+
+    @property
+    def token_in(self):
+        return self.path[0]
+
+    @property
+    def token_out(self):
+        return self.path[-1]
+
+    def encoded_path(self):
+        types, values = ["address"], [self.path[0]]
+        for fee, token in zip(self.fees, self.path[1:]):
+            types += ["uint24", "address"]
+            values += [fee, token]
+        return encode_abi_packed(types, values)
+
+    def compile(self):
+        swap = CallTemplate(
+            self.router,
+            "exactInput((bytes,address,uint256,uint256,uint256))",
+            ["(bytes,address,uint256,uint256,uint256)"],
+        )
+        return _CompiledUniV3Hop(self, _approve(self.token_in, self.router), swap)
+
+
+class _CompiledCurveHop:
+    priced_locally = False
+
+    def __init__(self, hop, approve, exchange):
+        self.hop = hop
+        self.approve = approve
+        self.exchange = exchange
+
+    @cached_property
+    def pool(self):
+        return Contract.from_abi("CurvePool", self.hop.pool, _CURVE_ABI)
+
+    def quote_call(self, amount_in):
+        return self.pool.get_dy(self.hop.i, self.hop.j, amount_in)
+
+    def calls(self, amount_in, min_out, swapper):
+        # Curve pays out to msg.sender, the swapper
+        return [self.approve(amount_in), self.exchange(amount_in, min_out)]
+
+
+class _CompiledUniV2Hop:
+    priced_locally = True
+
+    def __init__(self, hop, approve, swap):
+        self.hop = hop
+        self.approve = approve
+        self.swap = swap
+
+    @cached_property
+    def pairs(self):
+        return [
+            Contract.from_abi("UniswapV2Pair", p, _UNIV2_PAIR_ABI)
+            for p in self.hop.pairs
+        ]
+
+    def amount_out(self, amount_in, reserves):
+        """UniswapV2Library.getAmountsOut from `reserves` (reserve in, reserve out) per pair."""
+        amount = amount_in
+        fee_factor = MAX_BPS - self.hop.fee_bps
+        for reserve_in, reserve_out in reserves:
+            amount_with_fee = amount * fee_factor
+            amount = (
+                amount_with_fee
+                * reserve_out
+                // (reserve_in * MAX_BPS + amount_with_fee)
+            )
+        return amount
+
+    def oriented_reserves(self, raw_reserves):
+        oriented = []
+        for (token_a, token_b), reserves in zip(
+            zip(self.hop.path, self.hop.path[1:]), raw_reserves
+        ):
+            # pairs sort their tokens by address
+            if int(token_a, 16) < int(token_b, 16):
+                oriented.append((reserves[0], reserves[1]))
+            else:
+                oriented.append((reserves[1], reserves[0]))
+        return oriented
+
+    def calls(self, amount_in, min_out, swapper):
+        return [
+            self.approve(amount_in),
+            self.swap(
+                amount_in, min_out, list(self.hop.path), str(swapper), MAX_UINT256
+            ),
+        ]
+
+
+class _CompiledUniV3Hop:
+    priced_locally = False
+
+    def __init__(self, hop, approve, swap):
+        self.hop = hop
+        self.approve = approve
+        self.swap = swap
+        self.path = hop.encoded_path()
+
+    @cached_property
+    def quoter(self):
+        return Contract.from_abi("Quoter", self.hop.quoter, _UNIV3_QUOTER_ABI)
+
+    def quote_call(self, amount_in):
+        return self.quoter.quoteExactInput(self.path, amount_in)
+
+    def calls(self, amount_in, min_out, swapper):
+        return [
+            self.approve(amount_in),
+            self.swap((self.path, str(swapper), MAX_UINT256, amount_in, min_out)),
+        ]
+
+
+class Route:
+    def __init__(self, token_in, token_out, hops: Sequence):
+        self.token_in = str(token_in)
+        self.token_out = str(token_out)
+        self.hops = [hop.compile() for hop in hops]
+        for a, b in zip(self.hops, self.hops[1:]):
+            if a.hop.token_out != b.hop.token_in:
+                raise ValueError(f"hop {a.hop} does not feed {b.hop}")
+        if (
+            self.hops[0].hop.token_in != self.token_in
+            or self.hops[-1].hop.token_out != self.token_out
+        ):
+            raise ValueError("hops do not go from token_in to token_out")
+        self.transfer = _transfer(self.token_out)
+
+    def quote(self, amount_in, block=None):
+        """Expected output of every hop, see `quote_many`."""
+        return quote_many([(self, amount_in)], block)[0]
+
+    def _swap_calls(self, amount_in, swapper, slippage_bps, quotes):
+        """The calls selling `amount_in` along the route and the amount they guarantee."""
+        calls = []
+        amount = amount_in
+        for hop, min_out in zip(
+            self.hops, hop_min_outs(amount_in, quotes, slippage_bps)
+        ):
+            calls += hop.calls(amount, min_out, swapper)
+            amount = min_out
+        return calls, amount
+
+    @staticmethod
+    def _pack(calls):
+        types = ["uint8"] + ["address", "uint256", "bytes"] * len(calls)
+        values = [CALL_ONLY_NO_VALUE]
+        for call in calls:
+            values += [call.to, len(call.data), call.data]
+        return encode_abi_packed(types, values)
+
+    def build(self, amount_in, receiver, swapper, slippage_bps=200, quotes=None):
+        """
+        Returns (payload, min_out): the swapper payload that sells `amount_in` along the
+        route and sends `min_out` of token_out to `receiver`.
+        """
+        quotes = quotes or self.quote(amount_in)
+        calls, amount = self._swap_calls(amount_in, swapper, slippage_bps, quotes)
+        calls.append(self.transfer(str(receiver), amount))
+        return self._pack(calls), amount
+
+    def build_payouts(self, payouts, swapper, slippage_bps=200, quotes=None):
+        """
+        Returns (payload, min_outs): one sale of the sum of the `(receiver, amount_in)`
+        in `payouts`, whose guaranteed output is sent back pro rata to every receiver.
+        `quotes` are those of the summed amount.
+        """
+        amount_in = sum(amount for _, amount in payouts)
+        quotes = quotes or self.quote(amount_in)
+        calls, amount = self._swap_calls(amount_in, swapper, slippage_bps, quotes)
+        min_outs = pro_rata(amount, [amount for _, amount in payouts])
+        calls += [
+            self.transfer(str(receiver), min_out)
+            for (receiver, _), min_out in zip(payouts, min_outs)
+        ]
+        return self._pack(calls), min_outs
+
+
+def hop_min_outs(amount_in, quotes, slippage_bps) -> List[int]:
+    """The min out of every hop of a sale of `amount_in` quoted at `quotes`."""
+    min_outs = []
+    amount, quoted_in = amount_in, amount_in
+    for quoted in quotes:
+        # the next hop only spends what this one is guaranteed to return, and is
+        # held to the same slippage on that smaller amount
+        amount = quoted * amount * (MAX_BPS - slippage_bps) // (quoted_in * MAX_BPS)
+        min_outs.append(amount)
+        quoted_in = quoted
+    return min_outs
+
+
+def pro_rata(amount, weights) -> List[int]:
+    """
+    Splits `amount` in proportion to `weights`, rounding down, the few wei left over
+    going to the largest remainders so the parts add up to `amount`.
+    """
+    total = sum(weights)
+    parts = [amount * weight // total for weight in weights]
+    left = amount - sum(parts)
+    by_remainder = sorted(
+        range(len(weights)), key=lambda i: amount * weights[i] % total, reverse=True
+    )
+    for i in by_remainder[:left]:
+        parts[i] += 1
+    return parts
+
+
+def quote_many(requests, block=None) -> List[List[int]]:
+    """
+    Quotes every hop of every (route, amount_in) in `requests`. Pair reserves and the
+    first on-chain quotes (Curve, Uniswap V3) share one multicall, later ones take one
+    more round per hop.
+    """
+    amounts = [[amount_in] for _, amount_in in requests]
+    block = web3.eth.block_number if block is None else block
+    reserves = {}
+    depth = max(len(route.hops) for route, _ in requests)
+
+    for h in range(depth):
+        on_chain = [
+            i
+            for i, (route, _) in enumerate(requests)
+            if h < len(route.hops) and not route.hops[h].priced_locally
+        ]
+        chain_quotes = {}
+        if h == 0 or on_chain:
+            with multicall(block_identifier=block):
+                if h == 0:
+                    for route, _ in requests:
+                        for hop in route.hops:
+                            if (
+                                isinstance(hop, _CompiledUniV2Hop)
+                                and hop.hop not in reserves
+                            ):
+                                reserves[hop.hop] = [
+                                    pair.getReserves() for pair in hop.pairs
+                                ]
+                for i in on_chain:
+                    chain_quotes[i] = requests[i][0].hops[h].quote_call(amounts[i][-1])
+        for i, (route, _) in enumerate(requests):
+            if h >= len(route.hops):
+                continue
+            hop = route.hops[h]
+            if i in chain_quotes:
+                # a quote that reverts (no liquidity) comes back empty
+                amounts[i].append(int(chain_quotes[i] or 0))
+            else:
+                pair_reserves = hop.oriented_reserves(
+                    [tuple(r)[:2] for r in reserves[hop.hop]]
+                )
+                amounts[i].append(hop.amount_out(amounts[i][-1], pair_reserves))
+
+    return [a[1:] for a in amounts]
+
+
+def build_split(legs, receiver, swapper, slippage_bps=200, block=None):
+    """
+    One payload selling along several routes between the same tokens, `legs` being
+    (route, amount_in) pairs. Returns (payload, min_out) like `Route.build`.
+    """
+    if len({(route.token_in, route.token_out) for route, _ in legs}) != 1:
+        raise ValueError(
+            "all legs must go from the same token_in to the same token_out"
+        )
+    payloads, min_out = [], 0
+    for (route, amount_in), quotes in zip(legs, quote_many(legs, block)):
+        payload, leg_min_out = route.build(
+            amount_in, receiver, swapper, slippage_bps, quotes
+        )
+        # every payload starts with the optimization flag, the swapper reads it once
+        payloads.append(payload[1:] if payloads else payload)
+        min_out += leg_min_out
+    return b"".join(payloads), min_out
+
+
+def curve_hop(pool, i, j, index_type="uint256"):
+    pool = Contract.from_abi("CurvePool", str(pool), _CURVE_ABI)
+    return CurveHop(
+        pool.address, str(pool.coins(i)), str(pool.coins(j)), i, j, index_type
+    )
+
+
+def univ2_hop(router, path):
+    return UniV2Hop(str(router), tuple(str(token) for token in path))
+
+
+def univ3_hop(router, quoter, path, fees):
+    return UniV3Hop(
+        str(router), str(quoter), tuple(str(token) for token in path), tuple(fees)
+    )
+
+
+@lru_cache(maxsize=None)
+def _pairs(router, path):
+    factory = Contract.from_abi(
+        "UniswapV2Factory",
+        Contract.from_abi("UniswapV2Router", router, _UNIV2_ROUTER_ABI).factory(),
+        _UNIV2_FACTORY_ABI,
+    )
+    return tuple(str(factory.getPair(a, b)) for a, b in zip(path, path[1:]))
+
+
+@lru_cache(maxsize=None)
+def _compile_route(token_in, token_out, hops):
+    hops = tuple(
+        UniV2Hop(h.router, h.path, _pairs(h.router, h.path), h.fee_bps)
+        if isinstance(h, UniV2Hop) and not h.pairs
+        else h
+        for h in hops
+    )
+    return Route(token_in, token_out, hops)
+
+
+def compile_route(token_in, token_out, hops):
+    """The compiled `Route` for these hops, built once and cached."""
+    return _compile_route(str(token_in), str(token_out), tuple(hops))
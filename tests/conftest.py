@@ -1,127 +1,283 @@
+import os
+from pathlib import Path
+
 import pytest
 from brownie import config
 from brownie import Contract
 
+from gas_snapshot import GasSnapshot
+from scripts.gas_profiler import GasProfile
+from scripts.local_stack import deploy_stargate_stack
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--update-gas-snapshot",
+        action="store_true",
+        help="rewrite tests/gas_snapshot.json with the gas measured in this run",
+    )
+    parser.addoption(
+        "--gas-strict",
+        action="store_true",
+        help="fail benchmarks that have no number in tests/gas_snapshot.json",
+    )
+    parser.addoption(
+        "--gas-tolerance",
+        type=float,
+        default=0.02,
+        help="relative gas increase allowed before a benchmark fails",
+    )
+    parser.addoption(
+        "--gas-profile",
+        metavar="DIR",
+        help="write a folded-stack gas profile and a top-N table of the gas benchmarks to DIR",
+    )
+    parser.addoption(
+        "--stack",
+        choices=("fork", "local"),
+        default=os.getenv("STARGATE_TEST_STACK", "fork"),
+        help="run against mainnet contracts on a fork, or against local Stargate stand-ins",
+    )
+    parser.addoption(
+        "--differential-seeds",
+        type=int,
+        default=8,
+        help="random sequences the differential test replays on chain, shard with -n",
+    )
+    parser.addoption(
+        "--stateful-shards",
+        type=int,
+        default=4,
+        help="independent runs of the strategy state machine, spread over workers with -n",
+    )
+    parser.addoption(
+        "--stateful-examples",
+        type=int,
+        default=25,
+        help="examples (operation sequences) Hypothesis draws in every stateful shard",
+    )
+    parser.addoption(
+        "--stateful-steps",
+        type=int,
+        default=40,
+        help="operations per stateful example",
+    )
+
+
+def pytest_generate_tests(metafunc):
+    if "differential_seed" in metafunc.fixturenames:
+        seeds = metafunc.config.getoption("--differential-seeds")
+        metafunc.parametrize("differential_seed", range(seeds))
+    if "stateful_shard" in metafunc.fixturenames:
+        shards = metafunc.config.getoption("--stateful-shards")
+        metafunc.parametrize("stateful_shard", range(shards))
+
+
+@pytest.fixture(scope="session")
+def local_stack(request):
+    yield request.config.getoption("--stack") == "local"
+
 
-@pytest.fixture
-def gov(accounts):
-    yield accounts.at("0xFEB4acf3df3cDEA7399794D0869ef76A6EfAff52", force=True)
+# Chain state is set up once per module (vaults, strategies, funded accounts) and every
+# test runs on top of a snapshot of it. `fn_isolation` resets the chain around each module
+# and reverts to the snapshot after each test.
+@pytest.fixture(autouse=True)
+def isolation(fn_isolation, chain):
+    block = chain[-1]
+    yield
+    # a test that takes its own snapshot replaces ours, so check we really are back
+    chain.revert()
+    assert chain[-1].hash == block.hash, "test state leaked past its snapshot"
 
 
-@pytest.fixture
+def fork_only(local_stack):
+    if local_stack:
+        pytest.skip("requires a mainnet fork")
+
+
+@pytest.fixture(scope="module")
+def stargate_stack(local_stack, accounts):
+    """Deploys the local Stargate stand-ins once per module, `None` when forking."""
+    if not local_stack:
+        yield None
+        return
+    yield deploy_stargate_stack(accounts[9])
+
+
+def funded_account(stargate_stack, account, token, amount):
+    if token.balanceOf(account) < amount:
+        token.mint(account, amount, {"from": stargate_stack.deployer})
+    return account
+
+
+@pytest.fixture(scope="module")
+def gov(accounts, local_stack):
+    if local_stack:
+        yield accounts[6]
+    else:
+        yield accounts.at("0xFEB4acf3df3cDEA7399794D0869ef76A6EfAff52", force=True)
+
+
+@pytest.fixture(scope="module")
 def user(accounts):
     yield accounts[0]
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def rewards(accounts):
     yield accounts[1]
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def guardian(accounts):
     yield accounts[2]
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def management(accounts):
     yield accounts[3]
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def strategist(accounts):
     yield accounts[4]
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def keeper(accounts):
     yield accounts[5]
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def token(usdc):
     yield usdc
 
 
-@pytest.fixture
-def usdc():
-    token_address = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
-    yield Contract(token_address)
+@pytest.fixture(scope="module")
+def usdc(stargate_stack):
+    if stargate_stack:
+        yield stargate_stack.usdc
+    else:
+        token_address = "0xA0b86991c6218b36c1d19D4a2e9Eb0cE3606eB48"
+        yield Contract(token_address)
+
 
+@pytest.fixture(scope="module")
+def token2(stargate_stack):
+    if stargate_stack:
+        yield stargate_stack.usdt
+    else:
+        token_address = "0xdac17f958d2ee523a2206206994597c13d831ec7"  # this should be the address of the ERC-20 used by the strategy/vault (USDT)
+        yield Contract(token_address)
 
-@pytest.fixture
-def token2():
-    token_address = "0xdac17f958d2ee523a2206206994597c13d831ec7"  # this should be the address of the ERC-20 used by the strategy/vault (USDT)
-    yield Contract(token_address)
 
+@pytest.fixture(scope="module")
+def token_whale(accounts, stargate_stack, token):
+    if stargate_stack:
+        yield funded_account(stargate_stack, accounts[7], token, 100_000_000 * 10 ** 6)
+    else:
+        yield accounts.at("0x7abe0ce388281d2acf297cb089caef3819b13448", force=True)
 
-@pytest.fixture
-def token_whale(accounts):
-    yield accounts.at("0x7abe0ce388281d2acf297cb089caef3819b13448", force=True)
 
+@pytest.fixture(scope="module")
+def token2_whale(accounts, stargate_stack, token2):
+    if stargate_stack:
+        yield funded_account(stargate_stack, accounts[8], token2, 100_000_000 * 10 ** 6)
+    else:
+        yield accounts.at("0xd6216fc19db775df9774a6e33526131da7d19a2c", force=True)
 
-@pytest.fixture
-def token2_whale(accounts):
-    yield accounts.at("0xd6216fc19db775df9774a6e33526131da7d19a2c", force=True)
 
+@pytest.fixture(scope="module")
+def token_lp(stargate_stack):
+    if stargate_stack:
+        yield stargate_stack.usdc_pool
+    else:
+        address = "0xdf0770dF86a8034b3EFEf0A1Bb3c889B8332FF56"
+        yield Contract(address)
 
-@pytest.fixture
-def token_lp():
-    address = "0xdf0770dF86a8034b3EFEf0A1Bb3c889B8332FF56"
-    yield Contract(address)
+
+@pytest.fixture(scope="module")
+def stg_token(stargate_stack):
+    if stargate_stack:
+        yield stargate_stack.stg
+    else:
+        token_address = "0xAf5191B0De278C7286d6C7CC6ab6BB8A73bA2Cd6"
+        yield Contract(token_address)
 
 
-@pytest.fixture
-def stg_token():
-    token_address = "0xAf5191B0De278C7286d6C7CC6ab6BB8A73bA2Cd6"
-    yield Contract(token_address)
+@pytest.fixture(scope="module")
+def stg_whale(accounts, stargate_stack, stg_token):
+    if stargate_stack:
+        yield funded_account(stargate_stack, accounts[9], stg_token, 10 ** 24)
+    else:
+        yield accounts.at("0x32e46cab87109ee6ede7d03d263c47be987238b9", force=True)
 
 
-@pytest.fixture
-def stg_whale(accounts):
-    yield accounts.at("0x32e46cab87109ee6ede7d03d263c47be987238b9", force=True)
+@pytest.fixture(scope="module")
+def lp_staker(stargate_stack):
+    if stargate_stack:
+        yield stargate_stack.lp_staker
+    else:
+        address = "0xB0D502E938ed5f4df2E681fE6E419ff29631d62b"
+        yield Contract(address)
 
 
-@pytest.fixture
-def lp_staker():
-    address = "0xB0D502E938ed5f4df2E681fE6E419ff29631d62b"
-    yield Contract(address)
+@pytest.fixture(scope="module")
+def stargate_router(stargate_stack):
+    if stargate_stack:
+        yield stargate_stack.router
+    else:
+        address = "0x8731d54E9D02c286767d56ac03e8037C07e01e98"
+        yield Contract(address)
 
 
-@pytest.fixture
-def stargate_router():
-    address = "0x8731d54E9D02c286767d56ac03e8037C07e01e98"
-    yield Contract(address)
+@pytest.fixture(scope="module")
+def trade_factory(stargate_stack):
+    if stargate_stack:
+        yield stargate_stack.trade_factory
+    else:
+        yield Contract("0x99d8679bE15011dEAD893EB4F5df474a4e6a8b29")
 
 
-@pytest.fixture
-def trade_factory():
-    yield Contract("0x99d8679bE15011dEAD893EB4F5df474a4e6a8b29")
+@pytest.fixture(scope="module")
+def mock_swapper(local_stack, stargate_stack):
+    if not local_stack:
+        pytest.skip("only deployed on the local stack")
+    yield stargate_stack.swapper
 
 
-@pytest.fixture
-def curve_pool():
+@pytest.fixture(scope="module")
+def curve_pool(local_stack):
+    fork_only(local_stack)
     yield Contract("0x3211C6cBeF1429da3D0d58494938299C92Ad5860")
 
 
-@pytest.fixture
-def ymechs_safe():
-    yield Contract("0x2C01B4AD51a67E2d8F02208F54dF9aC4c0B778B6")
+@pytest.fixture(scope="module")
+def ymechs_safe(stargate_stack):
+    if stargate_stack:
+        yield stargate_stack.deployer
+    else:
+        yield Contract("0x2C01B4AD51a67E2d8F02208F54dF9aC4c0B778B6")
 
 
-@pytest.fixture
-def stargate_token_pool():
-    address = "0xdf0770dF86a8034b3EFEf0A1Bb3c889B8332FF56"  # for USDC
-    yield Contract(address)
+@pytest.fixture(scope="module")
+def stargate_token_pool(stargate_stack):
+    if stargate_stack:
+        yield stargate_stack.usdc_pool
+    else:
+        address = "0xdf0770dF86a8034b3EFEf0A1Bb3c889B8332FF56"  # for USDC
+        yield Contract(address)
 
 
 @pytest.fixture(scope="module")
-def sushiswap_router(Contract):
+def sushiswap_router(Contract, local_stack):
+    fork_only(local_stack)
     yield Contract("0xd9e1cE17f2641f24aE83637ab66a2cca9C378B9F")
 
 
 @pytest.fixture(scope="module")
-def multicall_swapper(interface):
+def multicall_swapper(interface, local_stack):
+    fork_only(local_stack)
     yield interface.MultiCallOptimizedSwapper(
         "0xB2F65F254Ab636C96fb785cc9B4485cbeD39CDAA"
     )
@@ -132,63 +288,70 @@ def liquidity_pool_id_in_lp_staking():
     yield 0
 
 
-@pytest.fixture
-def SGT_whale(accounts):
+@pytest.fixture(scope="module")
+def SGT_whale(accounts, local_stack):
+    fork_only(local_stack)
     yield accounts.at("0x485544e6fbef56d5bff61632b519ba0debdf28c1", force=True)
 
 
-@pytest.fixture
-def token_LP_whale(accounts):
+@pytest.fixture(scope="module")
+def token_LP_whale(accounts, local_stack):
+    fork_only(local_stack)
     yield accounts.at("0xf8fd11594574f6aeb3193e779b7b1cf5ef6432f4", force=True)
 
 
-@pytest.fixture
-def amount(accounts, token, user):
+@pytest.fixture(scope="module")
+def amount(token, user, token_whale):
     amount = 100_000 * 10 ** token.decimals()
     # In order to get some funds for the token you are about to use,
     # it impersonate an exchange address to use it's funds.
-    reserve = accounts.at("0x7abe0ce388281d2acf297cb089caef3819b13448", force=True)
-    token.transfer(user, amount, {"from": reserve})
+    token.transfer(user, amount, {"from": token_whale})
     yield amount
 
 
-@pytest.fixture
-def univ3_swapper():
+@pytest.fixture(scope="module")
+def univ3_swapper(local_stack):
+    fork_only(local_stack)
     address = "0xE592427A0AEce92De3Edee1F18E0157C05861564"
     yield Contract(address)
 
 
-@pytest.fixture
-def univ2_router():
+@pytest.fixture(scope="module")
+def univ2_router(local_stack):
+    fork_only(local_stack)
     address = "0x7a250d5630B4cF539739dF2C5dAcb4c659F2488D"
     yield Contract(address)
 
 
-@pytest.fixture
-def ymechs_safe():
-    yield Contract("0x2C01B4AD51a67E2d8F02208F54dF9aC4c0B778B6")
-
-
-@pytest.fixture
-def weth():
-    token_address = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
-    yield Contract(token_address)
+@pytest.fixture(scope="module")
+def weth(stargate_stack):
+    if stargate_stack:
+        yield stargate_stack.weth
+    else:
+        token_address = "0xC02aaA39b223FE8D0A0e5C4F27eAD9083C756Cc2"
+        yield Contract(token_address)
 
 
-@pytest.fixture
-def price_feed():
-    token_address = "0x986b5E1e1755e3C2440e960477f25201B0a8bbD4"
-    yield Contract(token_address)
+@pytest.fixture(scope="module")
+def price_feed(stargate_stack):
+    if stargate_stack:
+        yield stargate_stack.price_feed
+    else:
+        token_address = "0x986b5E1e1755e3C2440e960477f25201B0a8bbD4"
+        yield Contract(token_address)
 
 
-@pytest.fixture
-def weth_amout(user, weth):
+@pytest.fixture(scope="module")
+def weth_amout(user, weth, stargate_stack):
     weth_amout = 10 ** weth.decimals()
-    user.transfer(weth, weth_amout)
+    if stargate_stack:
+        weth.mint(user, weth_amout, {"from": stargate_stack.deployer})
+    else:
+        user.transfer(weth, weth_amout)
     yield weth_amout
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def vault(pm, gov, rewards, guardian, management, token):
     Vault = pm(config["dependencies"][0]).Vault
     vault = guardian.deploy(Vault)
@@ -198,7 +361,7 @@ def vault(pm, gov, rewards, guardian, management, token):
     yield vault
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def vault2(pm, gov, rewards, guardian, management, token2):
     Vault = pm(config["dependencies"][0]).Vault
     vault = guardian.deploy(Vault)
@@ -208,7 +371,7 @@ def vault2(pm, gov, rewards, guardian, management, token2):
     yield vault
 
 
-@pytest.fixture
+@pytest.fixture(scope="module")
 def strategy(
     strategist,
     keeper,
@@ -245,3 +408,26 @@ def strategy(
 @pytest.fixture(scope="session")
 def RELATIVE_APPROX():
     yield 1e-5
+
+
+@pytest.fixture(scope="session")
+def gas_snapshot(request):
+    profile_dir = request.config.getoption("--gas-profile")
+    snapshot = GasSnapshot(
+        stack=request.config.getoption("--stack"),
+        tolerance=request.config.getoption("--gas-tolerance"),
+        update=request.config.getoption("--update-gas-snapshot"),
+        strict=request.config.getoption("--gas-strict"),
+        profile=GasProfile() if profile_dir else None,
+    )
+    yield snapshot
+    if snapshot.update:
+        snapshot.write()
+    print("\n" + snapshot.diff(snapshot.measured))
+    if profile_dir:
+        profile_dir = Path(profile_dir)
+        profile_dir.mkdir(parents=True, exist_ok=True)
+        snapshot.profile.write_folded(profile_dir / "gas.folded")
+        table = snapshot.profile.table(40)
+        (profile_dir / "gas_top.txt").write_text(table + "\n")
+        print("\n" + table)
@@ -0,0 +1,237 @@
+import copy
+
+from brownie import chain
+from brownie.exceptions import VirtualMachineError
+
+from scripts.reference_model import (
+    MAX_BPS,
+    PoolModel,
+    Revert,
+    StakerModel,
+    StrategyModel,
+)
+
+
+class Divergence(AssertionError):
+    pass
+
+
+class _BothReverted(Exception):
+    pass
+
+
+class ChainHarness:
+    """
+    Runs `scripts.reference_model` operations against the deployed strategy and the
+    reference model side by side, and fails on the first step where they disagree.
+
+    The vault is not modelled here: whatever it asks of the strategy (debt outstanding,
+    total debt, credit) is read from the chain and fed to the model.
+    """
+
+    def __init__(
+        self, vault, strategy, token, pool, lp_staker, pid, user, gov, keeper, minter
+    ):
+        self.vault = vault
+        self.strategy = strategy
+        self.token = token
+        self.pool = pool
+        self.lp_staker = lp_staker
+        self.pid = pid
+        self.user = user
+        self.gov = gov
+        self.keeper = keeper
+        self.minter = minter
+
+        # unlock profit right away so share prices can be computed off chain
+        vault.setLockedProfitDegradation(10 ** 18, {"from": gov})
+        self.model = self.read_model()
+
+    def read_model(self):
+        pool_info = self.lp_staker.poolInfo(self.pid)
+        user_info = self.lp_staker.userInfo(self.pid, self.strategy)
+        staker = StakerModel(
+            stargate_per_block=self.lp_staker.stargatePerBlock(),
+            alloc_point=pool_info["allocPoint"],
+            total_alloc_point=self.lp_staker.totalAllocPoint(),
+            last_reward_block=pool_info["lastRewardBlock"],
+            acc_stargate_per_share=pool_info["accStargatePerShare"],
+            lp_supply=self.lp_staker.lpBalances(self.pid),
+            amount=user_info["amount"],
+            reward_debt=user_info["rewardDebt"],
+        )
+        pool = PoolModel(
+            total_liquidity=self.pool.totalLiquidity(),
+            total_supply=self.pool.totalSupply(),
+            convert_rate=self.pool.convertRate(),
+            delta_credit=self.pool.deltaCredit(),
+        )
+        return StrategyModel(
+            pool,
+            staker,
+            want=self.strategy.balanceOfWant(),
+            unstaked_lp=self.strategy.balanceOfUnstakedLPToken(),
+            stg=self.strategy.balanceOfSTG(),
+            emergency_exit=self.strategy.emergencyExit(),
+            pending_redemption=self.strategy.pendingRedemption(),
+        )
+
+    def run(self, step, op):
+        """Applies `op` to both sides, then compares the whole position."""
+        backup = copy.deepcopy(self.model)
+        try:
+            getattr(self, f"_{op.name}")(op.arg)
+        except _BothReverted:
+            self.model = backup
+        except Revert as e:
+            raise Divergence(
+                f"step {step} {op}: model reverted with {e.reason!r}"
+            ) from None
+        except Divergence as e:
+            raise Divergence(f"step {step} {op}: {e}") from None
+
+        expected = self._state(self.model)
+        actual = self._state(self.read_model())
+        diff = {
+            k: (expected[k], actual[k]) for k in expected if expected[k] != actual[k]
+        }
+        if diff:
+            raise Divergence(f"step {step} {op}: model != chain for {diff}")
+
+    @staticmethod
+    def _state(model):
+        staker = model.staker
+        return {
+            "want": model.want,
+            "unstaked_lp": model.unstaked_lp,
+            "staked_lp": model.staked_lp,
+            "stg": model.stg,
+            "pool_liquidity": model.pool.total_liquidity,
+            "pool_supply": model.pool.total_supply,
+            "pool_delta_credit": model.pool.delta_credit,
+            "acc_stargate_per_share": staker.acc_stargate_per_share,
+            "last_reward_block": staker.last_reward_block,
+            "staked_supply": staker.lp_supply,
+            "reward_debt": staker.reward_debt,
+            "emergency_exit": model.emergency_exit,
+            "pending_redemption": model.pending_redemption,
+        }
+
+    def _transact(self, fn, *args):
+        """Sends a transaction, returns (tx, revert reason)."""
+        try:
+            return fn(*args), None
+        except VirtualMachineError as e:
+            return None, e.revert_msg or "reverted"
+
+    def _expect(self, chain_revert, model_call):
+        """Runs the model side, which must revert exactly when the chain did."""
+        try:
+            result = model_call()
+        except Revert as e:
+            if chain_revert is None:
+                raise Divergence(f"model reverted with {e.reason!r}, chain did not")
+            if chain_revert != "reverted" and chain_revert != e.reason:
+                raise Divergence(
+                    f"chain reverted with {chain_revert!r}, model {e.reason!r}"
+                )
+            raise _BothReverted() from None
+        if chain_revert is not None:
+            raise Divergence(f"chain reverted with {chain_revert!r}, model did not")
+        return result
+
+    # ---------------------------- operations ----------------------------
+
+    def _deposit(self, amount):
+        if self.vault.totalSupply() and not self.vault.totalAssets():
+            return
+        self.token.mint(self.user, amount, {"from": self.minter})
+        self.token.approve(self.vault, amount, {"from": self.user})
+        self.vault.deposit(amount, {"from": self.user})
+
+    def _withdraw(self, bps):
+        shares = self.vault.balanceOf(self.user) * bps // MAX_BPS
+        if shares == 0:
+            return
+        chain.sleep(1)
+        # Vault 0.4.3 with no locked profit: only the part the vault doesn't hold is asked for
+        value = shares * self.vault.totalAssets() // self.vault.totalSupply()
+        idle = self.vault.totalIdle()
+        debt_before = self.vault.strategies(self.strategy)["totalDebt"]
+        amount_needed = min(value - idle, debt_before) if value > idle else 0
+
+        tx, reverted = self._transact(
+            self.vault.withdraw, shares, self.user, MAX_BPS, {"from": self.user}
+        )
+        if amount_needed == 0:
+            return
+        block = tx.block_number if tx else chain.height
+        freed, loss = self._expect(
+            reverted, lambda: self.model.withdraw(amount_needed, block)
+        )
+        debt_after = self.vault.strategies(self.strategy)["totalDebt"]
+        if debt_before - debt_after != freed + loss:
+            raise Divergence(
+                f"vault debt moved by {debt_before - debt_after}, model freed {freed} lost {loss}"
+            )
+
+    def _harvest(self, _):
+        debt_outstanding = self.vault.debtOutstanding(self.strategy)
+        vault_debt = self.vault.strategies(self.strategy)["totalDebt"]
+        chain.sleep(1)
+        tx, reverted = self._transact(self.strategy.harvest, {"from": self.keeper})
+        block = tx.block_number if tx else chain.height
+        result = self._expect(
+            reverted,
+            lambda: self.model.harvest_returns(debt_outstanding, vault_debt, block),
+        )
+
+        harvested = tx.events["Harvested"]
+        reported = (harvested["profit"], harvested["loss"], harvested["debtPayment"])
+        if result != reported:
+            raise Divergence(f"harvest reported {reported}, model {result}")
+
+        # the vault lends `debtAdded` and takes back what was reported as available
+        report = tx.events["StrategyReported"]
+        self.model.want += report["debtAdded"] - report["gain"] - report["debtPaid"]
+        self.model.adjust_position(harvested["debtOutstanding"], block)
+
+    def _tend(self, _):
+        debt_outstanding = self.vault.debtOutstanding(self.strategy)
+        tx, reverted = self._transact(self.strategy.tend, {"from": self.keeper})
+        block = tx.block_number if tx else chain.height
+        self._expect(
+            reverted, lambda: self.model.adjust_position(debt_outstanding, block)
+        )
+
+    def _mine(self, blocks):
+        chain.mine(blocks)
+
+    def _rate_move(self, bps):
+        liquidity = self.pool.totalLiquidity()
+        new_liquidity = liquidity + liquidity * bps // MAX_BPS
+        if new_liquidity > liquidity:
+            backing = (new_liquidity - liquidity) * self.pool.convertRate()
+            self.token.mint(self.pool, backing, {"from": self.minter})
+        self.pool.setTotalLiquidity(new_liquidity, {"from": self.minter})
+        self.model.pool.total_liquidity = new_liquidity
+
+    def _delta_credit(self, bps):
+        credit = self.pool.totalLiquidity() * bps // MAX_BPS
+        self.pool.setDeltaCredit(credit, {"from": self.minter})
+        self.model.pool.delta_credit = credit
+
+    def _debt_ratio(self, bps):
+        if self.model.emergency_exit:
+            return
+        self.vault.updateStrategyDebtRatio(self.strategy, bps, {"from": self.gov})
+
+    def _airdrop(self, amount):
+        self.token.mint(self.strategy, amount, {"from": self.minter})
+        self.model.want += amount
+
+    def _emergency_exit(self, _):
+        if self.model.emergency_exit:
+            return
+        self.strategy.setEmergencyExit({"from": self.gov})
+        self.model.emergency_exit = True
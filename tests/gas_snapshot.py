@@ -0,0 +1,102 @@
+import json
+import warnings
+from pathlib import Path
+
+SNAPSHOT_VERSION = 2
+SNAPSHOT_PATH = Path(__file__).parent / "gas_snapshot.json"
+
+
+class GasRegression(AssertionError):
+    pass
+
+
+class MissingGasSnapshot(UserWarning):
+    pass
+
+
+class GasSnapshot:
+    """
+    Gas used per benchmarked operation, keyed by "<stack>:<operation>[<params>]" so
+    the fork and local stacks keep separate numbers.
+
+    Measurements are compared against the committed snapshot as they are recorded,
+    and written back to disk only when running with `--update-gas-snapshot`. A
+    measurement without a snapshot is reported as a warning, or fails when `strict`.
+    With a `profile` (see scripts/gas_profiler.py) the transactions passed to `record`
+    are profiled under their key.
+    """
+
+    def __init__(
+        self,
+        path=SNAPSHOT_PATH,
+        stack="fork",
+        tolerance=0.02,
+        update=False,
+        strict=False,
+        profile=None,
+    ):
+        self.path = Path(path)
+        self.stack = stack
+        self.tolerance = tolerance
+        self.update = update
+        self.strict = strict
+        self.profile = profile
+        self.baseline = {}
+        self.measured = {}
+
+        if self.path.exists():
+            data = json.loads(self.path.read_text())
+            if data.get("version") != SNAPSHOT_VERSION:
+                if update:
+                    return
+                raise ValueError(
+                    f"{self.path.name} is version {data.get('version')}, "
+                    f"expected {SNAPSHOT_VERSION}; rerun with --update-gas-snapshot"
+                )
+            self.baseline = data["gas"]
+
+    def key(self, operation, **params):
+        if not params:
+            return f"{self.stack}:{operation}"
+        args = ",".join(f"{k}={v}" for k, v in sorted(params.items()))
+        return f"{self.stack}:{operation}[{args}]"
+
+    def record(self, operation, gas_used, tx=None, **params):
+        key = self.key(operation, **params)
+        self.measured[key] = gas_used
+        print(f"gas {key}: {gas_used}")
+        if self.profile is not None and tx is not None:
+            self.profile.add(tx, root=key)
+
+        if self.update:
+            return
+        if key not in self.baseline:
+            message = (
+                f"no snapshot for {key}, rerun with --update-gas-snapshot "
+                f"and commit {self.path.name}"
+            )
+            if self.strict:
+                raise GasRegression(f"{message}\n{self.diff([key])}")
+            warnings.warn(message, MissingGasSnapshot)
+            return
+        expected = self.baseline[key]
+        if gas_used > expected * (1 + self.tolerance):
+            raise GasRegression(self.diff([key]))
+
+    def diff(self, keys=None):
+        keys = sorted(keys or set(self.baseline) | set(self.measured))
+        lines = [f"{'operation':<60} {'snapshot':>10} {'measured':>10} {'change':>8}"]
+        for key in keys:
+            old = self.baseline.get(key)
+            new = self.measured.get(key)
+            if old and new:
+                change = f"{(new - old) / old:+.2%}"
+            else:
+                change = "new" if new else "removed"
+            lines.append(f"{key:<60} {old or '-':>10} {new or '-':>10} {change:>8}")
+        return "\n".join(lines)
+
+    def write(self):
+        gas = {**self.baseline, **self.measured}
+        data = {"version": SNAPSHOT_VERSION, "gas": dict(sorted(gas.items()))}
+        self.path.write_text(json.dumps(data, indent=2) + "\n")
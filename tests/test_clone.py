@@ -105,3 +105,136 @@ def test_clone(
     assert (
         vault.strategies(cloned_strategy).dict()["totalLoss"] < 10
     )  # might be a loss from rounding
+
+
+def test_factory_clone_many(
+    strategy,
+    vault,
+    strategist,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    gov,
+    keeper,
+    rewards,
+    price_feed,
+    StrategyFactory,
+):
+    factory = strategist.deploy(StrategyFactory, strategy)
+    salts = [f"0x{i:064x}" for i in range(1, 4)]
+    params = [
+        (
+            vault,
+            lp_staker,
+            liquidity_pool_id_in_lp_staking,
+            price_feed,
+            f"ClonedStrategy{i}",
+            salt,
+        )
+        for i, salt in enumerate(salts)
+    ]
+
+    predicted = [factory.predictCloneAddress(strategist, salt) for salt in salts]
+    tx = factory.cloneMany(params, strategist, rewards, keeper, {"from": strategist})
+    clones = list(tx.return_value)
+    assert clones == predicted
+    assert [e["clone"] for e in tx.events["Cloned"]] == predicted
+
+    for i, address in enumerate(clones):
+        cloned_strategy = Contract.from_abi("Strategy", address, strategy.abi)
+        assert cloned_strategy.vault() == vault
+        assert cloned_strategy.keeper() == keeper
+        assert cloned_strategy.name() == f"ClonedStrategy{i}"
+        with reverts():
+            cloned_strategy.initialize(
+                vault,
+                strategist,
+                rewards,
+                keeper,
+                lp_staker,
+                liquidity_pool_id_in_lp_staking,
+                price_feed,
+                "ClonedRevertedStrat",
+                {"from": gov},
+            )
+
+    # the same salt cannot be used twice
+    with reverts("!create2"):
+        factory.cloneMany(params[:1], strategist, rewards, keeper, {"from": strategist})
+
+
+def test_rollout_manifest(
+    strategy,
+    vault,
+    strategist,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    keeper,
+    rewards,
+    price_feed,
+):
+    from scripts.rollout import rollout
+
+    manifest = {
+        "original": strategy.address,
+        "strategist": strategist.address,
+        "rewards": rewards.address,
+        "keeper": keeper.address,
+        "batch_size": 2,
+        "strategies": [
+            {
+                "vault": vault.address,
+                "lp_staker": lp_staker.address,
+                "pool_id_in_lp_staking": liquidity_pool_id_in_lp_staking,
+                "price_feed": price_feed.address,
+                "name": f"StrategyStargateUSDC{i}",
+            }
+            for i in range(3)
+        ],
+    }
+    deployed = rollout(manifest, strategist)
+
+    assert len(deployed) == 3
+    for i, address in enumerate(deployed):
+        cloned_strategy = Contract.from_abi("Strategy", address, strategy.abi)
+        assert cloned_strategy.name() == f"StrategyStargateUSDC{i}"
+
+
+def test_deploy_manifest(
+    accounts,
+    vault,
+    strategist,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    keeper,
+    rewards,
+    price_feed,
+    Strategy,
+):
+    from scripts.deploy import deploy
+
+    manifest = {
+        "strategist": strategist.address,
+        "rewards": rewards.address,
+        "keeper": keeper.address,
+        "strategies": [
+            {
+                "vault": vault.address,
+                "lp_staker": lp_staker.address,
+                "pool_id_in_lp_staking": liquidity_pool_id_in_lp_staking,
+                "price_feed": price_feed.address,
+                "name": f"StrategyStargateUSDC{i}",
+            }
+            for i in range(3)
+        ],
+    }
+    # the deployer hands every role over to the accounts in the manifest
+    deployer = accounts[8]
+    deployed = deploy(manifest, deployer)
+
+    assert list(deployed) == [f"StrategyStargateUSDC{i}" for i in range(3)]
+    for name, address in deployed.items():
+        deployed_strategy = Contract.from_abi("Strategy", address, Strategy.abi)
+        assert deployed_strategy.name() == name
+        assert deployed_strategy.keeper() == keeper
+        assert deployed_strategy.rewards() == rewards
+        assert deployed_strategy.strategist() == strategist
@@ -0,0 +1,242 @@
+import pytest
+
+
+def deposit_and_harvest(chain, token, vault, strategy, token_whale, size):
+    amount = size * 10 ** token.decimals()
+    token.approve(vault.address, amount, {"from": token_whale})
+    vault.deposit(amount, {"from": token_whale})
+    chain.sleep(1)
+    tx = strategy.harvest()
+    return amount, tx
+
+
+@pytest.mark.parametrize("size", [1_000, 100_000, 1_000_000])
+def test_gas_first_harvest(
+    chain, token, vault, strategy, token_whale, size, gas_snapshot
+):
+    _, tx = deposit_and_harvest(chain, token, vault, strategy, token_whale, size)
+    gas_snapshot.record("harvest_first", tx.gas_used, tx=tx, size=size)
+
+
+@pytest.mark.parametrize("pending_blocks", [0, 100])
+@pytest.mark.parametrize("unstaked_bps", [0, 5_000])
+@pytest.mark.parametrize("debt_ratio", [10_000, 9_900, 5_000, 0])
+def test_gas_harvest(
+    chain,
+    gov,
+    token,
+    vault,
+    strategy,
+    token_whale,
+    debt_ratio,
+    unstaked_bps,
+    pending_blocks,
+    gas_snapshot,
+):
+    deposit_and_harvest(chain, token, vault, strategy, token_whale, 100_000)
+
+    staked = strategy.balanceOfStakedLPToken()
+    if unstaked_bps > 0:
+        strategy.unstakeLP(staked * unstaked_bps // 10_000, {"from": gov})
+    vault.updateStrategyDebtRatio(strategy, debt_ratio, {"from": gov})
+    chain.mine(pending_blocks)
+    chain.sleep(1)
+
+    tx = strategy.harvest()
+    gas_snapshot.record(
+        "harvest",
+        tx.gas_used,
+        tx=tx,
+        debt_ratio=debt_ratio,
+        unstaked_bps=unstaked_bps,
+        pending_blocks=pending_blocks,
+    )
+
+
+def test_gas_router_approval(
+    chain,
+    gov,
+    token,
+    vault,
+    strategy,
+    token_whale,
+    stargate_router,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    price_feed,
+    strategist,
+    StrategyRouterRefill,
+    gas_snapshot,
+):
+    _, tx = deposit_and_harvest(chain, token, vault, strategy, token_whale, 100_000)
+    # the max approval from initialization outlives the deposit
+    assert token.allowance(strategy, stargate_router) == 2 ** 256 - 1
+    gas_snapshot.record("harvest_deposit", tx.gas_used, tx=tx, router_approval="once")
+
+    # the same harvest by a strategy that tops the allowance up before every deposit
+    chain.undo()
+    refill = strategist.deploy(
+        StrategyRouterRefill,
+        vault,
+        lp_staker,
+        liquidity_pool_id_in_lp_staking,
+        price_feed,
+        "StrategyStargateUSDC",
+    )
+    vault.migrateStrategy(strategy, refill, {"from": gov})
+    refill_tx = refill.harvest({"from": gov})
+    # the router spends the allowance it was given, so the next deposit refills again
+    assert token.allowance(refill, stargate_router) < 10 ** token.decimals()
+    gas_snapshot.record(
+        "harvest_deposit", refill_tx.gas_used, tx=refill_tx, router_approval="refill"
+    )
+    assert tx.gas_used < refill_tx.gas_used
+
+
+@pytest.mark.parametrize("idle_bps", [0, 100])
+@pytest.mark.parametrize("unstaked_bps", [0, 5_000])
+def test_gas_tend(
+    chain,
+    gov,
+    token,
+    vault,
+    strategy,
+    token_whale,
+    idle_bps,
+    unstaked_bps,
+    gas_snapshot,
+):
+    amount, _ = deposit_and_harvest(chain, token, vault, strategy, token_whale, 100_000)
+
+    if idle_bps > 0:
+        token.transfer(strategy, amount * idle_bps // 10_000, {"from": token_whale})
+    staked = strategy.balanceOfStakedLPToken()
+    if unstaked_bps > 0:
+        strategy.unstakeLP(staked * unstaked_bps // 10_000, {"from": gov})
+
+    tx = strategy.tend()
+    gas_snapshot.record(
+        "tend", tx.gas_used, tx=tx, idle_bps=idle_bps, unstaked_bps=unstaked_bps
+    )
+
+
+@pytest.mark.parametrize("withdraw_bps", [100, 2_500, 10_000])
+@pytest.mark.parametrize("unstaked_bps", [0, 5_000])
+def test_gas_withdraw(
+    chain,
+    gov,
+    token,
+    vault,
+    strategy,
+    token_whale,
+    withdraw_bps,
+    unstaked_bps,
+    gas_snapshot,
+):
+    deposit_and_harvest(chain, token, vault, strategy, token_whale, 100_000)
+
+    staked = strategy.balanceOfStakedLPToken()
+    if unstaked_bps > 0:
+        strategy.unstakeLP(staked * unstaked_bps // 10_000, {"from": gov})
+
+    shares = vault.balanceOf(token_whale) * withdraw_bps // 10_000
+    tx = vault.withdraw(shares, {"from": token_whale})
+    gas_snapshot.record(
+        "withdraw",
+        tx.gas_used,
+        tx=tx,
+        withdraw_bps=withdraw_bps,
+        unstaked_bps=unstaked_bps,
+    )
+
+
+def test_gas_clone(
+    strategy,
+    vault,
+    strategist,
+    rewards,
+    keeper,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    price_feed,
+    gas_snapshot,
+):
+    tx = strategy.clone(
+        vault,
+        strategist,
+        rewards,
+        keeper,
+        lp_staker,
+        liquidity_pool_id_in_lp_staking,
+        price_feed,
+        "ClonedStrategy",
+        {"from": strategist},
+    )
+    gas_snapshot.record("clone", tx.gas_used, tx=tx)
+
+
+@pytest.mark.parametrize("size", [0, 100_000])
+def test_gas_migrate(
+    chain,
+    gov,
+    token,
+    vault,
+    strategy,
+    Strategy,
+    strategist,
+    token_whale,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    price_feed,
+    size,
+    gas_snapshot,
+):
+    if size > 0:
+        deposit_and_harvest(chain, token, vault, strategy, token_whale, size)
+
+    new_strategy = strategist.deploy(
+        Strategy,
+        vault,
+        lp_staker,
+        liquidity_pool_id_in_lp_staking,
+        price_feed,
+        "StrategyStargateUSDC",
+    )
+    tx = vault.migrateStrategy(strategy, new_strategy, {"from": gov})
+    gas_snapshot.record("migrate", tx.gas_used, tx=tx, size=size)
+
+
+@pytest.mark.parametrize("batch_size", [1, 5, 10])
+def test_gas_clone_batch(
+    strategy,
+    vault,
+    strategist,
+    rewards,
+    keeper,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    price_feed,
+    StrategyFactory,
+    batch_size,
+    gas_snapshot,
+):
+    factory = strategist.deploy(StrategyFactory, strategy)
+    params = [
+        (
+            vault,
+            lp_staker,
+            liquidity_pool_id_in_lp_staking,
+            price_feed,
+            f"ClonedStrategy{i}",
+            f"0x{i + 1:064x}",
+        )
+        for i in range(batch_size)
+    ]
+    tx = factory.cloneMany(params, strategist, rewards, keeper, {"from": strategist})
+    # compare with `clone` to see what batching saves per strategy
+    gas_snapshot.record(
+        "clone_batch_per_clone",
+        tx.gas_used // batch_size,
+        tx=tx,
+        batch_size=batch_size,
+    )
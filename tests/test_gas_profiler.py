@@ -0,0 +1,70 @@
+from types import SimpleNamespace
+
+from scripts.gas_profiler import INTRINSIC, GasProfile, profile_trace, step_costs
+
+
+def step(depth, jump_depth, fn, op, gas, gas_cost):
+    return {
+        "depth": depth,
+        "jumpDepth": jump_depth,
+        "fn": fn,
+        "op": op,
+        "gas": gas,
+        "gasCost": gas_cost,
+    }
+
+
+# harvest -> _claimRewards -> LPStaking.deposit, the CALL forwards 800 and gets 297 back
+HARVEST_TRACE = [
+    step(0, 0, "Strategy.harvest", "PUSH1", 1000, 3),
+    step(0, 1, "Strategy._claimRewards", "JUMPDEST", 997, 1),
+    step(0, 1, "Strategy._claimRewards", "CALL", 996, 900),
+    step(1, 0, "MockLPStaking.deposit", "PUSH1", 800, 3),
+    step(1, 0, "MockLPStaking.deposit", "SSTORE", 797, 500),
+    step(1, 0, "MockLPStaking.deposit", "RETURN", 297, 0),
+    step(0, 1, "Strategy._claimRewards", "JUMP", 393, 8),
+    step(0, 0, "Strategy.harvest", "STOP", 385, 0),
+]
+
+
+def test_step_costs():
+    costs = step_costs(HARVEST_TRACE)
+    # the CALL is only charged what it did not forward to the callee
+    assert costs == [3, 1, 100, 3, 500, 0, 8, 0]
+
+
+def test_profile_trace():
+    stacks, calls = profile_trace(HARVEST_TRACE, gas_used=22_000)
+
+    claim = ("Strategy.harvest", "Strategy._claimRewards")
+    assert stacks[("Strategy.harvest",)] == 3
+    assert stacks[claim] == 109
+    assert stacks[claim + ("MockLPStaking.deposit",)] == 503
+    assert stacks[(INTRINSIC,)] == 22_000 - 615
+    assert sum(stacks.values()) == 22_000
+    assert calls["Strategy._claimRewards"] == 1
+
+
+def test_profile_aggregates():
+    profile = GasProfile()
+    tx = SimpleNamespace(trace=HARVEST_TRACE, gas_used=22_000)
+    profile.add(tx, root="harvest")
+    profile.add(tx, root="harvest")
+
+    assert profile.transactions == 2
+    assert profile.gas_used == 44_000
+    folded = profile.folded().splitlines()
+    assert (
+        "harvest;Strategy.harvest;Strategy._claimRewards;MockLPStaking.deposit 1006"
+        in folded
+    )
+    assert sum(int(line.rsplit(" ", 1)[1]) for line in folded) == 44_000
+
+    top = profile.top(3)
+    assert [row[0] for row in top] == [
+        INTRINSIC,
+        "MockLPStaking.deposit",
+        "Strategy._claimRewards",
+    ]
+    assert top[2] == ("Strategy._claimRewards", 2, 218, 1224)
+    assert "MockLPStaking.deposit" in profile.table()
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from scripts.harvest_simulator import PoolParams, gbm_price_paths, simulate
+
+
+def test_simulator_matches_closed_form():
+    # single staker, flat price, no gas: every STG emitted ends up as want
+    pool = PoolParams(stg_per_day=100, other_staked=0)
+    result = simulate([1, 2, 5], [1_000], [0], np.full((1, 10), 0.5), pool)
+
+    assert result.harvests.ravel().tolist() == [10, 5, 2]
+    gain = result.net_apr.ravel() * 10 / 365 * 1_000
+    assert np.allclose(gain, 100 * 10 * 0.5)
+
+
+def test_simulator_gas_and_cadence():
+    pool = PoolParams(stg_per_day=20_000, other_staked=100_000_000, slippage=0.003)
+    prices = gbm_price_paths(0.5, 90, n_paths=64, seed=1)
+    result = simulate([1, 7, 30], [1e5, 1e7], [0, 50, 200], prices, pool)
+    surface = result.surface()
+    assert surface.shape == (3, 2, 3)
+
+    # more expensive gas never helps
+    assert np.all(np.diff(surface, axis=-1) <= 0)
+    # small vaults should harvest less often than large ones when gas is expensive
+    best = result.best_intervals()
+    assert best[0, -1] >= best[1, -1]
+
+
+def test_simulator_against_strategy(
+    chain,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    stg_token,
+    trade_factory,
+    mock_swapper,
+    ymechs_safe,
+):
+    # a "day" is a fixed number of blocks on the local chain
+    blocks_per_day, days, interval = 100, 6, 2
+    pid = liquidity_pool_id_in_lp_staking
+    stg_per_block = (
+        lp_staker.stargatePerBlock()
+        * lp_staker.poolInfo(pid)["allocPoint"]
+        / lp_staker.totalAllocPoint()
+        / 1e18
+    )
+    stg_price = mock_swapper.rates(stg_token, token) / 10 ** token.decimals()
+
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest()
+
+    for day in range(days):
+        chain.mine(blocks_per_day)
+        if (day + 1) % interval:
+            continue
+        chain.sleep(1)
+        strategy.harvest()
+        amount_in = stg_token.balanceOf(strategy)
+        trade_factory.execute["tuple,address,bytes"](
+            [strategy, stg_token, token, amount_in, 0],
+            mock_swapper,
+            mock_swapper.swap.encode_input(stg_token, token, amount_in, strategy),
+            {"from": ymechs_safe},
+        )
+
+    # reported profit waits in the vault until the next harvest, so count both sides
+    strategy_debt = vault.strategies(strategy)["totalDebt"]
+    total_value = vault.totalAssets() + strategy.estimatedTotalAssets() - strategy_debt
+    gain = (total_value - amount) / 10 ** token.decimals()
+
+    # the strategy is the only staker, so it earns the whole pool emission
+    pool = PoolParams(stg_per_day=stg_per_block * blocks_per_day, other_staked=0)
+    tvl = amount / 10 ** token.decimals()
+    result = simulate([interval], [tvl], [0], np.full((1, days), stg_price), pool)
+    expected_gain = result.net_apr.item() * days / 365 * tvl
+
+    # harvests and trades mine a few extra blocks of emissions
+    assert gain == pytest.approx(expected_gain, rel=0.05)
@@ -0,0 +1,96 @@
+from brownie import web3
+
+from scripts.indexer import Indexer
+
+
+def test_indexer(
+    tmp_path,
+    chain,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    gov,
+    strategist,
+    rewards,
+    keeper,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    price_feed,
+):
+    start_block = chain.height + 1
+    indexer = Indexer(
+        web3,
+        tmp_path / "events.db",
+        [strategy],
+        vaults=[vault],
+        lp_stakers=[lp_staker],
+        start_block=start_block,
+        chunk_size=3,
+        confirmations=0,
+    )
+
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    first_harvest = strategy.harvest({"from": gov})
+    clone = strategy.clone(
+        vault,
+        strategist,
+        rewards,
+        keeper,
+        lp_staker,
+        liquidity_pool_id_in_lp_staking,
+        price_feed,
+        "ClonedStrategy",
+        {"from": strategist},
+    ).events["Cloned"]["clone"]
+
+    assert indexer.sync() > 0
+    assert indexer.checkpoint == chain.height
+    assert clone in indexer.strategies
+
+    harvested = list(indexer.events("Harvested", strategy))
+    assert len(harvested) == 1
+    assert harvested[0]["tx_hash"] == first_harvest.txid
+    assert (
+        harvested[0]["args"]["debtPayment"]
+        == first_harvest.events["Harvested"]["debtPayment"]
+    )
+    reported = list(indexer.events("StrategyReported", strategy))
+    assert reported[0]["args"]["debtAdded"] == amount
+    assert [e["args"]["amount"] for e in indexer.events("Deposit", strategy)] == [
+        first_harvest.events["Deposit"]["amount"]
+    ]
+    assert [e["strategy"] for e in indexer.events("Cloned")] == [clone]
+
+    # later runs only pick up new blocks
+    chain.sleep(1)
+    chain.mine(10)
+    second_harvest = strategy.harvest({"from": gov})
+    assert indexer.sync() == 3
+    # claiming STG deposits 0 LP, then the vault report and the harvest itself
+    assert [
+        e["event"] for e in indexer.events(from_block=second_harvest.block_number)
+    ] == [
+        "Deposit",
+        "StrategyReported",
+        "Harvested",
+    ]
+    assert indexer.sync() == 0
+
+    # a reorg replaces the last harvest with a plain transfer
+    checkpoint = indexer.checkpoint
+    chain.undo(1)
+    token.transfer(gov, 1, {"from": user})
+    assert chain.height == checkpoint
+    indexer.sync()
+    assert len(list(indexer.events("Harvested", strategy))) == 1
+    assert indexer.checkpoint == chain.height
+
+    # a fresh indexer on the same database resumes from the checkpoint
+    indexer.close()
+    resumed = Indexer(web3, tmp_path / "events.db", [], confirmations=0)
+    assert resumed.checkpoint == chain.height
+    assert resumed.sync() == 0
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+from brownie import Contract
+
+from scripts.keeper import Keeper
+
+
+def test_keeper_cycle(
+    chain,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    keeper,
+    strategist,
+    rewards,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    price_feed,
+    RELATIVE_APPROX,
+):
+    clone_tx = strategy.clone(
+        vault,
+        strategist,
+        rewards,
+        keeper,
+        lp_staker,
+        liquidity_pool_id_in_lp_staking,
+        price_feed,
+        "ClonedStrategy",
+        {"from": strategist},
+    )
+    idle_strategy = Contract.from_abi(
+        "Strategy", clone_tx.events["Cloned"]["clone"], strategy.abi
+    )
+
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    chain.mine(1)
+
+    with Keeper(
+        [strategy, idle_strategy], keeper, max_concurrency=4, gas_price=0
+    ) as bot:
+        report = asyncio.run(bot.run_cycle())
+        print(report.summary())
+
+        # only the strategy added to the vault has credit to deploy
+        assert report.harvested == [strategy.address]
+        assert [s.address for s in report.states] == [
+            strategy.address,
+            idle_strategy.address,
+        ]
+        assert all(s.error is None for s in report.states)
+        assert report.total_seconds > 0
+        assert (
+            pytest.approx(strategy.estimatedTotalAssets(), rel=RELATIVE_APPROX)
+            == amount
+        )
+
+        # nothing left to do on the next block
+        report = asyncio.run(bot.run_cycle())
+        assert report.harvested == []
+    assert bot._executor._shutdown
+
+
+def test_keeper_cycle_survives_failed_submit(
+    chain, token, vault, strategy, user, amount, keeper
+):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    # due by time alone, so the trigger fires whatever the call costs
+    chain.sleep(strategy.maxReportDelay() + 1)
+    chain.mine(1)
+
+    # the dry-run is a call and passes, the keeper cannot pay for the transaction
+    with Keeper([strategy], keeper, max_concurrency=4, gas_price=10 ** 30) as bot:
+        report = asyncio.run(bot.run_cycle())
+    print(report.summary())
+
+    assert report.harvested == []
+    assert report.failed == [strategy.address]
+    (state,) = report.states
+    assert state.dry_run_ok
+    assert state.error
+    assert strategy.estimatedTotalAssets() == 0
@@ -0,0 +1,30 @@
+import pytest
+
+from scripts.load_harness import LoadConfig, LoadHarness, compare_reports
+
+
+def test_load_harness(accounts, vault, strategy, token, stargate_stack, keeper):
+    if not stargate_stack:
+        pytest.skip("needs the local Stargate stand-ins")
+
+    config = LoadConfig(operations=150, depositors=20, seed=7, sample_every=10)
+    harness = LoadHarness(
+        vault, strategy, token, stargate_stack, keeper, config, accounts[0]
+    )
+    report = harness.run()
+
+    done = sum(stats["count"] for stats in report.gas.values())
+    reverted = sum(sum(reasons.values()) for reasons in report.reverts.values())
+    assert done + reverted + sum(report.skipped.values()) <= report.operations
+    assert report.gas["deposit"]["count"] > 0
+    assert report.gas["harvest"]["p50"] <= report.gas["harvest"]["p99"]
+    assert "harvest" not in report.reverts
+
+    # the mocks never lose want, the strategy is only ever short of its debt by LP
+    # rounding, at most a wei per operation
+    assert report.drift["min"] >= -config.operations
+    assert report.drift["samples"] >= config.operations // config.sample_every
+
+    # a report compared with itself shows no change
+    summary = compare_reports(report.to_dict(), report.to_dict())
+    assert "+0.00%" in summary
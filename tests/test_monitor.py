@@ -0,0 +1,81 @@
+from brownie import Contract, multicall
+
+from scripts.monitor import read_positions
+
+
+def test_strategy_state(chain, token, vault, strategy, user, amount, gov):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+    chain.mine(10)
+
+    state = strategy.strategyState()
+    assert state["looseWant"] == strategy.balanceOfWant()
+    assert state["unstakedLP"] == strategy.balanceOfUnstakedLPToken()
+    assert state["stakedLP"] == strategy.balanceOfStakedLPToken()
+    assert state["valueOfLP"] == strategy.valueOfLPTokens()
+    assert state["pendingSTG"] == strategy.pendingSTGRewards()
+    assert state["balanceOfSTG"] == strategy.balanceOfSTG()
+    assert state["estimatedTotalAssets"] == strategy.estimatedTotalAssets()
+    assert state["pendingSTG"] > 0
+
+
+def test_read_positions(
+    accounts,
+    chain,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    gov,
+    strategist,
+    rewards,
+    keeper,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    price_feed,
+):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    clones = []
+    for i in range(4):
+        tx = strategy.clone(
+            vault,
+            strategist,
+            rewards,
+            keeper,
+            lp_staker,
+            liquidity_pool_id_in_lp_staking,
+            price_feed,
+            f"ClonedStrategy{i}",
+            {"from": strategist},
+        )
+        clones.append(
+            Contract.from_abi("Strategy", tx.events["Cloned"]["clone"], strategy.abi)
+        )
+
+    # one Multicall2 for every batch, so they all see the same block
+    multicall_address = multicall.deploy({"from": accounts[0]}).address
+    block = chain.height
+    chain.mine(5)
+
+    strategies = [strategy] + clones
+    positions = read_positions(
+        strategies, block=block, batch_size=2, multicall_address=multicall_address
+    )
+
+    assert [p.address for p in positions] == [s.address for s in strategies]
+    assert all(p.block == block for p in positions)
+    for s, position in zip(strategies, positions):
+        state = s.strategyState(block_identifier=block)
+        assert position.estimated_total_assets == state["estimatedTotalAssets"]
+        assert position.pending_stg == state["pendingSTG"]
+        assert position.staked_lp == state["stakedLP"]
+
+    assert positions[0].estimated_total_assets > 0
+    assert all(p.estimated_total_assets == 0 for p in positions[1:])
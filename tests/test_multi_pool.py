@@ -0,0 +1,274 @@
+import brownie
+import pytest
+
+SECOND_POOL_ID = 3
+
+
+@pytest.fixture(scope="module")
+def second_usdc_pool(stargate_stack, MockStargatePool):
+    """A second Stargate pool for USDC, paying three times the STG of the first."""
+    if not stargate_stack:
+        pytest.skip("needs the local Stargate stand-ins")
+
+    deployer = stargate_stack.deployer
+    usdc, router, lp_staker = (
+        stargate_stack.usdc,
+        stargate_stack.router,
+        stargate_stack.lp_staker,
+    )
+    pool = deployer.deploy(
+        MockStargatePool, SECOND_POOL_ID, usdc, router, 6, "S*USDC2", "S*USDC2"
+    )
+    router.createPool(SECOND_POOL_ID, pool, {"from": deployer})
+    lp_staker.add(3_000, pool, {"from": deployer})
+
+    seed = 1_000_000 * 10 ** 6
+    usdc.mint(deployer, seed, {"from": deployer})
+    usdc.approve(router, seed, {"from": deployer})
+    router.addLiquidity(SECOND_POOL_ID, seed, deployer, {"from": deployer})
+    yield pool
+
+
+@pytest.fixture(scope="module")
+def second_pool_id_in_lp_staking(lp_staker, second_usdc_pool):
+    yield lp_staker.poolLength() - 1
+
+
+@pytest.fixture(scope="module")
+def multi_strategy(
+    strategist,
+    keeper,
+    vault,
+    StrategyMultiPool,
+    gov,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    second_pool_id_in_lp_staking,
+    price_feed,
+):
+    strategy = strategist.deploy(
+        StrategyMultiPool,
+        vault,
+        lp_staker,
+        [liquidity_pool_id_in_lp_staking, second_pool_id_in_lp_staking],
+        price_feed,
+        "StrategyStargateMultiUSDC",
+    )
+    strategy.setKeeper(keeper, {"from": gov})
+    vault.addStrategy(strategy, 10_000, 0, 2 ** 256 - 1, 1_000, {"from": gov})
+    yield strategy
+
+
+def deposit(token, vault, user, amount):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+
+
+def test_deposits_go_to_the_best_paying_pool(
+    chain, token, vault, multi_strategy, user, amount, RELATIVE_APPROX
+):
+    deposit(token, vault, user, amount)
+    chain.sleep(1)
+    multi_strategy.harvest()
+
+    assert multi_strategy.balanceOfAllLPToken(0) == 0
+    assert multi_strategy.balanceOfAllLPToken(1) > 0
+    assert (
+        pytest.approx(multi_strategy.estimatedTotalAssets(), rel=RELATIVE_APPROX)
+        == amount
+    )
+
+
+def test_one_harvest_claims_every_pool(
+    chain,
+    token,
+    vault,
+    multi_strategy,
+    user,
+    amount,
+    stargate_stack,
+    second_usdc_pool,
+    second_pool_id_in_lp_staking,
+    lp_staker,
+    RELATIVE_APPROX,
+):
+    deposit(token, vault, user, amount // 2)
+    chain.sleep(1)
+    multi_strategy.harvest()
+
+    # someone else stakes a lot in the second pool, the next deposit pays more in the first
+    deployer = stargate_stack.deployer
+    crowd = 100_000_000 * 10 ** 6
+    token.mint(deployer, crowd, {"from": deployer})
+    token.approve(stargate_stack.router, crowd, {"from": deployer})
+    stargate_stack.router.addLiquidity(
+        second_usdc_pool.poolId(), crowd, deployer, {"from": deployer}
+    )
+    lp = second_usdc_pool.balanceOf(deployer)
+    second_usdc_pool.approve(lp_staker, lp, {"from": deployer})
+    lp_staker.deposit(second_pool_id_in_lp_staking, lp, {"from": deployer})
+
+    deposit(token, vault, user, amount - amount // 2)
+    chain.sleep(1)
+    multi_strategy.harvest()
+    assert multi_strategy.balanceOfAllLPToken(0) > 0
+    assert multi_strategy.balanceOfAllLPToken(1) > 0
+
+    chain.mine(100)
+    pending = multi_strategy.pendingSTGRewards()
+    assert pending > 0
+    chain.sleep(1)
+    multi_strategy.harvest()
+
+    # the STG of both pools sits in the strategy, ready for a single sale
+    assert multi_strategy.pendingSTGRewards() == 0
+    assert multi_strategy.balanceOfSTG() >= pending
+    assert (
+        pytest.approx(multi_strategy.estimatedTotalAssets(), rel=RELATIVE_APPROX)
+        == amount
+    )
+
+    vault.withdraw({"from": user})
+    assert pytest.approx(token.balanceOf(user), rel=RELATIVE_APPROX) == amount
+    assert multi_strategy.estimatedTotalAssets() <= 10
+
+
+def test_small_withdrawals_are_paid_in_full(
+    chain, token, vault, multi_strategy, user, amount
+):
+    deposit(token, vault, user, amount)
+    chain.sleep(1)
+    multi_strategy.harvest()
+    assert multi_strategy.balanceOfWant() == 0
+
+    # the vault burns fewer shares than asked for when the strategy comes up short
+    for shares in (1, 333, 10 ** 6 + 7):
+        shares_before = vault.balanceOf(user)
+        want_before = token.balanceOf(user)
+        vault.withdraw(shares, user, 0, {"from": user})
+        assert shares_before - vault.balanceOf(user) == shares
+        assert token.balanceOf(user) > want_before
+
+
+def test_emergency_exit(
+    chain, token, vault, multi_strategy, user, amount, gov, RELATIVE_APPROX
+):
+    deposit(token, vault, user, amount)
+    chain.sleep(1)
+    multi_strategy.harvest()
+
+    multi_strategy.setEmergencyExit({"from": gov})
+    chain.sleep(1)
+    multi_strategy.harvest()
+
+    assert multi_strategy.estimatedTotalAssets() == 0
+    assert pytest.approx(token.balanceOf(vault), rel=RELATIVE_APPROX) == amount
+
+
+def test_pools(multi_strategy, gov, lp_staker, liquidity_pool_id_in_lp_staking):
+    assert multi_strategy.poolsLength() == 2
+
+    # the USDT pool does not hold want, and a pool can only be farmed once
+    with brownie.reverts("!want"):
+        multi_strategy.addPool(1, {"from": gov})
+    with brownie.reverts("!exists"):
+        multi_strategy.addPool(liquidity_pool_id_in_lp_staking, {"from": gov})
+
+    multi_strategy.removePool(0, {"from": gov})
+    assert multi_strategy.poolsLength() == 1
+    multi_strategy.addPool(liquidity_pool_id_in_lp_staking, {"from": gov})
+    assert (
+        multi_strategy.pools(1)["liquidityPoolIDInLPStaking"]
+        == liquidity_pool_id_in_lp_staking
+    )
+
+
+def test_clone(
+    multi_strategy,
+    vault,
+    strategist,
+    rewards,
+    keeper,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    second_pool_id_in_lp_staking,
+    price_feed,
+    StrategyMultiPool,
+):
+    pids = [liquidity_pool_id_in_lp_staking, second_pool_id_in_lp_staking]
+    args = (vault, strategist, rewards, keeper, lp_staker, pids, price_feed)
+    tx = multi_strategy.clone(*args, "ClonedMultiUSDC", {"from": strategist})
+    cloned = StrategyMultiPool.at(tx.events["Cloned"]["clone"])
+
+    assert cloned.name() == "ClonedMultiUSDC"
+    assert cloned.poolsLength() == 2
+    assert cloned.stargateRouter() == multi_strategy.stargateRouter()
+
+    # a clone is initialized once and cannot be cloned itself
+    with brownie.reverts():
+        cloned.initialize(*args, "Again", {"from": strategist})
+    with brownie.reverts():
+        cloned.clone(*args, "Again", {"from": strategist})
+
+
+def test_strategy_state_and_tend_trigger(
+    chain,
+    token,
+    token_whale,
+    vault,
+    multi_strategy,
+    user,
+    amount,
+    keeper,
+    management,
+    MockPriceFeed,
+):
+    deposit(token, vault, user, amount)
+    chain.sleep(1)
+    multi_strategy.harvest()
+
+    state = multi_strategy.strategyState()
+    assert state["looseWant"] == 0
+    assert state["stakedLP"] == sum(
+        multi_strategy.balanceOfAllLPToken(i) for i in (0, 1)
+    )
+    assert state["valueOfLP"] == sum(multi_strategy.valueOfLPTokens(i) for i in (0, 1))
+    assert state["estimatedTotalAssets"] == multi_strategy.estimatedTotalAssets()
+
+    stg_price_feed = management.deploy(MockPriceFeed, 8, 50_000_000)
+    want_price_feed = management.deploy(MockPriceFeed, 8, 100_000_000)
+    multi_strategy.setSTGPriceFeed(
+        stg_price_feed, want_price_feed, {"from": management}
+    )
+    assert not multi_strategy.tendTrigger(0)
+
+    # a donation is worth tending while the call is cheap enough
+    token.transfer(multi_strategy, amount // 100, {"from": token_whale})
+    assert multi_strategy.tendTrigger(0)
+    assert not multi_strategy.tendTrigger(10 ** 30)
+
+    multi_strategy.tend({"from": keeper})
+    assert multi_strategy.balanceOfWant() == 0
+    assert not multi_strategy.tendTrigger(0)
+
+
+def test_pending_redemption(
+    chain, token, vault, multi_strategy, user, amount, gov, second_usdc_pool
+):
+    deposit(token, vault, user, amount)
+    chain.sleep(1)
+    multi_strategy.harvest()
+    assert multi_strategy.balanceOfAllLPToken(1) > 0
+
+    # the vault asks half back, Stargate can only pay out a tenth of the deposit
+    pool = second_usdc_pool
+    pool.setDeltaCredit(amount // 10 // pool.convertRate(), {"from": gov})
+    vault.updateStrategyDebtRatio(multi_strategy, 5_000, {"from": gov})
+    owed = vault.debtOutstanding(multi_strategy)
+    chain.sleep(1)
+    tx = multi_strategy.harvest({"from": gov})
+
+    paid = tx.events["Harvested"]["debtPayment"]
+    assert 0 < paid < owed
+    assert tx.events["Harvested"]["loss"] == 0
+    assert multi_strategy.pendingRedemption() == owed - paid
@@ -53,6 +53,36 @@ def test_change_debt(
     assert pytest.approx(strategy.estimatedTotalAssets(), rel=RELATIVE_APPROX) == half
 
 
+def test_harvest_pays_debt_from_loose_want(
+    chain, gov, token, vault, strategy, user, amount, RELATIVE_APPROX
+):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest()
+
+    # part of the position sits as loose want when the debt is called back
+    lp = strategy.balanceOfStakedLPToken() * 3 // 10
+    strategy.unstakeLP(lp, {"from": gov})
+    strategy.withdrawFromLP(lp, {"from": gov})
+    loose = strategy.balanceOfWant()
+    assert loose > 0
+    vault.updateStrategyDebtRatio(strategy.address, 5_000, {"from": gov})
+    owed = vault.debtOutstanding(strategy)
+    assert owed > loose
+
+    # the loose want and what is redeemed on top of it both go to the vault
+    chain.sleep(1)
+    tx = strategy.harvest({"from": gov})
+    assert tx.events["Harvested"]["debtPayment"] == owed
+    assert strategy.pendingRedemption() == 0
+    assert strategy.balanceOfWant() < 10 ** token.decimals()
+    assert (
+        pytest.approx(strategy.estimatedTotalAssets(), rel=RELATIVE_APPROX)
+        == amount // 2
+    )
+
+
 def test_sweep(gov, vault, strategy, token, user, amount, weth, weth_amout):
     # Strategy want token doesn't work
     token.transfer(strategy, amount, {"from": user})
@@ -147,3 +177,262 @@ def test_losses(
         pytest.approx(token.balanceOf(user), rel=RELATIVE_APPROX)
         == user_balance_before - amount
     )
+
+
+@pytest.mark.parametrize("withdraw_bps", [100, 2_500, 10_000])
+def test_partial_withdraw(
+    chain,
+    gov,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    withdraw_bps,
+    strategist,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    price_feed,
+    StrategyFullExitWithdraw,
+    RELATIVE_APPROX,
+    gas_snapshot,
+):
+    # Deposit to the vault and harvest
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest()
+    staked_before = strategy.balanceOfStakedLPToken()
+    assert staked_before > 0
+
+    # withdraw only a slice of the shares, the rest of the position should stay staked
+    shares = vault.balanceOf(user) * withdraw_bps // 10_000
+    tx = vault.withdraw(shares, {"from": user})
+    gas_snapshot.record(
+        "withdraw_partial", tx.gas_used, tx=tx, withdraw_bps=withdraw_bps
+    )
+
+    withdrawn = amount * withdraw_bps // 10_000
+    assert pytest.approx(token.balanceOf(user), rel=RELATIVE_APPROX) == withdrawn
+    assert (
+        pytest.approx(strategy.balanceOfStakedLPToken(), rel=RELATIVE_APPROX, abs=100)
+        == staked_before * (10_000 - withdraw_bps) // 10_000
+    )
+    assert strategy.balanceOfUnstakedLPToken() == 0
+    # nothing should be left idle besides rounding dust
+    assert strategy.balanceOfWant() < 10 ** token.decimals()
+
+    # the same withdrawal from the same position through the path it replaced, which
+    # unstakes and redeems everything and then adds the surplus back
+    chain.undo()
+    full_exit = strategist.deploy(
+        StrategyFullExitWithdraw,
+        vault,
+        lp_staker,
+        liquidity_pool_id_in_lp_staking,
+        price_feed,
+        "StrategyStargateUSDC",
+    )
+    vault.migrateStrategy(strategy, full_exit, {"from": gov})
+    full_exit.tend({"from": gov})
+    assert full_exit.balanceOfStakedLPToken() == staked_before
+
+    full_exit_tx = vault.withdraw(shares, {"from": user})
+    gas_snapshot.record(
+        "withdraw_full_exit",
+        full_exit_tx.gas_used,
+        tx=full_exit_tx,
+        withdraw_bps=withdraw_bps,
+    )
+    assert pytest.approx(token.balanceOf(user), rel=RELATIVE_APPROX) == withdrawn
+    if withdraw_bps < 10_000:
+        assert tx.gas_used < full_exit_tx.gas_used
+
+
+def test_harvest_trigger_rewards(
+    chain,
+    gov,
+    management,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    price_feed,
+    stg_token,
+    stg_whale,
+    MockPriceFeed,
+):
+    # Deposit to the vault and harvest
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest()
+
+    strategy.setHarvestTriggerParams(0, 2 ** 255, 100, {"from": management})
+    call_cost = 300_000 * 50 * 10 ** 9  # a harvest at 50 gwei
+    # ignore LP rounding dust so only the rewards decide
+    strategy.setDebtThreshold(10 ** token.decimals(), {"from": gov})
+
+    # priced through the want/ETH feed, 0.015 ETH is worth a few dollars, not dust
+    cost_in_want = strategy.ethToWant(call_cost)
+    assert cost_in_want == (
+        call_cost
+        * 10 ** (price_feed.decimals() + token.decimals())
+        // price_feed.latestAnswer()
+        // 10 ** 18
+    )
+    assert 10 ** token.decimals() < cost_in_want < 10_000 * 10 ** token.decimals()
+
+    stg_token.transfer(strategy, 1_000 * 10 ** 18, {"from": stg_whale})
+    # without a STG price the rewards are not worth anything
+    assert strategy.stgToWant(10 ** 18) == 0
+    assert not strategy.harvestTrigger(call_cost)
+
+    # 1 STG = 0.5 USD and 1 want = 1 USD
+    stg_price_feed = management.deploy(MockPriceFeed, 8, 50_000_000)
+    want_price_feed = management.deploy(MockPriceFeed, 8, 100_000_000)
+    strategy.setSTGPriceFeed(stg_price_feed, want_price_feed, {"from": management})
+    assert strategy.stgToWant(10 ** 18) == 5 * 10 ** (token.decimals() - 1)
+    # STG is converted through the want price, not valued as if want were a dollar
+    want_price_feed.setAnswer(50_000_000, {"from": management})
+    assert strategy.stgToWant(10 ** 18) == 10 ** token.decimals()
+    want_price_feed.setAnswer(100_000_000, {"from": management})
+
+    # rewards have to beat 100 times the call, pending STG is dust next to this margin
+    stg_to_trigger = (
+        100 * cost_in_want * 10 ** 18 // strategy.stgToWant(10 ** 18)
+        - strategy.balanceOfSTG()
+    )
+    stg_token.transfer(strategy, stg_to_trigger * 9 // 10, {"from": stg_whale})
+    assert not strategy.harvestTrigger(call_cost)
+    stg_token.transfer(strategy, stg_to_trigger * 2 // 10, {"from": stg_whale})
+    assert strategy.harvestTrigger(call_cost)
+
+    # and we respect the minimum delay between harvests
+    tx = strategy.setHarvestTriggerParams(
+        3600 * 24, 2 ** 255, 100, {"from": management}
+    )
+    assert tx.events["UpdatedRewardsProfitFactor"]["rewardsProfitFactor"] == 100
+    assert not strategy.harvestTrigger(call_cost)
+
+
+def tend_emissions(chain, vault, strategy, lp_staker, pool, value):
+    """STG `value` more want staked would earn until the next harvest, as tendTrigger counts it."""
+    pid = strategy.liquidityPoolIDInLPStaking()
+    staked = lp_staker.lpBalances(pid)
+    pool_value = (pool.amountLPtoLD(staked) if staked else 0) + value
+    next_harvest = vault.strategies(strategy)["lastReport"] + strategy.maxReportDelay()
+    blocks = min(next_harvest - chain.time(), 30 * 24 * 3600) // 12
+    return (
+        lp_staker.stargatePerBlock()
+        * lp_staker.poolInfo(pid)["allocPoint"]
+        * blocks
+        // lp_staker.totalAllocPoint()
+        * value
+        // pool_value
+    )
+
+
+def test_tend_trigger(
+    chain,
+    gov,
+    management,
+    token,
+    token_whale,
+    vault,
+    strategy,
+    user,
+    amount,
+    lp_staker,
+    stargate_token_pool,
+    MockPriceFeed,
+):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest()
+
+    # 1 STG = 0.5 USD and 1 want = 1 USD
+    stg_price_feed = management.deploy(MockPriceFeed, 8, 50_000_000)
+    want_price_feed = management.deploy(MockPriceFeed, 8, 100_000_000)
+    strategy.setSTGPriceFeed(stg_price_feed, want_price_feed, {"from": management})
+    call_cost = 200_000 * 50 * 10 ** 9  # a tend at 50 gwei
+    cost_in_want = strategy.ethToWant(call_cost)
+    assert cost_in_want > 10 ** token.decimals()
+
+    # everything is staked
+    assert not strategy.tendTrigger(call_cost)
+
+    # a donation sits idle until it is deposited
+    idle = amount // 100
+    token.transfer(strategy, idle, {"from": token_whale})
+    emissions = strategy.stgToWant(
+        tend_emissions(chain, vault, strategy, lp_staker, stargate_token_pool, idle)
+    )
+    assert emissions > 0
+
+    # it is tended once its STG is worth more than the call, priced at half and twice the cost
+    stg_price = 50_000_000 * cost_in_want // emissions
+    stg_price_feed.setAnswer(stg_price // 2, {"from": management})
+    assert not strategy.tendTrigger(call_cost)
+    stg_price_feed.setAnswer(stg_price * 2, {"from": management})
+    assert strategy.tendTrigger(call_cost)
+
+    tx = strategy.tend()
+    assert tx.events["Deposit"]
+    assert strategy.balanceOfWant() == 0
+    assert strategy.balanceOfUnstakedLPToken() == 0
+    assert not strategy.tendTrigger(call_cost)
+
+    # stray LP earns nothing until it is staked again, and it is worth more than the donation
+    strategy.unstakeLP(strategy.balanceOfStakedLPToken(), {"from": gov})
+    assert strategy.tendTrigger(call_cost)
+
+    # with the next harvest due the harvest deploys it
+    chain.sleep(strategy.maxReportDelay() + 1)
+    chain.mine(1)
+    assert not strategy.tendTrigger(call_cost)
+
+    # in an emergency exit tend steps the exit while Stargate can pay some of it out
+    strategy.setEmergencyExit({"from": gov})
+    assert strategy.balanceOfAllLPToken() > 0
+    assert strategy.tendTrigger(call_cost)
+    strategy.tend()
+    assert strategy.balanceOfAllLPToken() == 0
+    assert strategy.pendingRedemption() == 0
+    assert not strategy.tendTrigger(call_cost)
+
+
+def test_router_allowance(
+    accounts,
+    gov,
+    local_stack,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    stargate_token_pool,
+):
+    router = strategy.stargateRouter()
+    assert token.allowance(strategy, router) == 2 ** 256 - 1
+
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    strategy.harvest()
+    # deposits spend the allowance without approving again
+    assert token.allowance(strategy, router) >= 2 ** 256 - 1 - amount
+
+    # nothing to do while the pool keeps its router
+    strategy.updateStargateRouter({"from": gov})
+    assert strategy.stargateRouter() == router
+
+    if not local_stack:
+        return
+    new_router = accounts[5]
+    stargate_token_pool.setRouter(new_router, {"from": gov})
+    strategy.updateStargateRouter({"from": gov})
+    assert strategy.stargateRouter() == new_router
+    assert token.allowance(strategy, router) == 0
+    assert token.allowance(strategy, new_router) == 2 ** 256 - 1
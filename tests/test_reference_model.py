@@ -0,0 +1,79 @@
+import pytest
+
+from differential import ChainHarness
+from scripts.reference_model import fuzz, random_operations
+
+DIFFERENTIAL_STEPS = 40
+
+
+def test_model_fuzz():
+    report = fuzz(500, steps=100, workers=1)
+    assert not report.failures, "\n".join(
+        f"seed {f.seed} step {f.failed_step} {f.failed_op}: {f.error}"
+        for f in report.failures
+    )
+
+
+def test_differential(
+    differential_seed,
+    stargate_stack,
+    vault,
+    strategy,
+    token,
+    stargate_token_pool,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    user,
+    gov,
+    keeper,
+):
+    if not stargate_stack:
+        pytest.skip("needs the local Stargate stand-ins")
+
+    harness = ChainHarness(
+        vault,
+        strategy,
+        token,
+        stargate_token_pool,
+        lp_staker,
+        liquidity_pool_id_in_lp_staking,
+        user,
+        gov,
+        keeper,
+        stargate_stack.deployer,
+    )
+    for step, op in enumerate(random_operations(differential_seed, DIFFERENTIAL_STEPS)):
+        harness.run(step, op)
+
+
+def test_harvest_with_loss_repays_what_is_left(
+    chain,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    gov,
+    stargate_token_pool,
+    stargate_stack,
+):
+    if not stargate_stack:
+        pytest.skip("needs the local Stargate stand-ins")
+
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    # the pool loses 10% of its liquidity, then the strategy is asked for all of its debt
+    pool = stargate_token_pool
+    pool.setTotalLiquidity(pool.totalLiquidity() * 9 // 10, {"from": gov})
+    vault.updateStrategyDebtRatio(strategy, 0, {"from": gov})
+    chain.sleep(1)
+    tx = strategy.harvest({"from": gov})
+
+    # the shortfall is reported once, and everything that is left goes back to the vault
+    assert tx.events["Harvested"]["loss"] == pytest.approx(amount // 10, abs=10)
+    assert vault.strategies(strategy)["totalDebt"] == 0
+    assert strategy.estimatedTotalAssets() <= 1
+    assert token.balanceOf(vault) == pytest.approx(amount * 9 // 10, abs=10)
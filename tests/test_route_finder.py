@@ -0,0 +1,202 @@
+import pytest
+
+from scripts.route_finder import RouteFinder, default_venues
+from scripts.yswaps import CurveHop, UniV2Hop, UniV3Hop
+
+GAS_PRICE = 50 * 10 ** 9
+USDC_PER_ETH = 3_000 * 10 ** 6
+
+
+class StandInPool:
+    """Constant product pool with known reserves, standing in for a pair or a Curve pool."""
+
+    def __init__(self, token_a, token_b, reserve_a, reserve_b, fee_bps):
+        self.reserves = {token_a: reserve_a, token_b: reserve_b}
+        self.fee_bps = fee_bps
+
+    def amount_out(self, token_in, token_out, amount_in):
+        amount_with_fee = amount_in * (10_000 - self.fee_bps)
+        return (
+            amount_with_fee
+            * self.reserves[token_out]
+            // (self.reserves[token_in] * 10_000 + amount_with_fee)
+        )
+
+
+class StandInVenue:
+    def __init__(self, kind, address, quoter=None):
+        self.kind = kind
+        self.address = address
+        self.quoter = quoter
+        # frozenset(tokens) -> [(pool or pair address, or v3 fee tier, StandInPool)]
+        self.pools = {}
+
+    def add(self, key, token_a, token_b, reserve_a, reserve_b, fee_bps):
+        pool = StandInPool(token_a, token_b, reserve_a, reserve_b, fee_bps)
+        self.pools.setdefault(frozenset((token_a, token_b)), []).append((key, pool))
+
+    def hops(self, token_a, token_b):
+        hops = []
+        for key, pool in self.pools.get(frozenset((token_a, token_b)), []):
+            if self.kind == "curve":
+                hops.append(CurveHop(self.address, token_a, token_b, 0, 1))
+            elif self.kind == "univ2":
+                hops.append(
+                    UniV2Hop(self.address, (token_a, token_b), (key,), pool.fee_bps)
+                )
+            else:
+                hops.append(
+                    UniV3Hop(self.address, self.quoter, (token_a, token_b), (key,))
+                )
+        return hops
+
+    def pool(self, token_a, token_b, key):
+        return dict(self.pools[frozenset((token_a, token_b))])[key]
+
+    def legs(self, hop):
+        if self.kind == "curve":
+            return [(hop.token_in, hop.token_out, hop.pool)]
+        keys = hop.pairs if self.kind == "univ2" else hop.fees
+        return list(zip(hop.path, hop.path[1:], keys))
+
+
+def stand_in_quote(venues):
+    by_address = {venue.address: venue for venue in venues}
+
+    def quote(requests, block=None):
+        quotes = []
+        for route, amount_in in requests:
+            amounts, amount = [], amount_in
+            for compiled in route.hops:
+                hop = compiled.hop
+                venue = by_address[
+                    hop.pool if isinstance(hop, CurveHop) else hop.router
+                ]
+                for token_in, token_out, key in venue.legs(hop):
+                    amount = venue.pool(token_in, token_out, key).amount_out(
+                        token_in, token_out, amount
+                    )
+                amounts.append(amount)
+            quotes.append(amounts)
+        return quotes
+
+    return quote
+
+
+def make_finder(accounts, curve_stg, curve_usdc):
+    stg, weth, usdc, curve, univ2, univ3, quoter, pair1, pair2 = [
+        a.address for a in accounts[:9]
+    ]
+    curve_venue = StandInVenue("curve", curve)
+    curve_venue.add(curve, stg, usdc, curve_stg, curve_usdc, 60)
+    univ2_venue = StandInVenue("univ2", univ2)
+    univ2_venue.add(pair1, stg, weth, 2 * 10 ** 27, 333_333 * 10 ** 18, 30)
+    univ2_venue.add(pair2, weth, usdc, 333_333 * 10 ** 18, 10 ** 15, 30)
+    univ3_venue = StandInVenue("univ3", univ3, quoter)
+    univ3_venue.add(500, weth, usdc, 333_333 * 10 ** 18, 10 ** 15, 5)
+    univ3_venue.add(3000, weth, usdc, 3_333 * 10 ** 18, 10 ** 13, 30)
+
+    venues = [curve_venue, univ2_venue, univ3_venue]
+    finder = RouteFinder(stg, usdc, venues, [weth], quote=stand_in_quote(venues))
+    return finder, stg, weth, usdc
+
+
+def test_candidates(accounts):
+    finder, stg, weth, usdc = make_finder(accounts, 2 * 10 ** 27, 10 ** 15)
+
+    candidates = finder.candidates()
+    # curve direct, and STG -> WETH on uni v2 followed by uni v2 or one of two v3 tiers
+    assert len(candidates) == 4
+    # the two uni v2 legs go through the router in a single call
+    merged = [c for c in candidates if len(c) == 1 and isinstance(c[0], UniV2Hop)]
+    assert merged[0][0].path == (stg, weth, usdc)
+    assert sorted(c[1].fees for c in candidates if len(c) == 2) == [(500,), (3000,)]
+
+
+def test_best_route_net_of_gas(accounts):
+    # both routes are deep, curve charges more but takes a single swap
+    finder, stg, weth, usdc = make_finder(accounts, 2 * 10 ** 27, 10 ** 15)
+    amount_in = 1_000 * 10 ** 18
+
+    gross = finder.best(amount_in)
+    assert [type(h.hop) for h in gross.route.hops] == [UniV2Hop, UniV3Hop]
+    assert gross.route.hops[1].hop.fees == (500,)
+
+    net = finder.best(amount_in, gas_price=GAS_PRICE, out_per_eth=USDC_PER_ETH)
+    assert [type(h.hop) for h in net.route.hops] == [CurveHop]
+    assert net.amount_out < gross.amount_out
+    assert net.gas < gross.gas
+
+    ranked = finder.rank(amount_in, gas_price=GAS_PRICE, out_per_eth=USDC_PER_ETH)
+    assert [q.net_out for q in ranked] == sorted(
+        (q.net_out for q in ranked), reverse=True
+    )
+
+
+def test_best_route_for_large_trades(accounts):
+    # curve only holds $100k, a $50k sale moves its price too much
+    finder, stg, weth, usdc = make_finder(
+        accounts, 200_000 * 10 ** 18, 100_000 * 10 ** 6
+    )
+    small = finder.best(100 * 10 ** 18, gas_price=GAS_PRICE, out_per_eth=USDC_PER_ETH)
+    large = finder.best(
+        100_000 * 10 ** 18, gas_price=GAS_PRICE, out_per_eth=USDC_PER_ETH
+    )
+
+    assert [type(h.hop) for h in small.route.hops] == [CurveHop]
+    assert [type(h.hop) for h in large.route.hops] == [UniV2Hop, UniV3Hop]
+
+
+def test_best_route_payload(accounts):
+    finder, stg, weth, usdc = make_finder(accounts, 2 * 10 ** 27, 10 ** 15)
+    best = finder.best(1_000 * 10 ** 18)
+    receiver, swapper = accounts[9], accounts[8]
+
+    payload, min_out = best.build(receiver, swapper, slippage_bps=100)
+    assert payload[0] == 5
+    assert best.amount_out * 98 // 100 <= min_out <= best.amount_out * 99 // 100
+
+
+def test_best_route_execution(
+    chain,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    stg_token,
+    stg_whale,
+    curve_pool,
+    univ2_router,
+    sushiswap_router,
+    univ3_swapper,
+    multicall_swapper,
+    weth,
+    ymechs_safe,
+    trade_factory,
+):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest()
+
+    stg_token.transfer(strategy, 1_000 * 10 ** 18, {"from": stg_whale})
+    amount_in = stg_token.balanceOf(strategy)
+
+    venues = default_venues(curve_pool, univ2_router, sushiswap_router, univ3_swapper)
+    finder = RouteFinder(stg_token, token, venues, [weth])
+    ranked = finder.rank(amount_in)
+    assert len(ranked) > 1
+    best = ranked[0]
+    payload, min_out = best.build(strategy, multicall_swapper)
+
+    before = token.balanceOf(strategy)
+    trade_factory.execute["tuple,address,bytes"](
+        [strategy, stg_token, token, amount_in, min_out],
+        multicall_swapper.address,
+        payload,
+        {"from": ymechs_safe},
+    )
+    received = token.balanceOf(strategy) - before
+    assert received >= min_out
+    assert received == pytest.approx(best.amount_out, rel=1e-3)
@@ -0,0 +1,140 @@
+from brownie import Contract, reverts, web3
+from eth_abi import encode_abi
+from eth_abi.packed import encode_abi_packed
+
+from scripts.settlement import batch_from_quote, read_balances, settle
+from scripts.yswaps import CurveHop, compile_route, pro_rata
+
+
+def test_pro_rata():
+    assert pro_rata(100, [1, 1, 1]) == [34, 33, 33]
+    assert pro_rata(10, [3, 7]) == [3, 7]
+    # the wei left over go to the largest remainders
+    assert pro_rata(1_000, [1, 2, 4]) == [143, 286, 571]
+    assert sum(pro_rata(987_654_321, [5, 11, 13, 17])) == 987_654_321
+
+
+def test_batch_accounting():
+    balances = [("a", 1_000 * 10 ** 18), ("b", 3_000 * 10 ** 18), ("c", 10 ** 18)]
+    # 4001 STG quoted at 2000.5 USDC, 2% slippage
+    batch = batch_from_quote("stg", "usdc", balances, [2_000_500_000], slippage_bps=200)
+
+    assert batch.amount_in == 4_001 * 10 ** 18
+    assert batch.min_out == 2_000_500_000 * 98 // 100
+    assert [share.quoted_out for share in batch.shares] == [
+        500_000_000,
+        1_500_000_000,
+        500_000,
+    ]
+    assert [share.min_out for share in batch.shares] == [
+        490_000_000,
+        1_470_000_000,
+        490_000,
+    ]
+    assert batch.trades()[1] == ["b", "stg", "usdc", 3_000 * 10 ** 18, 1_470_000_000]
+
+    assert batch.check([500_000_000, 1_500_000_000, 500_000]) == []
+    problems = batch.check([480_000_000, 1_520_000_000, 500_000])
+    assert len(problems) == 3
+    assert "below its min out" in problems[0]
+
+
+def test_payouts_payload(accounts):
+    stg, usdc, pool, swapper, first, second = [a.address for a in accounts[:6]]
+    route = compile_route(stg, usdc, [CurveHop(pool, stg, usdc, 0, 1)])
+    batch = batch_from_quote(
+        stg, usdc, [(first, 1_000), (second, 3_000)], [2_000], route=route
+    )
+
+    def call(to, signature, types, values):
+        data = web3.keccak(text=signature)[:4] + encode_abi(types, values)
+        return [to, len(data), data]
+
+    transfer = ("transfer(address,uint256)", ["address", "uint256"])
+    calls = [
+        call(stg, "approve(address,uint256)", ["address", "uint256"], [pool, 4_000]),
+        call(
+            pool,
+            "exchange(uint256,uint256,uint256,uint256)",
+            ["uint256"] * 4,
+            [0, 1, 4_000, 1_960],
+        ),
+        # the whole sale's min out goes back 1:3
+        call(usdc, *transfer, [first, 490]),
+        call(usdc, *transfer, [second, 1_470]),
+    ]
+    types = ["uint8"] + ["address", "uint256", "bytes"] * len(calls)
+    values = [5] + [v for c in calls for v in c]
+    assert batch.payload(swapper) == encode_abi_packed(types, values)
+
+
+def test_settle_many_strategies(
+    strategy,
+    strategist,
+    rewards,
+    keeper,
+    vault,
+    gov,
+    lp_staker,
+    liquidity_pool_id_in_lp_staking,
+    price_feed,
+    token,
+    stg_token,
+    stg_whale,
+    trade_factory,
+    mock_swapper,
+    ymechs_safe,
+):
+    strategies = [strategy]
+    for i in range(2):
+        tx = strategy.clone(
+            vault,
+            strategist,
+            rewards,
+            keeper,
+            lp_staker,
+            liquidity_pool_id_in_lp_staking,
+            price_feed,
+            f"ClonedStrategy{i}",
+            {"from": strategist},
+        )
+        clone = Contract.from_abi(
+            "Strategy", tx.events["Cloned"]["clone"], strategy.abi
+        )
+        trade_factory.grantRole(trade_factory.STRATEGY(), clone, {"from": ymechs_safe})
+        clone.setTradeFactory(trade_factory, {"from": gov})
+        strategies.append(clone)
+
+    for clone, stg in zip(strategies, (1_000, 3_000, 7)):
+        stg_token.transfer(clone, stg * 10 ** 18, {"from": stg_whale})
+
+    balances = [(address, balance) for address, _, balance in read_balances(strategies)]
+    # the mock swapper pays 0.5 USDC per STG
+    amount_in = sum(balance for _, balance in balances)
+    batch = batch_from_quote(
+        stg_token, token, balances, [amount_in * 5 * 10 ** 5 // 10 ** 18]
+    )
+    payload = mock_swapper.swapAndDistribute.encode_input(
+        stg_token,
+        token,
+        batch.amount_in,
+        [share.strategy for share in batch.shares],
+        [share.min_out for share in batch.shares],
+    )
+
+    received = settle(batch, trade_factory, mock_swapper, ymechs_safe, payload)
+    assert received == [share.min_out for share in batch.shares]
+    assert batch.check(received) == []
+    for clone in strategies:
+        assert stg_token.balanceOf(clone) == 0
+
+    # every strategy is held to its own min out
+    stg_token.transfer(strategy, 10 ** 18, {"from": stg_whale})
+    batch = batch_from_quote(
+        stg_token, token, [(strategy.address, 10 ** 18)], [5 * 10 ** 5]
+    )
+    payload = mock_swapper.swapAndDistribute.encode_input(
+        stg_token, token, 10 ** 18, [strategy], [batch.shares[0].min_out - 1]
+    )
+    with reverts("!minAmountOut"):
+        settle(batch, trade_factory, mock_swapper, ymechs_safe, payload)
@@ -1,6 +1,7 @@
 # TODO: Add tests that show proper operation of this strategy through "emergencyExit"
 #       Make sure to demonstrate the "worst case losses" as well as the time it takes
 
+import brownie
 from brownie import ZERO_ADDRESS
 import pytest
 
@@ -68,3 +69,83 @@ def test_basic_shutdown(
         pytest.approx(token.balanceOf(vault), rel=RELATIVE_APPROX) == amount
     )  ## The vault has all funds
     ## NOTE: May want to tweak this based on potential loss during migration
+
+
+def test_withdraw_with_limited_liquidity(
+    chain,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    gov,
+    stargate_token_pool,
+    stargate_stack,
+):
+    if not stargate_stack:
+        pytest.skip("needs the local Stargate stand-ins")
+
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    # Stargate can only pay out a quarter of the deposit right now
+    pool = stargate_token_pool
+    pool.setDeltaCredit(amount // 4 // pool.convertRate(), {"from": gov})
+    price_per_share = vault.pricePerShare()
+    vault.withdraw({"from": user})
+
+    # the user is paid what could be redeemed and keeps the shares for the rest
+    assert token.balanceOf(user) == pytest.approx(amount // 4, rel=1e-6)
+    assert vault.balanceOf(user) == pytest.approx(amount * 3 // 4, rel=1e-6)
+    assert vault.strategies(strategy)["totalLoss"] == 0
+    assert vault.pricePerShare() >= price_per_share
+
+
+def test_emergency_exit_with_limited_liquidity(
+    chain,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    gov,
+    stargate_token_pool,
+    stargate_stack,
+):
+    if not stargate_stack:
+        pytest.skip("needs the local Stargate stand-ins")
+
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest({"from": gov})
+
+    pool = stargate_token_pool
+    pool.setDeltaCredit(amount // 3 // pool.convertRate(), {"from": gov})
+    strategy.setEmergencyExit({"from": gov})
+
+    # the exit harvest would book what Stargate cannot pay out as a loss
+    with brownie.reverts("!liquidity"):
+        strategy.harvest({"from": gov})
+
+    # tend redeems what is available and leaves the rest staked
+    assert strategy.tendTrigger(0)
+    strategy.tend({"from": gov})
+    assert token.balanceOf(strategy) == pytest.approx(amount // 3, rel=1e-6)
+    assert strategy.pendingRedemption() == pytest.approx(amount - amount // 3, rel=1e-6)
+    assert strategy.balanceOfStakedLPToken() > 0
+    assert not strategy.tendTrigger(0)
+
+    # once liquidity comes back the exit completes without a loss
+    pool.setDeltaCredit(pool.totalLiquidity(), {"from": gov})
+    assert strategy.tendTrigger(0)
+    strategy.tend({"from": gov})
+    assert strategy.pendingRedemption() == 0
+    assert strategy.balanceOfAllLPToken() == 0
+
+    chain.sleep(1)
+    tx = strategy.harvest({"from": gov})
+    assert tx.events["Harvested"]["loss"] <= 10
+    assert token.balanceOf(vault) == pytest.approx(amount, rel=1e-6)
@@ -0,0 +1,139 @@
+import numpy as np
+import pytest
+
+from scripts.trade_splitter import (
+    ConstantProductPool,
+    CryptoSwapPool,
+    StableSwapPool,
+    Venue,
+    build_tranche,
+    crypto_pool_from_chain,
+    plan,
+    split,
+)
+from scripts.yswaps import compile_route, curve_hop
+
+
+def crypto_pool():
+    # 10M STG against 5M USDC, parameters close to the mainnet STG/USDC pool
+    return CryptoSwapPool([10e6, 5e6], 2.0, 400_000, 2.8e-4, 0.0026, 0.0045, 2.3e-4)
+
+
+def test_pool_models():
+    sizes = np.array([1.0, 1e3, 1e5, 1e6, 5e6])
+
+    # small trades pay the fee, larger ones move the price further
+    out = crypto_pool().amount_out(sizes)
+    assert out[0] == pytest.approx(0.5 * (1 - 0.0026), rel=1e-6)
+    assert np.all(np.diff(out / sizes) < 0)
+
+    stable = StableSwapPool([1e6, 1e6], 200, 0.0004).amount_out(sizes)
+    assert stable[2] / sizes[2] > 0.999 - 0.0004
+    # nobody gets more than the pool holds
+    assert stable[-1] < 1e6
+
+    cp = ConstantProductPool(1e6, 5e5).amount_out(sizes)
+    assert cp[1] == pytest.approx(1e3 * 0.997 * 5e5 / (1e6 + 1e3 * 0.997))
+
+
+def test_split_across_venues():
+    a = Venue("a", [ConstantProductPool(1e6, 5e5)], gas_cost=10)
+    b = Venue("b", [ConstantProductPool(1e6, 5e5)], gas_cost=10)
+
+    allocations = split([a, b], 2e5)
+    assert [x.amount_in for x in allocations] == [1e5, 1e5]
+    whole = a.amount_out(2e5)
+    assert sum(x.expected_out for x in allocations) - 20 > whole - 10
+
+    # a small sale is not worth paying gas twice
+    assert [x.venue for x in split([a, b], 1e3)] == [a]
+
+
+def test_split_matches_brute_force():
+    venues = [
+        Venue("curve", [crypto_pool()], gas_cost=30),
+        Venue("uni", [ConstantProductPool(4e6, 2e6)], gas_cost=20),
+        Venue("sushi", [ConstantProductPool(2e6, 1e6, 0.0025)], gas_cost=20),
+    ]
+    amount, steps = 1.5e6, 60
+    allocations = split(venues, amount, steps)
+    net = sum(x.expected_out - x.venue.gas_cost for x in allocations)
+
+    best = -np.inf
+    for i in range(steps + 1):
+        for j in range(steps + 1 - i):
+            k = steps - i - j
+            counts = [i, j, k]
+            best = max(
+                best,
+                sum(
+                    float(v.amount_out(c * amount / steps)) - v.gas_cost
+                    for v, c in zip(venues, counts)
+                    if c
+                ),
+            )
+    assert net == pytest.approx(best, rel=1e-9)
+
+
+def test_plan_tranches():
+    curve = Venue("curve", [crypto_pool()], gas_cost=20)
+    uni = Venue("uni", [ConstantProductPool(4e6, 2e6)], gas_cost=20)
+    amount = 2e6
+
+    cheap = plan([curve, uni], amount, max_tranches=8, blocks_between=50)
+    assert len(cheap.tranches) > 1
+    assert [t.block_offset for t in cheap.tranches][:2] == [0, 50]
+    assert sum(t.amount_in for t in cheap.tranches) == pytest.approx(amount)
+    single = plan([curve, uni], amount, max_tranches=1)
+    assert cheap.net_out > single.net_out
+    assert single.net_out > curve.amount_out(amount) - curve.gas_cost
+
+    # when gas costs more than spreading the sale saves, sell at once
+    curve.gas_cost = uni.gas_cost = 200_000
+    assert len(plan([curve, uni], amount, max_tranches=8).tranches) == 1
+
+
+def test_crypto_model_matches_curve(curve_pool):
+    model = crypto_pool_from_chain(curve_pool, 0, 1)
+    for stg in (10, 10_000, 1_000_000):
+        on_chain = curve_pool.get_dy(0, 1, stg * 10 ** 18) / 10 ** 6
+        assert model.amount_out(stg) == pytest.approx(on_chain, rel=1e-3)
+
+
+def test_execute_tranche(
+    chain,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    stg_token,
+    stg_whale,
+    curve_pool,
+    multicall_swapper,
+    ymechs_safe,
+    trade_factory,
+):
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest()
+    stg_token.transfer(strategy, 100_000 * 10 ** 18, {"from": stg_whale})
+
+    route = compile_route(stg_token, token, [curve_hop(curve_pool, 0, 1)])
+    venue = Venue("curve", [crypto_pool_from_chain(curve_pool, 0, 1)], route=route)
+    sale = plan([venue], 100_000, max_tranches=4, blocks_between=1)
+    tranche = sale.tranches[0]
+
+    payload, amount_in, min_out = build_tranche(
+        tranche, 18, strategy, multicall_swapper
+    )
+    before = token.balanceOf(strategy)
+    trade_factory.execute["tuple,address,bytes"](
+        [strategy, stg_token, token, amount_in, min_out],
+        multicall_swapper.address,
+        payload,
+        {"from": ymechs_safe},
+    )
+    received = (token.balanceOf(strategy) - before) / 10 ** 6
+    assert received == pytest.approx(tranche.expected_out, rel=1e-3)
@@ -1,10 +1,9 @@
-from brownie import Contract, Wei
-import brownie
-from eth_abi import encode_single, encode_abi
-from brownie.convert import to_bytes
+from brownie import ZERO_ADDRESS, web3
+from eth_abi import encode_abi
 from eth_abi.packed import encode_abi_packed
 import pytest
-import eth_utils
+
+from scripts.yswaps import CurveHop, UniV2Hop, compile_route, curve_hop, univ2_hop
 
 
 def test_profitable_harvest_curve(
@@ -44,62 +43,24 @@ def test_profitable_harvest_curve(
     token_out = token
 
     print(f"Executing trade...")
-    receiver = strategy.address
     amount_in = token_in.balanceOf(strategy)
 
-    asyncTradeExecutionDetails = [strategy, token_in, token_out, amount_in, 1]
-
-    # always start with optimizations. 5 is CallOnlyNoValue
-    optimizations = [["uint8"], [5]]
-    a = optimizations[0]
-    b = optimizations[1]
-
-    calldata = token_in.approve.encode_input(curve_pool, amount_in)
-    t = createTx(token_in, calldata)
-    a = a + t[0]
-    b = b + t[1]
-
-    expected_out = (curve_pool.get_dy(0, 1, amount_in) * 9_800) / 10_000
-
-    calldata = curve_pool.exchange.encode_input(0, 1, amount_in, expected_out)
-    t = createTx(curve_pool, calldata)
-    a = a + t[0]
-    b = b + t[1]
-
+    hops = [curve_hop(curve_pool, 0, 1)]
     if usdc != token_out:
-        path = [usdc.address, weth.address, token_out.address]
-
-        calldata = usdc.approve.encode_input(univ2_router, expected_out)
-        t = createTx(token_in, calldata)
-        a = a + t[0]
-        b = b + t[1]
-
-        calldata = univ2_router.swapExactTokensForTokens.encode_input(
-            amount_in, 0, path, multicall_swapper, 2 ** 256 - 1
-        )
-        t = createTx(univ2_router, calldata)
-        a = a + t[0]
-        b = b + t[1]
-
-        expected_out = univ2_router.getAmountsOut(amount_in, path)[2]
-
-    calldata = token_out.transfer.encode_input(receiver, expected_out)
-    t = createTx(token_out, calldata)
-    a = a + t[0]
-    b = b + t[1]
-
-    transaction = encode_abi_packed(a, b)
+        hops.append(univ2_hop(univ2_router, [usdc, weth, token_out]))
+    route = compile_route(token_in, token_out, hops)
+    transaction, min_out = route.build(
+        amount_in, strategy, multicall_swapper, slippage_bps=200
+    )
 
     # min out must be at least 1 to ensure that the tx works correctly
-    # trade_factory.execute["uint256, address, uint, bytes"](
-    #    multicall_swapper.address, 1, transaction, {"from": ymechs_safe}
-    # )
     trade_factory.execute["tuple,address,bytes"](
-        asyncTradeExecutionDetails,
+        [strategy, token_in, token_out, amount_in, 1],
         multicall_swapper.address,
         transaction,
         {"from": ymechs_safe},
     )
+    assert token_out.balanceOf(strategy) >= min_out
     print(token_out.balanceOf(strategy))
 
     tx = strategy.harvest({"from": strategist})
@@ -119,9 +80,91 @@ def test_profitable_harvest_curve(
     assert stg_token.balanceOf(strategy) < 1e18  # dust is OK
 
 
-def createTx(to, data):
-    inBytes = eth_utils.to_bytes(hexstr=data)
-    return [["address", "uint256", "bytes"], [to.address, len(inBytes), inBytes]]
+def test_profitable_harvest_mock_swapper(
+    chain,
+    token,
+    vault,
+    strategy,
+    user,
+    strategist,
+    amount,
+    RELATIVE_APPROX,
+    stg_token,
+    stg_whale,
+    mock_swapper,
+    trade_factory,
+    ymechs_safe,
+):
+    # Deposit to the vault
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+
+    # Harvest 1: Send funds through the strategy
+    chain.sleep(1)
+    strategy.harvest()
+    assert pytest.approx(strategy.estimatedTotalAssets(), rel=RELATIVE_APPROX) == amount
+
+    stg_token.transfer(strategy, 1_000 * 10 ** 18, {"from": stg_whale})
+    amount_in = stg_token.balanceOf(strategy)
+
+    calldata = mock_swapper.swap.encode_input(stg_token, token, amount_in, strategy)
+    trade_factory.execute["tuple,address,bytes"](
+        [strategy, stg_token, token, amount_in, 1],
+        mock_swapper,
+        calldata,
+        {"from": ymechs_safe},
+    )
+    assert stg_token.balanceOf(strategy) == 0
+
+    chain.sleep(1)
+    tx = strategy.harvest({"from": strategist})
+    assert tx.events["Harvested"]["profit"] > 0
+
+
+def test_route_payload(accounts):
+    stg, usdc, weth, usdt, pool, router, pair1, pair2, swapper, receiver = [
+        a.address for a in accounts[:10]
+    ]
+    hops = [
+        CurveHop(pool, stg, usdc, 0, 1),
+        UniV2Hop(router, (usdc, weth, usdt), pairs=(pair1, pair2)),
+    ]
+    route = compile_route(stg, usdt, hops)
+    assert compile_route(stg, usdt, hops) is route
+
+    payload, min_out = route.build(
+        2_000, receiver, swapper, slippage_bps=200, quotes=[1_000, 900]
+    )
+    # 2% off each quote, the second one scaled down to the 980 USDC the first guarantees
+    assert min_out == 864
+
+    def call(to, signature, types, values):
+        data = web3.keccak(text=signature)[:4] + encode_abi(types, values)
+        return [to, len(data), data]
+
+    calls = [
+        call(stg, "approve(address,uint256)", ["address", "uint256"], [pool, 2_000]),
+        call(
+            pool,
+            "exchange(uint256,uint256,uint256,uint256)",
+            ["uint256"] * 4,
+            [0, 1, 2_000, 980],
+        ),
+        # the second hop spends USDC, so that is the token approved
+        call(usdc, "approve(address,uint256)", ["address", "uint256"], [router, 980]),
+        call(
+            router,
+            "swapExactTokensForTokens(uint256,uint256,address[],address,uint256)",
+            ["uint256", "uint256", "address[]", "address", "uint256"],
+            [980, 864, [usdc, weth, usdt], swapper, 2 ** 256 - 1],
+        ),
+        call(
+            usdt, "transfer(address,uint256)", ["address", "uint256"], [receiver, 864]
+        ),
+    ]
+    types = ["uint8"] + ["address", "uint256", "bytes"] * len(calls)
+    values = [5] + [v for c in calls for v in c]
+    assert payload == encode_abi_packed(types, values)
 
 
 def test_remove_trade_factory(strategy, gov, trade_factory, stg_token):
@@ -132,3 +175,57 @@ def test_remove_trade_factory(strategy, gov, trade_factory, stg_token):
 
     assert strategy.tradeFactory() != trade_factory.address
     assert stg_token.allowance(strategy.address, trade_factory.address) == 0
+
+
+def test_compound_in_harvest(
+    chain,
+    token,
+    vault,
+    strategy,
+    user,
+    amount,
+    gov,
+    management,
+    stg_token,
+    stg_whale,
+    stargate_stack,
+    MockUniswapV2Router,
+    MockPriceFeed,
+):
+    if not stargate_stack:
+        pytest.skip("needs the local Stargate stand-ins")
+
+    # 1 STG = 0.5 USDC on the router and on the oracle
+    router = stargate_stack.deployer.deploy(MockUniswapV2Router)
+    router.setRate(stg_token, token, 5 * 10 ** 5, {"from": gov})
+    stg_price_feed = management.deploy(MockPriceFeed, 8, 50_000_000)
+    want_price_feed = management.deploy(MockPriceFeed, 8, 100_000_000)
+    strategy.setSTGPriceFeed(stg_price_feed, want_price_feed, {"from": management})
+    strategy.setCompounding(router, [stg_token, token], 100, {"from": gov})
+    assert strategy.compounding()
+
+    token.approve(vault.address, amount, {"from": user})
+    vault.deposit(amount, {"from": user})
+    chain.sleep(1)
+    strategy.harvest()
+
+    # the STG is sold, reported and redeposited by the same harvest
+    stg_token.transfer(strategy, 1_000 * 10 ** 18, {"from": stg_whale})
+    chain.sleep(1)
+    tx = strategy.harvest()
+    assert tx.events["Harvested"]["profit"] >= 500 * 10 ** 6
+    assert stg_token.balanceOf(strategy) == 0
+    assert token.balanceOf(strategy) == 0
+
+    # a fill far below the oracle is skipped, the harvest still goes through
+    router.setRate(stg_token, token, 10 ** 5, {"from": gov})
+    stg_token.transfer(strategy, 1_000 * 10 ** 18, {"from": stg_whale})
+    chain.sleep(1)
+    tx = strategy.harvest()
+    assert tx.events["Harvested"]["profit"] < 500 * 10 ** 6
+    assert stg_token.balanceOf(strategy) >= 1_000 * 10 ** 18
+
+    # switched off, the STG is left to ySwaps
+    strategy.setCompounding(ZERO_ADDRESS, [], 0, {"from": gov})
+    assert not strategy.compounding()
+    assert stg_token.allowance(strategy, router) == 0